@@ -8,6 +8,7 @@ import yaml
 
 from covid_model_seiir_pipeline.lib import (
     cli_tools,
+    math,
 )
 from covid_model_seiir_pipeline.pipeline import (
     RegressionSpecification,
@@ -316,6 +317,26 @@ def predictive_validity(run_metadata,
     logger.info('Done')
 
 
+@seiir.command()
+@cli_tools.add_verbose_and_with_debugger
+def warmup(verbose, with_debugger):
+    """Compile the ODE solvers into the on-disk numba cache.
+
+    Run once after installing or updating the pipeline so that tasks load
+    compiled solvers rather than each compiling their own.  The cache lives
+    alongside the installed package unless NUMBA_CACHE_DIR is set, in
+    which case it must be set the same way for the tasks.
+    """
+    cli_tools.configure_logging_to_terminal(verbose)
+
+    compile_system = cli_tools.handle_exceptions(math.compile_system, logger, with_debugger)
+    for name, system in math.SYSTEMS.items():
+        logger.info(f'Compiling solvers for {name}.')
+        compile_system(system)
+
+    logger.info('**Done**')
+
+
 def _do_regression(run_metadata: cli_tools.RunMetadata,
                    regression_specification: str,
                    infection_version: Optional[str],
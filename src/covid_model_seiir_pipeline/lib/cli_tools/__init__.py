@@ -34,6 +34,7 @@ from covid_model_seiir_pipeline.lib.cli_tools.decorators import (
     with_scenario,
     with_measure,
     with_draw_id,
+    with_draws_per_task,
     with_name,
     with_extra_id,
     with_progress_bar,
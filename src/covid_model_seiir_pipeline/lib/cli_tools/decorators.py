@@ -143,6 +143,13 @@ with_draw_id = click.option(
     required=True,
     help='The draw to be run.',
 )
+with_draws_per_task = click.option(
+    '--draws-per-task',
+    type=click.INT,
+    default=1,
+    show_default=True,
+    help='The number of consecutive draws, starting from the draw id, to run.',
+)
 with_name = click.option(
     '--name', '-n',
     type=click.STRING,
@@ -2,6 +2,9 @@ from collections import defaultdict
 import time
 
 from loguru import logger
+from numba.core import event
+
+from covid_model_seiir_pipeline.lib.io import cache_info
 
 
 class TaskPerformanceLogger:
@@ -20,6 +23,13 @@ class TaskPerformanceLogger:
             self.current_context = context
             self.current_context_start = time.time()
 
+    def _record_jit_timing(self, elapsed):
+        # Compilation happens inside whatever context triggered it.
+        # Move the time into its own context so it isn't mistaken for work.
+        if self.current_context is not None:
+            self.times[self.current_context] -= elapsed
+        self.times['jit'] += elapsed
+
     def info(self, *args, context=None, **kwargs):
         if context is not None:
             self._record_timing(context)
@@ -45,11 +55,40 @@ class TaskPerformanceLogger:
             self.times[self.current_context] += time.time() - self.current_context_start
         times = self.times.copy()
         times['total'] = sum(self.times.values())
-        logger.info(
+        report = (
             "\nRuntime report\n" +
             "=" * 31 + "\n" +
             "\n".join([f'{context:<20}:{elapsed_time:>10.2f}' for context, elapsed_time in times.items()])
         )
+        io_cache_info = cache_info()
+        if io_cache_info:
+            report += (
+                "\n\nI/O cache report\n" +
+                "=" * 31 + "\n" +
+                "\n".join([f'{counter:<20}:{count:>10}' for counter, count in io_cache_info.items()])
+            )
+        logger.info(report)
+
+
+class _JITTimer(event.Listener):
+    """Reports time spent compiling numba functions."""
+
+    def __init__(self, performance_logger: TaskPerformanceLogger):
+        self.performance_logger = performance_logger
+        self._depth = 0
+        self._start = None
+
+    def on_start(self, event_):
+        # Compiling a function compiles the functions it calls, only time the outermost.
+        if self._depth == 0:
+            self._start = time.time()
+        self._depth += 1
+
+    def on_end(self, event_):
+        self._depth -= 1
+        if self._depth == 0:
+            self.performance_logger._record_jit_timing(time.time() - self._start)
 
 
 task_performance_logger = TaskPerformanceLogger()
+event.register('numba:compile', _JITTimer(task_performance_logger))
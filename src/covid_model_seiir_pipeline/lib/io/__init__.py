@@ -13,7 +13,22 @@ from covid_model_seiir_pipeline.lib.io.data_roots import (
 )
 from covid_model_seiir_pipeline.lib.io.api import (
     dump,
+    dump_draw,
+    dump_many,
     load,
+    load_draw_matrix,
     exists,
+    is_complete,
+    list_keys,
+    session,
     touch
 )
+from covid_model_seiir_pipeline.lib.io.cache import (
+    enable_cache,
+    disable_cache,
+    cache_info,
+    read_csv,
+)
+from covid_model_seiir_pipeline.lib.io.prefetch import (
+    prefetch,
+)
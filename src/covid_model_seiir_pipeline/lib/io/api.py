@@ -4,35 +4,235 @@ These methods use information from the provided key to select an appropriate
 strategy for streaming data to and from disk.
 
 """
-from typing import Any, Union
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
 
 from covid_model_seiir_pipeline.lib.io.keys import (
     DatasetKey,
     MetadataKey,
 )
+from covid_model_seiir_pipeline.lib.io.cache import get_cache
 from covid_model_seiir_pipeline.lib.io.data_roots import DataRoot
-from covid_model_seiir_pipeline.lib.io.marshall import STRATEGIES
+from covid_model_seiir_pipeline.lib.io.manifest import Manifest, get_manifest
+from covid_model_seiir_pipeline.lib.io.marshall import (
+    STRATEGIES,
+    DRAW_MATRIX_STRATEGIES,
+    DateRange,
+)
+
+
+class WriteSession:
+    """Keeps container handles open across many writes to a data root.
+
+    Formats that store many datasets in a single container (zip, hdf)
+    otherwise open, rewrite, and close the container on every dump.  Within
+    a session each container is opened once and flushed once when the
+    session closes.  Formats without containers are written as usual.
+
+    Data written to a container in a session may not be readable until
+    the session closes, and is only recorded in the manifest once its
+    container has been closed.
+
+    Parameters
+    ----------
+    data_root
+        The data root whose datasets this session writes.  If not provided,
+        the session accepts writes to any key.
+
+    """
+
+    def __init__(self, data_root: Optional[DataRoot] = None):
+        self._data_root = data_root
+        self._containers: Dict[Any, Any] = {}
+        # Manifest entries for data written to each open container, recorded
+        # only once the container is closed and the data is on disk.
+        self._pending: Dict[Any, List[Tuple[Path, Dict[str, Any]]]] = {}
+
+    def handles(self, key: Union[MetadataKey, DatasetKey]) -> bool:
+        """Whether writes for the key go through this session."""
+        if not isinstance(key, DatasetKey):
+            return False
+        if self._data_root is None:
+            return True
+        return key.root == self._data_root._root and key.disk_format == self._data_root._data_format
+
+    def dump(self, dataset: Any, key: DatasetKey) -> None:
+        strategy = STRATEGIES[key.disk_format]
+        if not hasattr(strategy, 'open_container'):
+            strategy.dump(dataset, key)
+            get_manifest(key.root).record(key, dataset)
+            return
+        container_id = (key.disk_format, strategy.container_path(key))
+        if container_id not in self._containers:
+            self._containers[container_id] = strategy.open_container(key)
+            self._pending[container_id] = []
+        strategy.dump(dataset, key, container=self._containers[container_id])
+        self._pending[container_id].append((key.root, Manifest.entry(key, dataset)))
+
+    def close(self) -> None:
+        while self._containers:
+            container_id, container = self._containers.popitem()
+            container.close()
+            entries = self._pending.pop(container_id)
+            if entries:
+                # A container lives in a single data root.
+                root = entries[0][0]
+                get_manifest(root).append([entry for _, entry in entries])
+
+
+_ACTIVE_SESSIONS: List[WriteSession] = []
+
+
+@contextmanager
+def session(data_root: Optional[DataRoot] = None) -> Iterator[WriteSession]:
+    """Routes writes to the data root through a :class:`WriteSession`.
+
+    Usage
+    -----
+
+    .. code-block::
+
+        with io.session(forecast_root):
+            io.dump(ode_params, forecast_root.ode_params(scenario=scenario, draw_id=draw_id))
+            io.dump(outputs, forecast_root.raw_outputs(scenario=scenario, draw_id=draw_id))
+
+    """
+    write_session = WriteSession(data_root)
+    _ACTIVE_SESSIONS.append(write_session)
+    try:
+        yield write_session
+    finally:
+        _ACTIVE_SESSIONS.remove(write_session)
+        write_session.close()
+
+
+def load(key: Union[MetadataKey, DatasetKey],
+         columns: Iterable[str] = None,
+         location_ids: Iterable[int] = None,
+         date_range: DateRange = None) -> Any:
+    """Loads the dataset associated with the provided key.
+
+    Datasets may optionally be restricted to a subset of ``columns`` and to
+    rows matching ``location_ids`` and an inclusive ``(start, end)``
+    ``date_range``.  The selection is pushed into the reader where the disk
+    format supports it.
 
+    If load caching is enabled (see ``enable_cache``), repeated loads of an
+    unchanged dataset are served from memory.
 
-def load(key: Union[MetadataKey, DatasetKey]) -> Any:
-    """Loads the dataset associated with the provided key."""
+    """
     if key.disk_format not in STRATEGIES:
         raise
-    return STRATEGIES[key.disk_format].load(key)
+    selection = {
+        'columns': columns,
+        'location_ids': location_ids,
+        'date_range': date_range,
+    }
+    selection = {k: v for k, v in selection.items() if v is not None}
+    strategy = STRATEGIES[key.disk_format]
+
+    cache = get_cache()
+    if cache is None or key.disk_format in DRAW_MATRIX_STRATEGIES:
+        # Draw matrices are memory mapped and modified in place, so never cached.
+        return strategy.load(key, **selection)
+    cache_key = (key, tuple((k, _freeze(v)) for k, v in selection.items()))
+    return cache.get_or_load(cache_key, _source_path(key), lambda: strategy.load(key, **selection))
 
 
 def dump(dataset: Any, key: Union[MetadataKey, DatasetKey]) -> None:
-    """Writes the provided dataset to the location represented by the key."""
+    """Writes the provided dataset to the location represented by the key.
+
+    The write is recorded in the manifest of the key's data root.  Writes
+    to a container in an open session are recorded when the session closes.
+
+    """
     if key.disk_format not in STRATEGIES:
         raise
-    STRATEGIES[key.disk_format].dump(dataset, key)
+    for write_session in reversed(_ACTIVE_SESSIONS):
+        if write_session.handles(key):
+            write_session.dump(dataset, key)
+            break
+    else:
+        STRATEGIES[key.disk_format].dump(dataset, key)
+        get_manifest(key.root).record(key, dataset)
+    cache = get_cache()
+    if cache is not None:
+        # Don't rely on file modification times alone, they may be coarse.
+        cache.invalidate(_source_path(key))
+
+
+def dump_many(datasets: Iterable[Tuple[Any, Union[MetadataKey, DatasetKey]]]) -> None:
+    """Writes each (dataset, key) pair, opening each container only once."""
+    with session():
+        for dataset, key in datasets:
+            dump(dataset, key)
+
+
+def dump_draw(draw: pd.Series, key: DatasetKey, draw_id: int, n_draws: int,
+              index: pd.Index = None, strict: bool = True) -> None:
+    """Writes a single draw into the draw matrix represented by the key.
+
+    The matrix is created with room for ``n_draws`` draws by the first
+    writer, using ``index`` as the row index if provided.  Rewriting a draw
+    raises unless ``strict`` is ``False``.
+
+    The matrix is recorded in the manifest once, by the write that
+    completes it.
+
+    """
+    if key.disk_format not in DRAW_MATRIX_STRATEGIES:
+        raise ValueError(f'Single draws can only be written to draw matrices. Got format {key.disk_format}.')
+    strategy = DRAW_MATRIX_STRATEGIES[key.disk_format]
+    if strategy.dump_draw(draw, key, draw_id, n_draws, index, strict):
+        get_manifest(key.root).record(key, strategy.load(key))
+
+
+def load_draw_matrix(key: DatasetKey) -> Tuple[pd.Index, np.ndarray]:
+    """Returns the row index and a read-only memory map of the draw matrix."""
+    if key.disk_format not in DRAW_MATRIX_STRATEGIES:
+        raise ValueError(f'Only draw matrices can be memory mapped. Got format {key.disk_format}.')
+    return DRAW_MATRIX_STRATEGIES[key.disk_format].load_matrix(key)
+
+
+def is_complete(key: DatasetKey) -> bool:
+    """Returns whether every draw of the draw matrix at key has been written."""
+    if key.disk_format not in DRAW_MATRIX_STRATEGIES:
+        raise ValueError(f'Only draw matrices are written by draw. Got format {key.disk_format}.')
+    strategy = DRAW_MATRIX_STRATEGIES[key.disk_format]
+    return strategy.exists(key) and bool(strategy.load_written(key).all())
 
 
 def exists(key: Union[MetadataKey, DatasetKey]) -> bool:
-    """Returns whether a dataset is found at key's location."""
+    """Returns whether a dataset is found at key's location.
+
+    For container formats, keys recorded in the data root's manifest are
+    answered by checking that the container file is still there rather than
+    opening it.  Anything else (e.g. single file formats, inputs produced
+    outside the pipeline, or data written around the manifest) is probed
+    on disk.
+
+    """
     if key.disk_format not in STRATEGIES:
         raise
-    return STRATEGIES[key.disk_format].exists(key)
+    strategy = STRATEGIES[key.disk_format]
+    if hasattr(strategy, 'container_path') and key in get_manifest(key.root):
+        # Manifest entries outlive deleted data, so confirm with a stat.
+        return Path(strategy.container_path(key)).exists()
+    return strategy.exists(key)
+
+
+def list_keys(data_root: DataRoot, data_type: str = None, prefix: str = None) -> List[DatasetKey]:
+    """Lists the keys of datasets written to the data root.
+
+    Keys are read from the data root's manifest and may optionally be
+    filtered by the name of their dataset type and by their prefix.
+
+    """
+    return get_manifest(data_root._root).list_keys(data_type, prefix)
 
 
 def touch(data_root: DataRoot, **prefix_args):
@@ -41,3 +241,17 @@ def touch(data_root: DataRoot, **prefix_args):
         raise
     STRATEGIES[data_root._data_format].touch(*data_root.terminal_paths(**prefix_args))
 
+
+def _source_path(key: Union[MetadataKey, DatasetKey]) -> str:
+    """The file on disk holding the key's data."""
+    strategy = STRATEGIES[key.disk_format]
+    if hasattr(strategy, 'container_path'):
+        return str(strategy.container_path(key))
+    return str(strategy._resolve_key(key))
+
+
+def _freeze(selection_arg: Any) -> Any:
+    """Makes a load selection argument hashable."""
+    if isinstance(selection_arg, (str, tuple)):
+        return selection_arg
+    return tuple(selection_arg)
@@ -0,0 +1,151 @@
+"""Opt-in, size-bounded cache of loaded datasets.
+
+Within a single task the same inputs are often loaded many times over
+(location ids, populations, model inputs).  When enabled, loads are
+served from an in-memory LRU cache keyed by what was loaded and the
+modification time of the file on disk, so a rewritten file is never
+served stale.  Callers always get their own copy of cached data and
+can't corrupt the cache by modifying what they were handed.
+
+"""
+from collections import OrderedDict
+import copy
+import os
+from pathlib import Path
+import sys
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Union
+
+import pandas as pd
+
+# Default upper bound on the memory held by the cache.
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+
+def _nbytes(data: Any) -> int:
+    if isinstance(data, (pd.DataFrame, pd.Series)):
+        usage = data.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(data, pd.DataFrame) else usage)
+    return sys.getsizeof(data)
+
+
+def _copy(data: Any) -> Any:
+    if isinstance(data, (pd.DataFrame, pd.Series)):
+        return data.copy()
+    return copy.deepcopy(data)
+
+
+class LoadCache:
+    """Least recently used cache of loaded data, bounded in total size.
+
+    Parameters
+    ----------
+    max_bytes
+        Upper bound on the (estimated) memory held by cached data.  Items
+        larger than this are never cached.
+
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_load(self, cache_key: Hashable, path: Union[str, Path], loader: Callable[[], Any]) -> Any:
+        """Returns a copy of the data for the key, loading it on a miss.
+
+        ``path`` is the file backing the data.  Its modification time is part
+        of the cache key.  If it can't be found, the cache is bypassed.
+
+        """
+        try:
+            cache_key = (cache_key, str(path), os.stat(path).st_mtime_ns)
+        except OSError:
+            return loader()
+
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                self.hits += 1
+                self._entries.move_to_end(cache_key)
+            else:
+                self.misses += 1
+        if entry is not None:
+            # Cached data is never modified, so it's safe to copy outside the lock.
+            return _copy(entry[0])
+
+        data = loader()
+        self._insert(cache_key, data)
+        return _copy(data)
+
+    def invalidate(self, path: Union[str, Path]) -> None:
+        """Drops all cached data loaded from the path."""
+        with self._lock:
+            for entry_key in [k for k in self._entries if k[1] == str(path)]:
+                self._evict(entry_key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def info(self) -> Dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self._entries),
+            'nbytes': self.nbytes,
+        }
+
+    def _insert(self, cache_key: Hashable, data: Any) -> None:
+        nbytes = _nbytes(data)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if cache_key in self._entries:
+                return
+            self._entries[cache_key] = (data, nbytes)
+            self.nbytes += nbytes
+            while self.nbytes > self.max_bytes:
+                self._evict(next(iter(self._entries)))
+
+    def _evict(self, cache_key: Hashable) -> None:
+        _, nbytes = self._entries.pop(cache_key)
+        self.nbytes -= nbytes
+
+
+_CACHE: Optional[LoadCache] = None
+
+
+def enable_cache(max_bytes: int = DEFAULT_MAX_BYTES) -> LoadCache:
+    """Turns on load caching for this process."""
+    global _CACHE
+    _CACHE = LoadCache(max_bytes)
+    return _CACHE
+
+
+def disable_cache() -> None:
+    """Turns off load caching for this process and drops the cached data."""
+    global _CACHE
+    _CACHE = None
+
+
+def get_cache() -> Optional[LoadCache]:
+    """Returns the active load cache, if caching is enabled."""
+    return _CACHE
+
+
+def cache_info() -> Dict[str, int]:
+    """Hit and miss counts and size of the active load cache."""
+    return _CACHE.info() if _CACHE is not None else {}
+
+
+def read_csv(path: Union[str, Path], **kwargs) -> pd.DataFrame:
+    """Reads a csv file from outside the pipeline data roots, through the cache if enabled."""
+    if _CACHE is None:
+        return pd.read_csv(path, **kwargs)
+    cache_key = ('read_csv', str(path), tuple(sorted((k, repr(v)) for k, v in kwargs.items())))
+    return _CACHE.get_or_load(cache_key, path, lambda: pd.read_csv(path, **kwargs))
@@ -5,6 +5,7 @@ from typing import List, Union
 
 from covid_model_seiir_pipeline.lib.io.keys import (
     DatasetType,
+    DrawMatrixType,
     MetadataType,
     DatasetKey,
     LEAF_TEMPLATES,
@@ -79,8 +80,9 @@ class DataRoot:
 
         """
         paths = []
+        # Draw matrix stores manage their own directories.
         dataset_types = [dataset_type for dataset_type in type(self).__dict__.values()
-                         if isinstance(dataset_type, DatasetType)]
+                         if isinstance(dataset_type, DatasetType) and not isinstance(dataset_type, DrawMatrixType)]
         for dataset_type in dataset_types:
             if dataset_type.prefix_template is not None:
                 for arg_set in itertools.product(*prefix_args.values()):
@@ -189,6 +191,9 @@ class PostprocessingRoot(DataRoot):
     specification = MetadataType('postprocessing_specification')
     resampling_map = MetadataType('resampling_map')
 
+    raw_output_draws = DrawMatrixType('raw_output_draws',
+                                      LEAF_TEMPLATES.MEASURE_TEMPLATE,
+                                      PREFIX_TEMPLATES.SCENARIO_TEMPLATE)
     output_draws = DatasetType('output_draws',
                                LEAF_TEMPLATES.MEASURE_TEMPLATE,
                                PREFIX_TEMPLATES.SCENARIO_TEMPLATE)
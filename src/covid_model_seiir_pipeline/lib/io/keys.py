@@ -37,6 +37,9 @@ class __PrefixTemplates(NamedTuple):
 
 PREFIX_TEMPLATES = __PrefixTemplates()
 
+# Disk format of draw matrix stores, which are independent of a data root's data format.
+DRAW_MATRIX_FORMAT = 'draw_matrix'
+
 
 class DatasetKey(NamedTuple):
     # noinspection PyUnresolvedReferences
@@ -189,6 +192,32 @@ class DatasetType:
         return f'{type(self).__name__}({", ".join(["=".join([k, str(v)]) for k, v in self.__dict__.items()])})'
 
 
+class DrawMatrixType(DatasetType):
+    """Factory for DatasetKeys pointing at draw matrix stores.
+
+    A draw matrix stores a single measure for all draws as one on disk
+    matrix with rows indexed by location and date and one column per draw.
+    Keys are always resolved to the draw matrix disk format, regardless
+    of the data format of the :class:`DataRoot` they are bound to.
+
+    Example
+    -------
+
+    .. code-block::
+
+        class MyDataRoot(DataRoot):
+            # Generates keys representing paths like /root/scenario/deaths_draws/measure
+            deaths_draws = DrawMatrixType('deaths_draws',
+                                          LEAF_TEMPLATES.MEASURE_TEMPLATE,
+                                          PREFIX_TEMPLATES.SCENARIO_TEMPLATE)
+
+    """
+
+    def __get__(self, instance: 'DataRoot', owner=None) -> 'DrawMatrixType':
+        return type(self)(self.name, self.leaf_template, self.prefix_template,
+                          _root=instance._root, _disk_format=DRAW_MATRIX_FORMAT)
+
+
 class MetadataType:
     """Factory for MetadataKeys.
 
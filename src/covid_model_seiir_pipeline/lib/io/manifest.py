@@ -0,0 +1,148 @@
+"""Per data root index of the datasets written to it.
+
+Every dump through the I/O interface appends an entry to a manifest at
+the top of the data root recording the key along with the size, row
+count, checksum, and schema of the data written.  Key listings can then
+be answered from a single small file rather than by probing every dataset
+on disk, and existence checks for recorded keys in container formats only
+need to stat the container rather than open it.
+
+The manifest is an append-only log of json lines so that concurrent
+writers never need to rewrite it.  When a key is written more than once,
+the last entry wins.
+
+"""
+import fcntl
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from covid_model_seiir_pipeline.lib.io.keys import (
+    DatasetKey,
+    MetadataKey,
+)
+
+MANIFEST_FILE = 'manifest.jsonl'
+
+# Fields identifying an entry, in DatasetKey order without the root.
+_KEY_FIELDS = ('disk_format', 'data_type', 'leaf_name', 'prefix')
+
+
+def _key_id(key: Union[MetadataKey, DatasetKey]) -> Tuple:
+    if isinstance(key, DatasetKey):
+        return key.disk_format, key.data_type, key.leaf_name, key.prefix
+    return key.disk_format, key.data_type, None, None
+
+
+def describe(data: Any) -> Dict[str, Any]:
+    """Summarizes a dataset for the manifest."""
+    if isinstance(data, pd.Series):
+        data = data.to_frame()
+    if not isinstance(data, pd.DataFrame):
+        return {}
+    hashes = pd.util.hash_pandas_object(data, index=False).to_numpy()
+    return {
+        'nbytes': int(data.memory_usage(index=False).sum()),
+        'rows': len(data),
+        'checksum': hashlib.md5(hashes.tobytes()).hexdigest(),
+        'schema': {str(column): str(dtype) for column, dtype in data.dtypes.items()},
+    }
+
+
+class Manifest:
+    """Reader and writer for the manifest of a single data root.
+
+    Parameters
+    ----------
+    root
+        The root directory of the data root.
+
+    """
+
+    def __init__(self, root: Union[str, Path]):
+        self.root = Path(root)
+        self.path = self.root / MANIFEST_FILE
+        self._entries: Dict[Tuple, Dict[str, Any]] = {}
+        # Size of the manifest when last read, so we only read the new lines.
+        self._offset = 0
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def record(self, key: Union[MetadataKey, DatasetKey], data: Any) -> None:
+        """Appends an entry for data written to the key."""
+        self.append([self.entry(key, data)])
+
+    @staticmethod
+    def entry(key: Union[MetadataKey, DatasetKey], data: Any) -> Dict[str, Any]:
+        """Builds the entry for data written to the key without recording it."""
+        entry = dict(zip(_KEY_FIELDS, _key_id(key)))
+        entry['kind'] = 'dataset' if isinstance(key, DatasetKey) else 'metadata'
+        entry.update(describe(data))
+        return entry
+
+    def append(self, entries: List[Dict[str, Any]]) -> None:
+        """Appends previously built entries in a single write."""
+        if not entries:
+            return
+        lines = ''.join(json.dumps(entry) + '\n' for entry in entries)
+        with self.path.open('a') as manifest_file:
+            fcntl.flock(manifest_file, fcntl.LOCK_EX)
+            try:
+                manifest_file.write(lines)
+            finally:
+                fcntl.flock(manifest_file, fcntl.LOCK_UN)
+
+    def get(self, key: Union[MetadataKey, DatasetKey]) -> Optional[Dict[str, Any]]:
+        """Returns the manifest entry for the key, if it has one."""
+        key_id = _key_id(key)
+        if key_id not in self._entries:
+            # Entries are never removed, so we only need to look for new
+            # ones when we don't already know about the key.
+            self._refresh()
+        return self._entries.get(key_id)
+
+    def __contains__(self, key: Union[MetadataKey, DatasetKey]) -> bool:
+        return self.get(key) is not None
+
+    def list_keys(self, data_type: str = None, prefix: str = None) -> List[DatasetKey]:
+        """Lists the dataset keys in the manifest, optionally filtered."""
+        self._refresh()
+        keys = []
+        for (disk_format, entry_data_type, leaf_name, entry_prefix), entry in self._entries.items():
+            if entry['kind'] != 'dataset':
+                continue
+            if data_type is not None and entry_data_type != data_type:
+                continue
+            if prefix is not None and entry_prefix != prefix:
+                continue
+            keys.append(DatasetKey(self.root, disk_format, entry_data_type, leaf_name, entry_prefix))
+        return keys
+
+    def _refresh(self) -> None:
+        if not self.path.exists():
+            return
+        with self.path.open('rb') as manifest_file:
+            manifest_file.seek(self._offset)
+            new_lines = manifest_file.read()
+        # Only consume complete lines, a writer may be mid-append.
+        complete = new_lines[:new_lines.rfind(b'\n') + 1]
+        self._offset += len(complete)
+        for line in complete.decode().splitlines():
+            entry = json.loads(line)
+            key_id = tuple(entry.pop(field) for field in _KEY_FIELDS)
+            self._entries[key_id] = entry
+
+
+_MANIFESTS: Dict[Path, Manifest] = {}
+
+
+def get_manifest(root: Union[str, Path]) -> Manifest:
+    """Returns the (process-wide cached) manifest for a data root directory."""
+    root = Path(root)
+    if root not in _MANIFESTS:
+        _MANIFESTS[root] = Manifest(root)
+    return _MANIFESTS[root]
@@ -1,20 +1,91 @@
 from contextlib import contextmanager
+import fcntl
 import io
 import os
 from pathlib import Path
-from typing import Any, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 import zipfile
 
 from covid_shared.shell_tools import mkdir
+import fastparquet
+import numpy as np
 import pandas as pd
 import yaml
 
 from covid_model_seiir_pipeline.lib.io.keys import (
     DatasetKey,
     MetadataKey,
+    DRAW_MATRIX_FORMAT,
 )
 
 
+# Bounds are inclusive and either end may be None to leave it open.
+DateRange = Tuple[Optional[Union[str, pd.Timestamp]], Optional[Union[str, pd.Timestamp]]]
+
+
+def _columns_to_read(columns: Optional[Iterable[str]],
+                     location_ids: Optional[Iterable[int]],
+                     date_range: Optional[DateRange]) -> Optional[List[str]]:
+    """Columns needed on disk to produce the projection and evaluate the row filters."""
+    if columns is None:
+        return None
+    read_columns = list(columns)
+    if location_ids is not None and 'location_id' not in read_columns:
+        read_columns.append('location_id')
+    if date_range is not None and 'date' not in read_columns:
+        read_columns.append('date')
+    return read_columns
+
+
+def _row_mask(data: pd.DataFrame,
+              location_ids: Optional[Iterable[int]],
+              date_range: Optional[DateRange]) -> np.ndarray:
+    """Boolean mask of the rows of data satisfying the row filters."""
+    mask = np.ones(len(data), dtype=bool)
+    if location_ids is not None:
+        mask &= data['location_id'].isin(list(location_ids)).to_numpy()
+    if date_range is not None:
+        start, end = date_range
+        dates = pd.to_datetime(data['date'])
+        if start is not None:
+            mask &= (dates >= pd.Timestamp(start)).to_numpy()
+        if end is not None:
+            mask &= (dates <= pd.Timestamp(end)).to_numpy()
+    return mask
+
+
+def _select(data: pd.DataFrame,
+            columns: Optional[Iterable[str]],
+            location_ids: Optional[Iterable[int]],
+            date_range: Optional[DateRange]) -> pd.DataFrame:
+    """Applies the row filters and column projection to in-memory data."""
+    if location_ids is not None or date_range is not None:
+        data = data.loc[_row_mask(data, location_ids, date_range)]
+    if columns is not None:
+        data = data.loc[:, list(columns)]
+    return data
+
+
+def _read_csv(filepath_or_buffer,
+              columns: Optional[Iterable[str]],
+              location_ids: Optional[Iterable[int]],
+              date_range: Optional[DateRange],
+              chunksize: int) -> pd.DataFrame:
+    """Reads csv data, streaming it through the row filters if any are given."""
+    read_columns = _columns_to_read(columns, location_ids, date_range)
+    if location_ids is None and date_range is None:
+        data = pd.read_csv(filepath_or_buffer, usecols=read_columns)
+    else:
+        # Filter chunk by chunk so we never hold rows we are going to throw away.
+        chunks = pd.read_csv(filepath_or_buffer, usecols=read_columns, chunksize=chunksize)
+        data = pd.concat([_select(chunk, None, location_ids, date_range) for chunk in chunks],
+                         ignore_index=True)
+    if columns is not None:
+        # usecols does not preserve the requested column order.
+        data = data.loc[:, list(columns)]
+    return data
+
+
 class CSVMarshall:
     """
     Marshalls DataFrames to/from CSV files.
@@ -22,6 +93,9 @@ class CSVMarshall:
     This implementation directly mirrors existing behavior but does so within a
     new marshalling interface.
     """
+    # Number of rows to hold in memory at once when filtering rows on load.
+    chunksize = 100_000
+
     # interface methods
     @classmethod
     def dump(cls, data: pd.DataFrame, key: DatasetKey, strict: bool = True) -> None:
@@ -34,9 +108,12 @@ class CSVMarshall:
         data.to_csv(path, index=False)
 
     @classmethod
-    def load(cls, key: DatasetKey) -> pd.DataFrame:
+    def load(cls, key: DatasetKey,
+             columns: Iterable[str] = None,
+             location_ids: Iterable[int] = None,
+             date_range: DateRange = None) -> pd.DataFrame:
         path = cls._resolve_key(key)
-        return pd.read_csv(path)
+        return _read_csv(path, columns, location_ids, date_range, cls.chunksize)
 
     @classmethod
     def touch(cls, *paths: Path) -> None:
@@ -60,25 +137,32 @@ class CSVMarshall:
 
 
 class ZipMarshall:
+    # Number of rows to hold in memory at once when filtering rows on load.
+    chunksize = 100_000
+    # Number of rows to format at once when writing.
+    write_chunksize = 100_000
+
     # interface methods
 
     @classmethod
-    def dump(cls, data: pd.DataFrame, key: DatasetKey, strict: bool = True) -> None:
+    def dump(cls, data: pd.DataFrame, key: DatasetKey, strict: bool = True,
+             container: zipfile.ZipFile = None) -> None:
         zip_path, node = cls._resolve_key(key)
-        with zipfile.ZipFile(zip_path, mode='a') as container:
-            with cls._open_node(container, node, strict) as outf:
-                # stream writes through a wrapper that does str => bytes conversion
-                # chunksize denotes number of rows to write at once. it is not
-                # clear to me that 5 is at all a good number
-                wrapper = io.TextIOWrapper(outf, write_through=True)
-                data.to_csv(wrapper, index=False, chunksize=5)
+        if container is None:
+            with cls.open_container(key) as container:
+                cls._write_node(container, data, node, strict)
+        else:
+            cls._write_node(container, data, node, strict)
 
     @classmethod
-    def load(cls, key: DatasetKey) -> pd.DataFrame:
+    def load(cls, key: DatasetKey,
+             columns: Iterable[str] = None,
+             location_ids: Iterable[int] = None,
+             date_range: DateRange = None) -> pd.DataFrame:
         zip_path, node = cls._resolve_key(key)
         with zipfile.ZipFile(zip_path) as container:
             with container.open(node) as inf:
-                return pd.read_csv(inf)
+                return _read_csv(inf, columns, location_ids, date_range, cls.chunksize)
 
     @classmethod
     def exists(cls, key: DatasetKey) -> bool:
@@ -101,6 +185,26 @@ class ZipMarshall:
             finally:
                 os.umask(old_umask)
 
+    @classmethod
+    def container_path(cls, key: DatasetKey) -> Path:
+        """The path of the zip file holding the key's data."""
+        return cls._resolve_key(key)[0]
+
+    @classmethod
+    def open_container(cls, key: DatasetKey) -> zipfile.ZipFile:
+        """Opens the zip file holding the key's data for writing."""
+        return zipfile.ZipFile(cls.container_path(key), mode='a')
+
+    @classmethod
+    def _write_node(cls, container: zipfile.ZipFile, data: pd.DataFrame, node: str, strict: bool) -> None:
+        with cls._open_node(container, node, strict) as outf:
+            # Stream writes through a buffered wrapper that does str => bytes
+            # conversion so the compressor sees large blocks.
+            wrapper = io.TextIOWrapper(outf)
+            data.to_csv(wrapper, index=False, chunksize=cls.write_chunksize)
+            wrapper.flush()
+            wrapper.detach()
+
     @classmethod
     def _resolve_key(cls, key: DatasetKey) -> Tuple[Path, str]:
         zip_path = key.root
@@ -141,24 +245,48 @@ class HDF5Marshall:
     * supports multiple sets of data (Dataset)
     * supports grouping of data (groups) which are analogous to directories
 
+    Data sets are written in the queryable table format with the location
+    and date columns indexed so row filters can be resolved on disk.
     """
+    # Columns indexed on disk so that loads can filter on them.
+    data_columns = ['location_id', 'date']
 
     @classmethod
-    def dump(cls, data, key, strict=True):
+    def dump(cls, data, key, strict=True, container=None):
         hdf_path, node = cls._resolve_key(key)
-        with pd.HDFStore(hdf_path) as container:
-            if node in container and strict:
-                raise LookupError(f"Cannot dump data for key {node} - would overwrite")
-            container.put(node, data)
+        if container is None:
+            with cls.open_container(key) as container:
+                cls._write_node(container, data, node, strict)
+        else:
+            cls._write_node(container, data, node, strict)
 
     @classmethod
-    def load(cls, key):
+    def load(cls, key, columns=None, location_ids=None, date_range=None):
         hdf_path, node = cls._resolve_key(key)
         with pd.HDFStore(hdf_path, mode='r') as container:
-            try:
-                return container.get(node)
-            except KeyError:
+            if node not in container:
                 raise RuntimeError(f"No data set for {key} saved!")
+            filter_columns = []
+            if location_ids is not None:
+                filter_columns.append('location_id')
+            if date_range is not None:
+                filter_columns.append('date')
+
+            if not container.get_storer(node).is_table:
+                # Fixed format data sets can only be read whole.
+                return _select(container.get(node), columns, location_ids, date_range)
+
+            if filter_columns:
+                # Read only the indexed filter columns to resolve the row coordinates.
+                filter_data = pd.DataFrame({c: container.select_column(node, c) for c in filter_columns})
+                where = np.flatnonzero(_row_mask(filter_data, location_ids, date_range))
+            else:
+                where = None
+            columns = list(columns) if columns is not None else None
+            if where is not None and not len(where):
+                # An empty coordinate selection would select everything.
+                return container.select(node, columns=columns, stop=0)
+            return container.select(node, where=where, columns=columns)
 
 
     @classmethod
@@ -178,6 +306,23 @@ class HDF5Marshall:
         with pd.HDFStore(hdf_path, mode='r') as container:
             return node in container
 
+    @classmethod
+    def container_path(cls, key: DatasetKey) -> str:
+        """The path of the hdf file holding the key's data."""
+        return cls._resolve_key(key)[0]
+
+    @classmethod
+    def open_container(cls, key: DatasetKey) -> pd.HDFStore:
+        """Opens the hdf file holding the key's data for writing."""
+        return pd.HDFStore(cls.container_path(key))
+
+    @classmethod
+    def _write_node(cls, container: pd.HDFStore, data: pd.DataFrame, node: str, strict: bool) -> None:
+        if node in container and strict:
+            raise LookupError(f"Cannot dump data for key {node} - would overwrite")
+        data_columns = [c for c in cls.data_columns if c in data.columns]
+        container.put(node, data, format='table', data_columns=data_columns)
+
     @classmethod
     def _resolve_key(cls, key: DatasetKey):
         hdf_path = key.root
@@ -191,6 +336,287 @@ class HDF5Marshall:
         return str(hdf_path), node
 
 
+class ParquetMarshall:
+    """
+    Marshalls DataFrames to/from parquet files.
+
+    Parquet is a typed, columnar format, so datetime, integer, and float
+    columns survive a round trip without being re-parsed from text.  Each
+    leaf node is written as a single file, mirroring the csv layout.
+    """
+    compression = 'SNAPPY'
+
+    # interface methods
+    @classmethod
+    def dump(cls, data: pd.DataFrame, key: DatasetKey, strict: bool = True) -> None:
+        path = cls._resolve_key(key)
+
+        if strict and path.exists():
+            msg = f"Cannot dump data for key {key} - would overwrite"
+            raise LookupError(msg)
+
+        data.to_parquet(path, engine='fastparquet', compression=cls.compression, index=False)
+
+    @classmethod
+    def load(cls, key: DatasetKey,
+             columns: Iterable[str] = None,
+             location_ids: Iterable[int] = None,
+             date_range: DateRange = None) -> pd.DataFrame:
+        path = cls._resolve_key(key)
+        parquet_file = fastparquet.ParquetFile(str(path))
+        read_columns = _columns_to_read(columns, location_ids, date_range)
+        # Row group statistics let the reader skip groups with none of the
+        # requested locations.  The exact filter is applied after the read.
+        filters = [('location_id', 'in', list(location_ids))] if location_ids is not None else None
+        data = parquet_file.to_pandas(columns=read_columns, filters=filters)
+        data = _select(data, columns, location_ids, date_range)
+        if location_ids is not None or date_range is not None:
+            data = data.reset_index(drop=True)
+        return data
+
+    @classmethod
+    def touch(cls, *paths: Path) -> None:
+        for path in paths:
+            mkdir(path, parents=True, exists_ok=True)
+
+    @classmethod
+    def exists(cls, key: DatasetKey) -> bool:
+        path = cls._resolve_key(key)
+        return path.exists()
+
+    @classmethod
+    def _resolve_key(cls, key: DatasetKey) -> Path:
+        path = key.root
+        if key.prefix:
+            path /= key.prefix
+        path /= key.data_type
+        if key.leaf_name:
+            path /= key.leaf_name
+        return path.with_suffix(".parquet")
+
+
+class GzipParquetMarshall(ParquetMarshall):
+    """Marshalls DataFrames to/from gzip compressed parquet files."""
+    compression = 'GZIP'
+
+
+class ZstdParquetMarshall(ParquetMarshall):
+    """Marshalls DataFrames to/from zstandard compressed parquet files."""
+    compression = 'ZSTD'
+
+
+class UncompressedParquetMarshall(ParquetMarshall):
+    """Marshalls DataFrames to/from uncompressed parquet files."""
+    compression = None
+
+
+class DrawMatrixMarshall:
+    """
+    Marshalls draw-level data to/from a single memory-mappable matrix.
+
+    A store holds one measure for all draws.  The row index (typically
+    location and date) is written once to a parquet file and the values
+    to a column-major ``.npy`` file with one column per draw, so each draw
+    is a contiguous chunk on disk.  Independent tasks can therefore write
+    their own draw column into the same store concurrently, and readers
+    get the whole (row x draw) matrix back as a ``numpy.memmap`` without
+    any concatenation.
+
+    Columns not yet written are filled with NaN.  Which draws have been
+    written is tracked alongside the values so readers can tell a complete
+    store from one still being filled.
+    """
+    dtype = np.float64
+    index_file = 'index.parquet'
+    values_file = 'values.npy'
+    written_file = 'written.npy'
+    lock_file = '.lock'
+    # Row indices of stores this process has read, keyed by store path and
+    # validated against the inode, modification time and size of the index
+    # file.  Mtimes alone may be coarse (e.g. on NFS), but every rewrite
+    # moves a new file into place and so gets a new inode.
+    _index_cache: Dict[Path, Tuple[Tuple[int, int, int], pd.Index]] = {}
+
+    # interface methods
+    @classmethod
+    def dump(cls, data: pd.DataFrame, key: DatasetKey, strict: bool = True) -> None:
+        """Writes a full matrix whose columns are the draws ``0..n_draws-1``."""
+        n_draws = len(data.columns)
+        if list(data.columns) != list(range(n_draws)):
+            raise ValueError(f'Columns of a draw matrix must be the draw ids 0 to {n_draws - 1}. '
+                             f'Got {list(data.columns)} for key {key}.')
+        path = cls._resolve_key(key)
+        with cls._lock(path):
+            if strict and (path / cls.values_file).exists():
+                raise LookupError(f"Cannot dump data for key {key} - would overwrite")
+            cls._save_written(path, np.ones(n_draws, dtype=bool))
+            cls._create(path, data.index, n_draws, data.to_numpy(dtype=cls.dtype))
+
+    @classmethod
+    def dump_draw(cls, data: pd.Series, key: DatasetKey, draw_id: int, n_draws: int,
+                  index: pd.Index = None, strict: bool = True) -> bool:
+        """Writes a single draw column, creating the store if necessary.
+
+        The first writer creates the store with room for ``n_draws`` columns
+        and a row index of ``index`` if provided or the index of ``data``
+        otherwise.  Later writers have their data aligned to that index,
+        which is extended (and the draws already written carried over) if
+        they have rows not yet present.
+
+        With ``strict=False`` a draw that was already written is overwritten,
+        so an interrupted set of writes can simply be rerun.
+
+        Returns whether this write completed the store, i.e. it was the
+        last of the ``n_draws`` draws to be written.
+
+        """
+        path = cls._resolve_key(key)
+        with cls._lock(path):
+            if not (path / cls.values_file).exists():
+                cls._save_written(path, np.zeros(n_draws, dtype=bool))
+                cls._create(path, index if index is not None else data.index, n_draws)
+
+            stored_index = cls._load_index(path)
+            if not data.index.equals(stored_index):
+                if not data.index.is_unique:
+                    raise ValueError(f'Draw {draw_id} for key {key} has a duplicated index.')
+                if not data.index.isin(stored_index).all():
+                    # Rare, draws are usually identically indexed. Rebuild the
+                    # store on the union of the row indices.
+                    new_index = stored_index.union(data.index)
+                    stored_values = np.load(path / cls.values_file, mmap_mode='r')
+                    stored_data = pd.DataFrame(stored_values, index=stored_index).reindex(new_index)
+                    del stored_values
+                    cls._create(path, new_index, n_draws, stored_data.to_numpy())
+                    stored_index = new_index
+                data = data.reindex(stored_index)
+
+            written = np.load(path / cls.written_file)
+            if not 0 <= draw_id < len(written):
+                raise ValueError(f'Draw {draw_id} is out of bounds for key {key} with {len(written)} draws.')
+            if strict and written[draw_id]:
+                raise LookupError(f"Cannot dump draw {draw_id} for key {key} - would overwrite")
+            values = np.lib.format.open_memmap(path / cls.values_file, mode='r+')
+            values[:, draw_id] = data.to_numpy(dtype=cls.dtype)
+            values.flush()
+            del values
+            was_complete = written.all()
+            written[draw_id] = True
+            cls._save_written(path, written)
+            return bool(written.all() and not was_complete)
+
+    @classmethod
+    def load(cls, key: DatasetKey,
+             columns: Iterable[int] = None,
+             location_ids: Iterable[int] = None,
+             date_range: DateRange = None) -> pd.DataFrame:
+        """Loads the matrix as a DataFrame backed by a read-only memory map.
+
+        ``columns`` selects draws.  Any selection produces an in-memory copy.
+
+        """
+        index, values = cls.load_matrix(key)
+        draws = pd.RangeIndex(values.shape[1])
+        if location_ids is not None or date_range is not None:
+            mask = _row_mask(index.to_frame(index=False), location_ids, date_range)
+            index, values = index[mask], values[mask]
+        if columns is not None:
+            draws = pd.Index(list(columns))
+            values = values[:, draws.to_numpy()]
+        return pd.DataFrame(values, index=index, columns=draws)
+
+    @classmethod
+    def load_matrix(cls, key: DatasetKey) -> Tuple[pd.Index, np.memmap]:
+        """Loads the row index and a read-only memory map of the values."""
+        path = cls._resolve_key(key)
+        if not (path / cls.values_file).exists():
+            raise RuntimeError(f"No data set for {key} saved!")
+        # Hold the lock shared so a writer can't swap in a rebuilt index
+        # between reading the index and mapping the values.  Once mapped,
+        # the values stay valid even if the file is later replaced.
+        with cls._lock(path, shared=True):
+            return cls._load_index(path), np.load(path / cls.values_file, mmap_mode='r')
+
+    @classmethod
+    def load_written(cls, key: DatasetKey) -> np.ndarray:
+        """Loads a boolean mask of the draws that have been written."""
+        path = cls._resolve_key(key)
+        if not (path / cls.values_file).exists():
+            raise RuntimeError(f"No data set for {key} saved!")
+        with cls._lock(path, shared=True):
+            return np.load(path / cls.written_file)
+
+    @classmethod
+    def touch(cls, *paths: Path) -> None:
+        for path in paths:
+            mkdir(path, parents=True, exists_ok=True)
+
+    @classmethod
+    def exists(cls, key: DatasetKey) -> bool:
+        path = cls._resolve_key(key)
+        return (path / cls.values_file).exists()
+
+    @classmethod
+    def _resolve_key(cls, key: DatasetKey) -> Path:
+        path = key.root
+        if key.prefix:
+            path /= key.prefix
+        path /= key.data_type
+        if key.leaf_name:
+            path /= key.leaf_name
+        return path
+
+    @classmethod
+    def _create(cls, path: Path, index: pd.Index, n_draws: int, values: np.ndarray = None) -> None:
+        # Write to temporary files and move them into place so no file is
+        # ever seen half written.  The index and values are replaced one
+        # after the other, so callers must hold the store lock exclusively
+        # and readers take it shared to see a consistent pair.  The values
+        # file goes last as its presence marks the store as existing.
+        index.to_frame(index=False).to_parquet(path / f'{cls.index_file}.tmp', engine='fastparquet', index=False)
+        os.replace(path / f'{cls.index_file}.tmp', path / cls.index_file)
+
+        tmp_values_path = path / f'{cls.values_file}.tmp'
+        matrix = np.lib.format.open_memmap(tmp_values_path, mode='w+', dtype=cls.dtype,
+                                           shape=(len(index), n_draws), fortran_order=True)
+        matrix[:] = np.nan if values is None else values
+        matrix.flush()
+        del matrix
+        os.replace(tmp_values_path, path / cls.values_file)
+
+    @classmethod
+    def _save_written(cls, path: Path, written: np.ndarray) -> None:
+        # np.save appends the suffix to a path without one.
+        tmp_path = path / f'{cls.written_file}.tmp.npy'
+        np.save(tmp_path, written)
+        os.replace(tmp_path, path / cls.written_file)
+
+    @classmethod
+    def _load_index(cls, path: Path) -> pd.Index:
+        stat = (path / cls.index_file).stat()
+        version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        cached_version, index = cls._index_cache.get(path, (None, None))
+        if cached_version != version:
+            index_data = pd.read_parquet(path / cls.index_file, engine='fastparquet')
+            if len(index_data.columns) == 1:
+                index = pd.Index(index_data.iloc[:, 0])
+            else:
+                index = pd.MultiIndex.from_frame(index_data)
+            cls._index_cache[path] = (version, index)
+        return index
+
+    @classmethod
+    @contextmanager
+    def _lock(cls, path: Path, shared: bool = False):
+        mkdir(path, parents=True, exists_ok=True)
+        with (path / cls.lock_file).open('a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
 class YamlMarshall:
     """Marshalls primitive python data structures to and from yaml."""
 
@@ -226,8 +652,18 @@ DATA_STRATEGIES = {
     'csv': CSVMarshall,
     'zip': ZipMarshall,
     'hdf': HDF5Marshall,
+    # Parquet variants differ only in their compression codec.
+    'parquet': ParquetMarshall,
+    'parquet_gzip': GzipParquetMarshall,
+    'parquet_zstd': ZstdParquetMarshall,
+    'parquet_uncompressed': UncompressedParquetMarshall,
+}
+# Draw matrices are bound to their own dataset types rather than
+# selected as the data format of a data root.
+DRAW_MATRIX_STRATEGIES = {
+    DRAW_MATRIX_FORMAT: DrawMatrixMarshall,
 }
 METADATA_STRATEGIES = {
     'yaml': YamlMarshall,
 }
-STRATEGIES = {**DATA_STRATEGIES, **METADATA_STRATEGIES}
+STRATEGIES = {**DATA_STRATEGIES, **DRAW_MATRIX_STRATEGIES, **METADATA_STRATEGIES}
@@ -0,0 +1,53 @@
+"""Threaded read-ahead for sequences of datasets.
+
+Draw level tasks typically read hundreds of similar files and do a modest
+amount of work on each.  Readers whose parsers release the GIL (parquet,
+hdf, and to a lesser extent the C csv parser) can overlap that disk and
+decompression time with the consumer's work in threads, which avoids
+forking processes and pickling results back to the parent.
+
+"""
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Iterable, Iterator, TypeVar
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+def prefetch(loader: Callable[[T], R], items: Iterable[T], depth: int = 4, num_threads: int = None) -> Iterator[R]:
+    """Yields ``loader(item)`` for each item, in order, reading ahead in threads.
+
+    Parameters
+    ----------
+    loader
+        Function reading a single dataset.
+    items
+        Arguments to the loader, e.g. draw ids.
+    depth
+        Maximum number of datasets read but not yet consumed.  This bounds
+        the memory held by the reader to ``depth`` datasets.
+    num_threads
+        Number of reader threads.  Defaults to ``depth``.
+
+    """
+    if depth < 1:
+        raise ValueError(f'Prefetch depth must be at least 1. Got {depth}.')
+    items = iter(items)
+    pending: Deque[Future] = deque()
+    with ThreadPoolExecutor(max_workers=num_threads or depth) as executor:
+        try:
+            for item in items:
+                pending.append(executor.submit(loader, item))
+                if len(pending) == depth:
+                    break
+            while pending:
+                result = pending.popleft().result()
+                for item in items:
+                    pending.append(executor.submit(loader, item))
+                    break
+                yield result
+        finally:
+            # Don't wait on reads nobody will consume if the consumer stops early.
+            for future in pending:
+                future.cancel()
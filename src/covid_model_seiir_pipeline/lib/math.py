@@ -1,4 +1,8 @@
+import functools
+from typing import Callable, Dict, Tuple
+
 import numba
+from numba import types
 import numpy as np
 import pandas as pd
 
@@ -32,49 +36,488 @@ def compute_beta_hat(covariates: pd.DataFrame, coefficients: pd.DataFrame) -> pd
     return (covariates * coefficients).sum(axis=1)
 
 
+def inplace_system(system):
+    """Adapts an ode system returning its derivatives to the in-place convention.
+
+    The solvers here call ``system(t, y, p, out)`` and expect the
+    derivatives to be written into ``out`` so that no memory is allocated
+    in the integration loop.  This wraps a (jitted) ``system(t, y, p)``
+    returning a new array so it can still be passed to the solvers.
+
+    """
+    return _inplace_system(system)
+
+
+@functools.lru_cache()
+def _inplace_system(system):
+    # Cached so repeated adaptation doesn't recompile the wrapper.
+    @numba.njit
+    def _adapted(t, y, p, out):
+        out[:] = system(t, y, p)
+    return _adapted
+
+
+# Ode systems used by the pipeline, for ahead of time compilation.
+SYSTEMS: Dict[str, Callable] = {}
+
+
+def register_system(system: Callable) -> Callable:
+    """Registers a (jitted, in-place) ode system for ahead of time compilation."""
+    py_func = system.py_func
+    SYSTEMS[f'{py_func.__module__}.{py_func.__qualname__}'] = system
+    return system
+
+
+def compile_system(system: Callable) -> None:
+    """Compiles an ode system and the solvers.
+
+    Compiled code is written to numba's on-disk cache, which lives
+    alongside the installed package unless ``NUMBA_CACHE_DIR`` is set.
+    Later processes load it from there rather than compiling it again.
+
+    """
+    _first_class_system(system)
+    for name, signature in _KERNEL_SIGNATURES.items():
+        globals()[name].compile(signature)
+
+
+# The integration kernels below take the ode system as a first class
+# function of this type rather than as a jitted function.  Every jitted
+# function is its own numba type, and kernels specialized on one can't be
+# cached, while with a function type the kernels compile once for all
+# systems.
+_f8, _i8 = types.float64, types.int64
+_SYSTEM_SIGNATURE = types.void(_f8, _f8[:], _f8[:], _f8[:])
+_SYSTEM_TYPE = types.FunctionType(_SYSTEM_SIGNATURE)
+# Signatures of the kernels called from python.  The solvers coerce their
+# inputs to these types so that precompiled kernels are always used.
+_KERNEL_SIGNATURES = {
+    '_rk45': (_SYSTEM_TYPE, _f8[::1], _f8[:, ::1], _f8[:, ::1], _f8),
+    '_solve_ode_batch': (_SYSTEM_TYPE, _f8[::1], _f8[:, ::1], _f8[:, :, ::1], _f8,
+                         _i8[::1], _i8[::1], _f8[:, :, ::1]),
+    '_dopri5': (_SYSTEM_TYPE, _f8[::1], _f8[::1], _f8[:, ::1], _f8, _f8, _f8, _f8[:, ::1]),
+    '_solve_ode_adaptive_batch': (_SYSTEM_TYPE, _f8[::1], _f8[:, ::1], _f8[:, :, ::1], _f8, _f8, _f8,
+                                  _i8[::1], _i8[::1], _f8[:, :, ::1]),
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _first_class_system(system: Callable) -> Callable:
+    """Compiles a jitted ode system to a first class function for the kernels."""
+    py_func = system.py_func
+    # Systems built from closures (e.g. by ``inplace_system``) don't have
+    # unique names, so they can't be safely cached.
+    return numba.cfunc(_SYSTEM_SIGNATURE, cache=py_func.__closure__ is None)(py_func)
+
+
 def solve_ode(system, t, init_cond, params, dt):
+    """Solves an ode system with a fixed step RK4 method.
+
+    ``system(t, y, p, out)`` must write the derivatives of ``y`` into
+    ``out``.  Use ``inplace_system`` to adapt systems returning them.
+
+    """
     t_solve = np.arange(np.min(t), np.max(t) + dt, dt / 2)
-    y_solve = np.zeros((init_cond.size, t_solve.size),
-                       dtype=init_cond.dtype)
+    y_solve = np.zeros((init_cond.size, t_solve.size))
     y_solve[:, 0] = init_cond
     # linear interpolate the parameters
-    params = linear_interpolate(t_solve, t, params)
-    y_solve = _rk45(system, t_solve, y_solve, params, dt)
+    params = np.ascontiguousarray(linear_interpolate(t_solve, t, params), dtype=np.float64)
+    y_solve = _rk45(_first_class_system(system), t_solve, y_solve, params, float(dt))
     # linear interpolate the solutions.
     y_solve = linear_interpolate(t, t_solve, y_solve)
     return y_solve
 
 
-@numba.njit
+def solve_ode_batch(system, t, init_cond, params, dt, start=None, stop=None):
+    """Solves an ode system independently for many locations at once.
+
+    Each location is integrated exactly as ``solve_ode`` would, but all in a
+    single compiled loop rather than a python loop with one call per location.
+
+    Parameters
+    ----------
+    system
+        The (jitted) ode system, as for ``solve_ode``.
+    t
+        The time grid shared by all locations.
+    init_cond
+        Initial conditions, shape (locations x compartments).
+    params
+        System parameters, shape (locations x parameters x time).
+    dt
+        The integration step size.
+    start, stop
+        Optional integer arrays with the index into ``t`` at which each
+        location's solution starts and (exclusive) stops.  Default to the
+        whole of ``t``.
+
+    Returns
+    -------
+        The (locations x compartments x time) solution.  Entries outside
+        each location's ``[start, stop)`` range are NaN.
+
+    """
+    n_locations = init_cond.shape[0]
+    if start is None:
+        start = np.zeros(n_locations, dtype=np.int64)
+    if stop is None:
+        stop = np.full(n_locations, t.size, dtype=np.int64)
+    solution = np.full((n_locations, init_cond.shape[1], t.size), np.nan)
+    _solve_ode_batch(_first_class_system(system),
+                     np.ascontiguousarray(t, dtype=np.float64),
+                     np.ascontiguousarray(init_cond, dtype=np.float64),
+                     np.ascontiguousarray(params, dtype=np.float64),
+                     float(dt),
+                     np.ascontiguousarray(start, dtype=np.int64),
+                     np.ascontiguousarray(stop, dtype=np.int64),
+                     solution)
+    return solution
+
+
+@numba.njit(cache=True)
+def _solve_ode_batch(system, t, init_cond, params, dt, start, stop, solution):
+    n_params = params.shape[1]
+    n_compartments = init_cond.shape[1]
+    for loc in range(init_cond.shape[0]):
+        # Mirror solve_ode for each location.  Times are relative to the
+        # location's own start, which changes nothing for autonomous systems.
+        t_loc = t[start[loc]:stop[loc]] - t[start[loc]]
+        t_solve = np.arange(t_loc.min(), t_loc.max() + dt, dt / 2)
+        y_solve = np.zeros((n_compartments, t_solve.size))
+        y_solve[:, 0] = init_cond[loc]
+        params_solve = np.empty((n_params, t_solve.size))
+        for j in range(n_params):
+            params_solve[j] = np.interp(t_solve, t_loc, params[loc, j, start[loc]:stop[loc]])
+        y_solve = _rk45(system, t_solve, y_solve, params_solve, dt)
+        for j in range(n_compartments):
+            solution[loc, j, start[loc]:stop[loc]] = np.interp(t_loc, t_solve, y_solve[j])
+
+
+@numba.njit(cache=True)
 def _rk45(system,
           t_solve: np.array,
           y_solve: np.array,
           params: np.array,
           dt: float):
+    n = y_solve.shape[0]
+    # Stage buffers are allocated once and reused for every step.
+    k1 = np.empty(n)
+    k2 = np.empty(n)
+    k3 = np.empty(n)
+    k4 = np.empty(n)
+    y_stage = np.empty(n)
     for i in range(2, t_solve.size, 2):
-        k1 = system(t_solve[i - 2], y_solve[:, i - 2], params[:, i - 2])
-        k2 = system(t_solve[i - 1], y_solve[:, i - 2] + dt / 2 * k1, params[:, i - 1])
-        k3 = system(t_solve[i - 1], y_solve[:, i - 2] + dt / 2 * k2, params[:, i - 1])
-        k4 = system(t_solve[i], y_solve[:, i - 2] + dt * k3, params[:, i])
-        y_solve[:, i] = y_solve[:, i - 2] + dt / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+        system(t_solve[i - 2], y_solve[:, i - 2], params[:, i - 2], k1)
+        for j in range(n):
+            y_stage[j] = y_solve[j, i - 2] + dt / 2 * k1[j]
+        system(t_solve[i - 1], y_stage, params[:, i - 1], k2)
+        for j in range(n):
+            y_stage[j] = y_solve[j, i - 2] + dt / 2 * k2[j]
+        system(t_solve[i - 1], y_stage, params[:, i - 1], k3)
+        for j in range(n):
+            y_stage[j] = y_solve[j, i - 2] + dt * k3[j]
+        system(t_solve[i], y_stage, params[:, i], k4)
+        for j in range(n):
+            y_solve[j, i] = y_solve[j, i - 2] + dt / 6 * (k1[j] + 2 * k2[j] + 2 * k3[j] + k4[j])
     return y_solve
 
 
+def solve_ode_adaptive(system, t, init_cond, params, rtol=1e-6, atol=1e-6, max_step=np.inf):
+    """Solves an ode system with an adaptive step Dormand-Prince (RK5(4)) method.
+
+    Step sizes are chosen by local error control rather than fixed, so
+    smooth stretches of the solution are covered in a few large steps
+    while quickly changing ones (e.g. epidemic peaks) get as many small
+    steps as the tolerances require.  The solution is evaluated at ``t``
+    with the method's continuous extension rather than interpolated
+    from a fine grid.
+
+    Parameters
+    ----------
+    system
+        The (jitted) ode system, as for ``solve_ode``.
+    t
+        Increasing times at which to report the solution.
+    init_cond
+        The state at ``t[0]``.
+    params
+        System parameters, shape (parameters x time).  These are linearly
+        interpolated between the points of ``t``.
+    rtol, atol
+        Relative and absolute tolerances on the local error of each step.
+    max_step
+        Upper bound on the step size.
+
+    Returns
+    -------
+        The (compartments x time) solution.  If the step size collapses
+        (e.g. on NaN state or parameters), it is NaN from the first time
+        the integration did not reach.
+
+    """
+    solution = np.zeros((init_cond.size, t.size))
+    _dopri5(_first_class_system(system),
+            np.ascontiguousarray(t, dtype=np.float64),
+            np.ascontiguousarray(init_cond, dtype=np.float64),
+            np.ascontiguousarray(params, dtype=np.float64),
+            float(rtol), float(atol), float(max_step),
+            solution)
+    return solution
+
+
+def solve_ode_adaptive_batch(system, t, init_cond, params, rtol=1e-6, atol=1e-6, max_step=np.inf,
+                             start=None, stop=None):
+    """Solves an ode system adaptively and independently for many locations at once.
+
+    Arguments and output are as for ``solve_ode_batch``, with the step
+    control arguments of ``solve_ode_adaptive`` in place of ``dt``.
+
+    """
+    n_locations = init_cond.shape[0]
+    if start is None:
+        start = np.zeros(n_locations, dtype=np.int64)
+    if stop is None:
+        stop = np.full(n_locations, t.size, dtype=np.int64)
+    solution = np.full((n_locations, init_cond.shape[1], t.size), np.nan)
+    _solve_ode_adaptive_batch(_first_class_system(system),
+                              np.ascontiguousarray(t, dtype=np.float64),
+                              np.ascontiguousarray(init_cond, dtype=np.float64),
+                              np.ascontiguousarray(params, dtype=np.float64),
+                              float(rtol), float(atol), float(max_step),
+                              np.ascontiguousarray(start, dtype=np.int64),
+                              np.ascontiguousarray(stop, dtype=np.int64),
+                              solution)
+    return solution
+
+
+@numba.njit(cache=True)
+def _solve_ode_adaptive_batch(system, t, init_cond, params, rtol, atol, max_step, start, stop, solution):
+    for loc in range(init_cond.shape[0]):
+        t_loc = t[start[loc]:stop[loc]] - t[start[loc]]
+        params_loc = np.ascontiguousarray(params[loc, :, start[loc]:stop[loc]])
+        solution_loc = np.zeros((init_cond.shape[1], t_loc.size))
+        _dopri5(system, t_loc, init_cond[loc], params_loc, rtol, atol, max_step, solution_loc)
+        solution[loc, :, start[loc]:stop[loc]] = solution_loc
+
+
+# Dormand-Prince 5(4) tableau.
+_DP_C = np.array([0., 1 / 5, 3 / 10, 4 / 5, 8 / 9, 1.])
+_DP_A = np.array([
+    [0., 0., 0., 0., 0.],
+    [1 / 5, 0., 0., 0., 0.],
+    [3 / 40, 9 / 40, 0., 0., 0.],
+    [44 / 45, -56 / 15, 32 / 9, 0., 0.],
+    [19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729, 0.],
+    [9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656],
+])
+_DP_B = np.array([35 / 384, 0., 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84])
+# Difference between the 5th and embedded 4th order weights.
+_DP_E = np.array([-71 / 57600, 0., 71 / 16695, -71 / 1920, 17253 / 339200, -22 / 525, 1 / 40])
+# Continuous extension (Shampine, 1986): weights of each stage as a
+# polynomial in the fraction of the step, coefficients of x, x^2, x^3, x^4.
+_DP_P = np.array([
+    [1., -8048581381 / 2820520608, 8663915743 / 2820520608, -12715105075 / 11282082432],
+    [0., 0., 0., 0.],
+    [0., 131558114200 / 32700410799, -68118460800 / 10900136933, 87487479700 / 32700410799],
+    [0., -1754552775 / 470086768, 14199869525 / 1410260304, -10690763975 / 1880347072],
+    [0., 127303824393 / 49829197408, -318862633887 / 49829197408, 701980252875 / 199316789632],
+    [0., -282668133 / 205662961, 2019193451 / 616988883, -1453857185 / 822651844],
+    [0., 40617522 / 29380423, -110615467 / 29380423, 69997945 / 29380423],
+])
+
+_SAFETY = 0.9
+_MIN_FACTOR = 0.2
+_MAX_FACTOR = 10.
+
+
+@numba.njit(cache=True)
+def _interpolate_params(t_org, params, t, out):
+    """Linearly interpolates (parameters x time) params to a single time."""
+    i = min(max(np.searchsorted(t_org, t, side='right') - 1, 0), t_org.size - 2)
+    w = (t - t_org[i]) / (t_org[i + 1] - t_org[i])
+    w = min(max(w, 0.), 1.)
+    for j in range(out.size):
+        out[j] = (1 - w) * params[j, i] + w * params[j, i + 1]
+    return out
+
+
+@numba.njit(cache=True)
+def _error_norm(x, scale):
+    total = 0.
+    for j in range(x.size):
+        total += (x[j] / scale[j])**2
+    return np.sqrt(total / x.size)
+
+
+@numba.njit(cache=True)
+def _initial_step(system, t0, y0, f0, t_org, params, rtol, atol, max_step, p, y1, f1, scale):
+    # Hairer, Norsett, and Wanner, Solving ODEs I, Sec. II.4.
+    for j in range(y0.size):
+        scale[j] = atol + abs(y0[j]) * rtol
+    d0 = _error_norm(y0, scale)
+    d1 = _error_norm(f0, scale)
+    if d0 < 1e-5 or d1 < 1e-5:
+        h0 = 1e-6
+    else:
+        h0 = 0.01 * d0 / d1
+    h0 = min(h0, max_step)
+    for j in range(y0.size):
+        y1[j] = y0[j] + h0 * f0[j]
+    system(t0 + h0, y1, _interpolate_params(t_org, params, t0 + h0, p), f1)
+    for j in range(y0.size):
+        f1[j] -= f0[j]
+    d2 = _error_norm(f1, scale) / h0
+    if max(d1, d2) <= 1e-15:
+        h1 = max(1e-6, h0 * 1e-3)
+    else:
+        h1 = (0.01 / max(d1, d2)) ** (1 / 5)
+    return min(100 * h0, h1, max_step)
+
+
+@numba.njit(cache=True)
+def _dopri5(system, t_org, y0, params, rtol, atol, max_step, solution):
+    """Integrates the system over ``t_org`` writing the dense output to ``solution``.
+
+    Returns the number of accepted steps, or -1 if the step size had to
+    shrink to the floating point resolution of ``t`` (e.g. because the
+    state or derivatives are not finite).  The solution is then NaN from
+    the first report time the integration did not reach.
+    """
+    n = y0.size
+    t_end = t_org[-1]
+    solution[:, 0] = y0
+    if t_org.size == 1:
+        return 0
+
+    # All work arrays are allocated up front and reused for every step.
+    k = np.empty((7, n))
+    y = y0.copy()
+    y_new = np.empty(n)
+    y_stage = np.empty(n)
+    err = np.empty(n)
+    scale = np.empty(n)
+    p = np.empty(params.shape[0])
+
+    t = t_org[0]
+    system(t, y, _interpolate_params(t_org, params, t, p), k[0])
+    h = _initial_step(system, t, y, k[0], t_org, params, rtol, atol, max_step, p, y_stage, err, scale)
+    next_output = 1
+    n_steps = 0
+
+    while t < t_end:
+        # As scipy, give up once a step would be lost in the rounding of t.
+        min_step = 10 * (np.nextafter(t, np.inf) - t)
+        h = min(max(h, min_step), max_step)
+        while True:
+            # Written to also catch a NaN step size.
+            if not h >= min_step:
+                solution[:, next_output:] = np.nan
+                return -1
+            h = min(h, t_end - t)
+            for s in range(1, 6):
+                for j in range(n):
+                    dy = 0.
+                    for m in range(s):
+                        dy += _DP_A[s, m] * k[m, j]
+                    y_stage[j] = y[j] + h * dy
+                t_s = t + _DP_C[s] * h
+                system(t_s, y_stage, _interpolate_params(t_org, params, t_s, p), k[s])
+            for j in range(n):
+                dy = 0.
+                for m in range(6):
+                    dy += _DP_B[m] * k[m, j]
+                y_new[j] = y[j] + h * dy
+            t_new = t + h
+            # First same as last: the final stage is the derivative at the new point.
+            system(t_new, y_new, _interpolate_params(t_org, params, t_new, p), k[6])
+
+            for j in range(n):
+                e = 0.
+                for m in range(7):
+                    e += _DP_E[m] * k[m, j]
+                err[j] = h * e
+                scale[j] = atol + max(abs(y[j]), abs(y_new[j])) * rtol
+            err_norm = _error_norm(err, scale)
+            if err_norm <= 1.:
+                break
+            if np.isfinite(err_norm):
+                h *= max(_MIN_FACTOR, _SAFETY * err_norm ** (-1 / 5))
+            else:
+                h *= _MIN_FACTOR
+
+        # Dense output for all report times covered by this step.
+        while next_output < t_org.size and t_org[next_output] <= t_new:
+            x = (t_org[next_output] - t) / h
+            for j in range(n):
+                dy = 0.
+                for m in range(7):
+                    weight = x * (_DP_P[m, 0] + x * (_DP_P[m, 1] + x * (_DP_P[m, 2] + x * _DP_P[m, 3])))
+                    dy += weight * k[m, j]
+                solution[j, next_output] = y[j] + h * dy
+            next_output += 1
+
+        if err_norm == 0.:
+            factor = _MAX_FACTOR
+        else:
+            factor = min(_MAX_FACTOR, _SAFETY * err_norm ** (-1 / 5))
+        t = t_new
+        y[:] = y_new
+        k[0] = k[6]
+        h *= factor
+        n_steps += 1
+    return n_steps
+
+
 def linear_interpolate(t_target: np.ndarray,
                        t_org: np.ndarray,
                        x_org: np.ndarray) -> np.ndarray:
+    """Linearly interpolates each row of ``x_org`` from ``t_org`` to ``t_target``.
+
+    Equivalent to ``np.interp`` on each row, but the interpolation indices
+    and weights are computed once and shared by every row.
+
+    """
     is_vector = x_org.ndim == 1
     if is_vector:
         x_org = x_org[None, :]
 
     assert t_org.size == x_org.shape[1]
 
-    x_target = np.vstack([
-        np.interp(t_target, t_org, x_org[i])
-        for i in range(x_org.shape[0])
-    ])
+    if t_org.size == 1:
+        x_target = np.repeat(x_org.astype(np.float64), np.size(t_target), axis=1)
+    else:
+        left, weight = _interpolation_weights(np.asarray(t_target, dtype=np.float64),
+                                              np.asarray(t_org, dtype=np.float64))
+        x_target = _interpolate_rows(np.ascontiguousarray(x_org, dtype=np.float64), left, weight)
 
     if is_vector:
         return x_target.ravel()
     else:
         return x_target
+
+
+def _interpolation_weights(t_target: np.ndarray, t_org: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Index of the interval of ``t_org`` containing each target time and the target's position in it.
+
+    Targets outside ``t_org`` are clamped to its ends, as with ``np.interp``.
+    """
+    n = t_org.size
+    step = (t_org[-1] - t_org[0]) / (n - 1)
+    if step > 0 and np.all(np.abs(np.diff(t_org) - step) <= 1e-9 * step):
+        # Uniform grids, e.g. the solver grid, don't need to be searched.
+        left = np.floor((t_target - t_org[0]) / step).astype(np.int64)
+    else:
+        left = np.searchsorted(t_org, t_target, side='right') - 1
+    left = np.clip(left, 0, n - 2)
+    weight = np.clip((t_target - t_org[left]) / (t_org[left + 1] - t_org[left]), 0., 1.)
+    return left, weight
+
+
+@numba.njit(cache=True)
+def _interpolate_rows(x: np.ndarray, left: np.ndarray, weight: np.ndarray) -> np.ndarray:
+    out = np.empty((x.shape[0], left.size))
+    for i in range(x.shape[0]):
+        for j in range(left.size):
+            x_left = x[i, left[j]]
+            out[i, j] = x_left + weight[j] * (x[i, left[j] + 1] - x_left)
+    return out
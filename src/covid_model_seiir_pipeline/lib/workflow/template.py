@@ -50,13 +50,21 @@ class TaskTemplate(abc.ABC):
     def get_task(self, *_, **kwargs) -> Task:
         """Resolve job arguments into a bash executable task for jobmon."""
         task = self.jobmon_template.create_task(
-            executor_parameters=ExecutorParameters(**self.params),
+            executor_parameters=ExecutorParameters(**self.get_params(**kwargs)),
             name=self.task_name_template.format(**kwargs),
             max_attempts=1,
             **kwargs,
         )
         return task
 
+    def get_params(self, **kwargs) -> Dict:
+        """Executor parameters for a task with the given job arguments.
+
+        Subclasses may override this to size individual tasks.
+
+        """
+        return self.params
+
 
 TTaskTemplate = TypeVar('TTaskTemplate', bound=TaskTemplate)
 
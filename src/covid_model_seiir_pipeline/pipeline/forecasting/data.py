@@ -4,6 +4,7 @@ from pathlib import Path
 from typing import Dict, List, Union
 
 from loguru import logger
+import numpy as np
 import pandas as pd
 
 from covid_model_seiir_pipeline.lib import (
@@ -39,14 +40,20 @@ class ForecastDataInterface:
         self.covariate_root = covariate_root
         self.forecast_root = forecast_root
         self.fh_subnationals = fh_subnationals
+        # Built on first use from the regression specification and then
+        # carried along (including to pool workers when pickled).
+        self._regression_data_interface = None
 
     @classmethod
     def from_specification(cls, specification: ForecastSpecification) -> 'ForecastDataInterface':
-        # TODO: specify input format from config
-        regression_root = io.RegressionRoot(specification.data.regression_version)
+        # The regression outputs are written in whatever format the
+        # regression specification asked for.
+        regression_spec = io.load(io.RegressionRoot(specification.data.regression_version).specification())
+        regression_root = io.RegressionRoot(specification.data.regression_version,
+                                            data_format=regression_spec['data'].get('data_format', 'csv'))
         covariate_root = io.CovariateRoot(specification.data.covariate_version)
-        # TODO: specify output format from config.
-        forecast_root = io.ForecastRoot(specification.data.output_root)
+        forecast_root = io.ForecastRoot(specification.data.output_root,
+                                        data_format=specification.data.data_format)
 
         return cls(
             regression_root=regression_root,
@@ -154,7 +161,8 @@ class ForecastDataInterface:
 
     def load_covariate(self, covariate: str, covariate_version: str, location_ids: List[int],
                        with_observed: bool = False) -> pd.DataFrame:
-        covariate_df = io.load(self.covariate_root[covariate](covariate_scenario=covariate_version))
+        covariate_df = io.load(self.covariate_root[covariate](covariate_scenario=covariate_version),
+                               location_ids=location_ids)
         covariate_df = self._format_covariate_data(covariate_df, location_ids, with_observed)
         covariate_df = (covariate_df
                         .rename(columns={f'{covariate}_{covariate_version}': covariate})
@@ -251,11 +259,11 @@ class ForecastDataInterface:
         return scenario_data
 
     def load_mobility_info(self, info_type: str, location_ids: List[int]):
-        info_df = io.load(self.covariate_root.mobility_info(info_type=info_type))
+        info_df = io.load(self.covariate_root.mobility_info(info_type=info_type), location_ids=location_ids)
         return self._format_covariate_data(info_df, location_ids)
 
     def load_vaccine_info(self, info_type: str, location_ids: List[int]):
-        info_df = io.load(self.covariate_root.vaccine_info(info_type=info_type))
+        info_df = io.load(self.covariate_root.vaccine_info(info_type=info_type), location_ids=location_ids)
         return self._format_covariate_data(info_df, location_ids)
 
     ##############################
@@ -283,13 +291,12 @@ class ForecastDataInterface:
                              transition_dates: pd.Series,
                              max_date: pd.Timestamp) -> VariantScalars:
         if not variant_specification:
-            idx = (transition_dates
-                   .groupby('location_id')
-                   .apply(lambda x: pd.date_range(x.iloc[0], max_date, name='date'))
-                   .explode()
-                   .reset_index()
-                   .set_index(['location_id', 'date'])
-                   .index)
+            transition_dates = transition_dates.sort_index()
+            n_dates = (max_date - transition_dates).dt.days.to_numpy() + 1
+            location_ids = np.repeat(transition_dates.index.to_numpy(), n_dates)
+            days_since_transition = np.arange(n_dates.sum()) - np.repeat(np.cumsum(n_dates) - n_dates, n_dates)
+            dates = np.repeat(transition_dates.to_numpy(), n_dates) + days_since_transition.astype('timedelta64[D]')
+            idx = pd.MultiIndex.from_arrays([location_ids, dates], names=['location_id', 'date'])
             return VariantScalars(
                 beta=pd.Series(1, index=idx),
                 ifr=pd.Series(1, index=idx),
@@ -311,23 +318,21 @@ class ForecastDataInterface:
         beta_increase = variant_specification.get('beta_scalar', 1.)
         ifr_increase = variant_specification.get('ifr_scalar', 1.)
 
-        betas = []
-        ifrs = []
-        for location_id in transition_dates.index:
-            scalar_date_start = transition_dates.loc[location_id]
-            loc_prevalence = variant_prevalence.loc[location_id]
-            loc_prevalence = loc_prevalence.loc[scalar_date_start:max_date]
-            # We care about the increase relative to forecast start
-            loc_prevalence -= loc_prevalence.loc[scalar_date_start]
-            loc_prevalence = loc_prevalence.reset_index()
-            loc_prevalence['location_id'] = location_id
-            loc_prevalence = loc_prevalence.set_index(['location_id', 'date']).proportion
-
-            betas.append(loc_prevalence*beta_increase + (1 - loc_prevalence))
-            ifrs.append(loc_prevalence*ifr_increase + (1 - loc_prevalence))
+        location_ids = variant_prevalence.index.get_level_values('location_id')
+        dates = variant_prevalence.index.get_level_values('date')
+        scalar_date_start = transition_dates.reindex(location_ids).to_numpy()
+        in_window = (scalar_date_start <= dates) & (dates <= max_date)
+        # We care about the increase relative to forecast start
+        start_prevalence = variant_prevalence[in_window & (dates == scalar_date_start)].droplevel('date')
+        missing_locations = transition_dates.index.difference(start_prevalence.index)
+        if not missing_locations.empty:
+            raise KeyError(f'No variant prevalence on the transition date for locations {missing_locations.tolist()}.')
+        variant_prevalence = variant_prevalence[in_window]
+        variant_prevalence -= start_prevalence.reindex(location_ids[in_window]).to_numpy()
+
         return VariantScalars(
-            beta=pd.concat(betas).sort_index(),
-            ifr=pd.concat(ifrs).sort_index(),
+            beta=(variant_prevalence*beta_increase + (1 - variant_prevalence)).sort_index(),
+            ifr=(variant_prevalence*ifr_increase + (1 - variant_prevalence)).sort_index(),
         )
 
     def get_infectionator_metadata(self):
@@ -344,7 +349,7 @@ class ForecastDataInterface:
             full_data_path = Path(model_inputs_version) / 'full_data_fh_subnationals.csv'
         else:
             full_data_path = Path(model_inputs_version) / 'full_data.csv'
-        full_data = pd.read_csv(full_data_path)
+        full_data = io.read_csv(full_data_path)
         full_data['date'] = pd.to_datetime(full_data['Date'])
         full_data = full_data.drop(columns=['Date'])
         full_data['location_id'] = full_data['location_id'].astype(int)
@@ -370,6 +375,10 @@ class ForecastDataInterface:
     # Forecast data I/O #
     #####################
 
+    def write_session(self):
+        """Keeps forecast output containers open across a task's writes."""
+        return io.session(self.forecast_root)
+
     def save_specification(self, specification: ForecastSpecification) -> None:
         io.dump(specification.to_dict(), self.forecast_root.specification())
 
@@ -424,6 +433,7 @@ class ForecastDataInterface:
         return dataset.set_index(index_columns)
 
     def _get_regression_data_interface(self) -> RegressionDataInterface:
-        regression_spec = RegressionSpecification.from_dict(io.load(self.regression_root.specification()))
-        regression_di = RegressionDataInterface.from_specification(regression_spec)
-        return regression_di
+        if self._regression_data_interface is None:
+            regression_spec = RegressionSpecification.from_dict(io.load(self.regression_root.specification()))
+            self._regression_data_interface = RegressionDataInterface.from_specification(regression_spec)
+        return self._regression_data_interface
@@ -27,7 +27,8 @@ def do_beta_forecast(app_metadata: cli_tools.Metadata,
         n_draws = data_interface.get_n_draws()
 
         forecast_wf.attach_tasks(n_draws=n_draws,
-                                 scenarios=forecast_specification.scenarios)
+                                 scenarios=forecast_specification.scenarios,
+                                 draws_per_task=forecast_specification.workflow.draws_per_task)
         try:
             forecast_wf.run()
         except WorkflowAlreadyComplete:
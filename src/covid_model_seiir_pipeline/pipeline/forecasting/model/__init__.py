@@ -4,11 +4,13 @@ from covid_model_seiir_pipeline.pipeline.forecasting.model.containers import (
     HospitalMetrics,
     HospitalCorrectionFactors,
     CompartmentInfo,
+    ForecastCube,
     ScenarioData,
     OutputMetrics,
     VariantScalars,
 )
 from covid_model_seiir_pipeline.pipeline.forecasting.model.ode_forecast import (
+    run_normal_ode_model,
     run_normal_ode_model_by_location,
     forecast_beta,
     forecast_correction_factors,
@@ -19,6 +21,8 @@ from covid_model_seiir_pipeline.pipeline.forecasting.model.ode_forecast import (
 from covid_model_seiir_pipeline.pipeline.forecasting.model.forecast_metrics import (
     compute_output_metrics,
     compute_corrected_hospital_usage,
+    update_output_metrics,
+    update_hospital_usage,
 )
 from covid_model_seiir_pipeline.pipeline.forecasting.model.mandate_reimposition import (
     compute_reimposition_threshold,
@@ -1,6 +1,7 @@
 from dataclasses import dataclass
-from typing import Dict, List, Union
+from typing import Dict, List, Tuple, Union
 
+import numpy as np
 import pandas as pd
 
 from covid_model_seiir_pipeline.lib import (
@@ -17,9 +18,217 @@ from covid_model_seiir_pipeline.pipeline.regression.model.containers import (
 )
 
 
+@dataclass
+class ForecastCube:
+    """Dense (location x date x field) data on a shared date axis.
+
+    Location ``location_ids[i]`` has data on the dates
+    ``dates[start[i]:stop[i]]``.  Values outside of each location's range
+    are NaN.  Data is converted to and from long (location_id, date)
+    frames only when reading and writing.
+
+    """
+    location_ids: pd.Index
+    dates: pd.DatetimeIndex
+    fields: List[str]
+    values: np.ndarray
+    start: np.ndarray
+    stop: np.ndarray
+
+    @classmethod
+    def from_frame(cls, data: pd.DataFrame, fields: List[str] = None,
+                   location_ids: List[int] = None) -> 'ForecastCube':
+        """Builds a cube from data with location_id and date columns or index levels.
+
+        Each location's dates are assumed to be consecutive days.  Locations
+        default to the sorted locations in the data.  Data for other
+        locations is dropped.
+
+        """
+        data = data.reset_index()
+        if fields is None:
+            fields = [c for c in data.columns if c not in ['location_id', 'date', 'index']]
+        if location_ids is None:
+            location_ids = np.sort(data['location_id'].unique())
+        location_ids = pd.Index(location_ids, name='location_id')
+        dates = pd.DatetimeIndex(np.sort(data['date'].unique()), name='date')
+
+        location_idx = location_ids.get_indexer(data['location_id'])
+        keep = location_idx >= 0
+        location_idx = location_idx[keep]
+        date_idx = dates.get_indexer(data.loc[keep, 'date'])
+
+        values = np.full((len(location_ids), len(dates), len(fields)), np.nan)
+        values[location_idx, date_idx] = data.loc[keep, fields].to_numpy(dtype=np.float64)
+        start = np.full(len(location_ids), len(dates), dtype=np.int64)
+        stop = np.zeros(len(location_ids), dtype=np.int64)
+        np.minimum.at(start, location_idx, date_idx)
+        np.maximum.at(stop, location_idx, date_idx + 1)
+        start = np.minimum(start, stop)
+        return cls(location_ids, dates, list(fields), values, start, stop)
+
+    def __getitem__(self, field: Union[str, List[str]]) -> np.ndarray:
+        """(location x date) values of a field or (location x date x field) values of fields."""
+        if isinstance(field, str):
+            return self.values[:, :, self.fields.index(field)]
+        return self.values[:, :, [self.fields.index(f) for f in field]]
+
+    @property
+    def index(self) -> pd.MultiIndex:
+        """The (location_id, date) pairs with data, in location then date order."""
+        location_idx, date_idx = self._valid_idx()
+        return pd.MultiIndex.from_arrays([self.location_ids[location_idx], self.dates[date_idx]],
+                                         names=['location_id', 'date'])
+
+    def to_frame(self, fields: List[str] = None, date_index: bool = False) -> pd.DataFrame:
+        """Converts the cube to a long frame.
+
+        The frame is indexed by location_id with a leading date column, or by
+        (location_id, date) if ``date_index`` is set.
+
+        """
+        fields = self.fields if fields is None else list(fields)
+        location_idx, date_idx = self._valid_idx()
+        data = pd.DataFrame(
+            self[fields][location_idx, date_idx],
+            columns=fields,
+            index=pd.Index(self.location_ids[location_idx], name='location_id'),
+        )
+        data.insert(0, 'date', self.dates[date_idx])
+        if date_index:
+            data = data.set_index('date', append=True)
+        return data
+
+    @property
+    def valid(self) -> np.ndarray:
+        """(location x date) mask of the dates with data for each location."""
+        date_idx = np.arange(len(self.dates))
+        return (self.start[:, None] <= date_idx) & (date_idx < self.stop[:, None])
+
+    def to_grid(self, data: pd.Series) -> np.ndarray:
+        """Lays a (location_id, date) indexed series out on the cube's (location x date) grid.
+
+        Values with locations or dates not in the cube are dropped, and
+        the grid is NaN where the series has no value.
+
+        """
+        location_idx = self.location_ids.get_indexer(data.index.get_level_values('location_id'))
+        date_idx = self.dates.get_indexer(data.index.get_level_values('date'))
+        keep = (location_idx >= 0) & (date_idx >= 0)
+        grid = np.full((len(self.location_ids), len(self.dates)), np.nan)
+        grid[location_idx[keep], date_idx[keep]] = data.to_numpy(dtype=np.float64)[keep]
+        return grid
+
+    def to_series(self, values: np.ndarray, name: str = None) -> pd.Series:
+        """Converts (location x date) values on the cube's grid to a (location_id, date) indexed series."""
+        location_idx, date_idx = self._valid_idx()
+        return pd.Series(values[location_idx, date_idx], index=self.index, name=name)
+
+    def select(self, fields: List[str]) -> 'ForecastCube':
+        """A cube with only the given fields.  Fields not in the cube are all NaN."""
+        return self.reindex(self.location_ids, self.dates, list(fields))
+
+    def at(self, dates: pd.Series) -> pd.DataFrame:
+        """(location x field) values on a date per location, for a location_id indexed series of dates."""
+        location_idx = self.location_ids.get_indexer(dates.index)
+        date_idx = self.dates.get_indexer(dates)
+        if np.any(location_idx < 0) or np.any(date_idx < 0):
+            raise KeyError('Not all locations and dates are in the cube.')
+        return pd.DataFrame(self.values[location_idx, date_idx], columns=self.fields,
+                            index=pd.Index(dates.index, name='location_id'))
+
+    def truncate(self, end_dates: pd.Series) -> 'ForecastCube':
+        """Drops data on or after each location's end date, for a location_id indexed series of dates."""
+        end = self.dates.searchsorted(end_dates.reindex(self.location_ids))
+        stop = np.clip(end, self.start, self.stop)
+        values = self.values.copy()
+        values[np.arange(len(self.dates)) >= stop[:, None]] = np.nan
+        return ForecastCube(self.location_ids, self.dates, self.fields, values, self.start.copy(), stop)
+
+    def splice(self, other: 'ForecastCube') -> 'ForecastCube':
+        """A cube with the data in ``other`` written over the data in this cube.
+
+        Locations, dates, and fields are the union of those in both cubes.
+        Each location's dates are assumed to remain consecutive.
+
+        """
+        new_locations = other.location_ids.difference(self.location_ids, sort=False)
+        location_ids = self.location_ids.append(new_locations)
+        dates = self.dates.union(other.dates)
+        fields = self.fields + [f for f in other.fields if f not in self.fields]
+        cube = self.reindex(location_ids, dates, fields)
+        cube.update(other)
+        return cube
+
+    def update(self, other: 'ForecastCube') -> None:
+        """Writes the data in ``other`` over the data in this cube, in place.
+
+        The locations, dates, and fields of ``other`` must all be in this cube.
+        Each location's dates are assumed to remain consecutive.
+
+        """
+        location_map = self.location_ids.get_indexer(other.location_ids)
+        date_map = self.dates.get_indexer(other.dates)
+        if np.any(location_map < 0) or np.any(date_map < 0) or not set(other.fields).issubset(self.fields):
+            raise KeyError('Not all locations, dates, and fields are in the cube.')
+
+        other_location_idx, other_date_idx = other._valid_idx()
+        field_idx = [self.fields.index(f) for f in other.fields]
+        self.values[location_map[other_location_idx][:, None],
+                    date_map[other_date_idx][:, None],
+                    field_idx] = other.values[other_location_idx, other_date_idx]
+
+        has_data = other.stop > other.start
+        location_idx = location_map[has_data]
+        other_start = date_map[other.start[has_data]]
+        other_stop = date_map[other.stop[has_data] - 1] + 1
+        empty = self.stop[location_idx] == self.start[location_idx]
+        self.start[location_idx] = np.where(empty, other_start, np.minimum(self.start[location_idx], other_start))
+        self.stop[location_idx] = np.where(empty, other_stop, np.maximum(self.stop[location_idx], other_stop))
+
+    def subset(self, location_ids: List[int]) -> 'ForecastCube':
+        """A cube with only the given locations."""
+        return self.reindex(pd.Index(location_ids, name='location_id'), self.dates, self.fields)
+
+    def reindex(self, location_ids: pd.Index, dates: pd.DatetimeIndex, fields: List[str] = None) -> 'ForecastCube':
+        """The cube on new locations, dates, and fields, which are NaN where missing.
+
+        The new dates must include all of the cube's dates.
+
+        """
+        fields = self.fields if fields is None else list(fields)
+        location_idx = self.location_ids.get_indexer(location_ids)
+        date_map = dates.get_indexer(self.dates)
+        if np.any(date_map < 0):
+            raise KeyError('Not all dates in the cube are in the new dates.')
+        field_idx = np.array([self.fields.index(f) if f in self.fields else -1 for f in fields], dtype=np.int64)
+
+        values = np.full((len(location_ids), len(dates), len(fields)), np.nan)
+        has_location = location_idx >= 0
+        has_field = field_idx >= 0
+        values[np.ix_(has_location, date_map, has_field)] = (
+            self.values[np.ix_(location_idx[has_location], np.arange(len(self.dates)), field_idx[has_field])]
+        )
+
+        start = np.zeros(len(location_ids), dtype=np.int64)
+        stop = np.zeros(len(location_ids), dtype=np.int64)
+        old_start, old_stop = self.start[location_idx[has_location]], self.stop[location_idx[has_location]]
+        has_data = old_stop > old_start
+        start[np.flatnonzero(has_location)[has_data]] = date_map[old_start[has_data]]
+        stop[np.flatnonzero(has_location)[has_data]] = date_map[old_stop[has_data] - 1] + 1
+        return ForecastCube(location_ids, dates, fields, values, start, stop)
+
+    def _valid_idx(self) -> Tuple[np.ndarray, np.ndarray]:
+        lengths = self.stop - self.start
+        location_idx = np.repeat(np.arange(len(self.location_ids)), lengths)
+        offsets = np.repeat(np.cumsum(lengths) - lengths - self.start, lengths)
+        date_idx = np.arange(lengths.sum()) - offsets
+        return location_idx, date_idx
+
+
 @dataclass
 class OutputMetrics:
-    components: pd.DataFrame
+    components: ForecastCube
     deaths: pd.DataFrame
     infections: pd.DataFrame
     r_controlled: pd.DataFrame
@@ -1,10 +1,13 @@
+import dataclasses
 from typing import Dict, List, Tuple, Union, TYPE_CHECKING
 
+import numpy as np
 import pandas as pd
 
 from covid_model_seiir_pipeline.lib import math
 from covid_model_seiir_pipeline.pipeline.forecasting.model.containers import (
     CompartmentInfo,
+    ForecastCube,
     HospitalFatalityRatioData,
     HospitalCorrectionFactors,
     HospitalMetrics,
@@ -24,11 +27,53 @@ if TYPE_CHECKING:
 
 def compute_output_metrics(infection_data: pd.DataFrame,
                            ifr: pd.DataFrame,
-                           components_past: pd.DataFrame,
-                           components_forecast: pd.DataFrame,
+                           components_past: ForecastCube,
+                           components_forecast: ForecastCube,
                            seir_params: Dict[str, float],
-                           compartment_info: CompartmentInfo) -> OutputMetrics:
+                           compartment_info: CompartmentInfo,
+                           vectorized: bool = True) -> OutputMetrics:
+    """Computes infections, deaths, and R from the past and forecast components.
+
+    With ``vectorized``, metrics are computed directly on the (location x date)
+    component arrays.  Otherwise they're computed from long frames with the
+    original pandas implementation.
+
+    """
     components = splice_components(components_past, components_forecast)
+    compute_epi_metrics = _compute_epi_metrics_arrays if vectorized else _compute_epi_metrics_frames
+    infections, deaths, r_controlled, r_effective = compute_epi_metrics(
+        infection_data,
+        ifr,
+        components_past,
+        components,
+        seir_params,
+        compartment_info,
+    )
+
+    susceptible_columns = [c for c in components.fields if 'S' in c]
+    immune_columns = [c for c in components.fields if 'M' in c or 'R' in c]
+    return OutputMetrics(
+        components=components,
+        infections=infections,
+        deaths=deaths,
+        r_controlled=r_controlled,
+        r_effective=r_effective,
+        herd_immunity=(1 - 1 / r_controlled).rename('herd_immunity'),
+        total_susceptible=components.to_series(np.nansum(components[susceptible_columns], axis=-1),
+                                               name='total_susceptible'),
+        total_immune=components.to_series(np.nansum(components[immune_columns], axis=-1),
+                                          name='total_immune'),
+    )
+
+
+def _compute_epi_metrics_frames(infection_data: pd.DataFrame,
+                                ifr: pd.DataFrame,
+                                components_past: ForecastCube,
+                                components_cube: ForecastCube,
+                                seir_params: Dict[str, float],
+                                compartment_info: CompartmentInfo) -> Tuple[pd.DataFrame, pd.DataFrame,
+                                                                            pd.Series, pd.Series]:
+    components = components_cube.to_frame()
 
     infection_death_lag = int(ifr['duration'].max())
     if compartment_info.group_suffixes:
@@ -48,7 +93,7 @@ def compute_output_metrics(infection_data: pd.DataFrame,
         )
         modeled_deaths = compute_deaths(vulnerable_infections, infection_death_lag, ifr['ifr'])
     
-    past_infecs_idx = components_past.set_index('date', append=True).index
+    past_infecs_idx = components_past.index
     modeled_infections = modeled_infections.to_frame()
     modeled_deaths = modeled_deaths.reset_index(level='observed')
     infection_data = infection_data.set_index(['location_id', 'date'])
@@ -61,19 +106,60 @@ def compute_output_metrics(infection_data: pd.DataFrame,
         seir_params,
         compartment_info.compartments
     )
-    components = components.set_index('date', append=True)
-    susceptible_columns = [c for c in components.columns if 'S' in c]
-    immune_columns = [c for c in components.columns if 'M' in c or 'R' in c]
-    return OutputMetrics(
-        components=components,
-        infections=infections,
-        deaths=deaths,
-        r_controlled=r_controlled,
-        r_effective=r_effective,
-        herd_immunity=(1 - 1 / r_controlled).rename('herd_immunity'),
-        total_susceptible=components[susceptible_columns].sum(axis=1).rename('total_susceptible'),
-        total_immune=components[immune_columns].sum(axis=1).rename('total_immune'),
+    return infections, deaths, r_controlled, r_effective
+
+
+def _compute_epi_metrics_arrays(infection_data: pd.DataFrame,
+                                ifr: pd.DataFrame,
+                                components_past: ForecastCube,
+                                components: ForecastCube,
+                                seir_params: Dict[str, float],
+                                compartment_info: CompartmentInfo) -> Tuple[pd.DataFrame, pd.DataFrame,
+                                                                            pd.Series, pd.Series]:
+    valid = components.valid
+    infection_data = infection_data.set_index(['location_id', 'date'])
+
+    infection_death_lag = int(ifr['duration'].max())
+    if compartment_info.group_suffixes:
+        groups = [([c for c in compartment_info.compartments if group in c], ifr[f'ifr_{group}'])
+                  for group in compartment_info.group_suffixes]
+    else:
+        groups = [(compartment_info.compartments, ifr['ifr'])]
+
+    modeled_infections, modeled_deaths = 0., 0.
+    has_modeled_deaths = np.zeros_like(valid)
+    for group_compartments, group_ifr in groups:
+        group_infections, vulnerable_infections = _compute_infections_arrays(components, group_compartments, valid)
+        group_deaths = _shift(vulnerable_infections, infection_death_lag) * components.to_grid(group_ifr)
+        modeled_infections = modeled_infections + group_infections
+        modeled_deaths = modeled_deaths + group_deaths
+        has_modeled_deaths |= ~np.isnan(group_deaths)
+
+    # Observed infections replace modeled infections in the past.
+    past = components_past.reindex(components.location_ids, components.dates, fields=[]).valid
+    observed_infections = components.to_grid(infection_data['infections'])
+    use_observed = past & ~np.isnan(observed_infections)
+    infections = components.to_series(
+        np.where(use_observed, observed_infections, modeled_infections), name='infections'
+    ).to_frame()
+
+    # And observed deaths replace modeled deaths wherever we have them.
+    observed_deaths = infection_data[['deaths']].fillna(0)
+    observed_deaths['observed'] = 1
+    has_observed_deaths = ~np.isnan(components.to_grid(observed_deaths['observed']))
+    location_idx, date_idx = np.nonzero(has_modeled_deaths & ~has_observed_deaths)
+    modeled_deaths = pd.DataFrame(
+        {'deaths': modeled_deaths[location_idx, date_idx], 'observed': 0},
+        index=pd.MultiIndex.from_arrays([components.location_ids[location_idx], components.dates[date_idx]],
+                                        names=['location_id', 'date']),
     )
+    deaths = pd.concat([observed_deaths, modeled_deaths]).sort_index()
+
+    r_controlled, r_effective = _compute_effective_r_arrays(components, seir_params,
+                                                            compartment_info.compartments, valid)
+    return (infections, deaths,
+            components.to_series(r_controlled, name='r_controlled'),
+            components.to_series(r_effective, name='r_effective'))
 
 
 def compute_corrected_hospital_usage(all_age_deaths: pd.DataFrame,
@@ -87,19 +173,87 @@ def compute_corrected_hospital_usage(all_age_deaths: pd.DataFrame,
         hospital_fatality_ratio,
         hospital_parameters,
     )
-    hospital_usage.hospital_census = (hospital_usage.hospital_census * correction_factors.hospital_census).fillna(method='ffill')
-    hospital_usage.icu_census = (hospital_usage.icu_census * correction_factors.icu_census).fillna(method='ffill')
-    hospital_usage.ventilator_census = (hospital_usage.ventilator_census * correction_factors.ventilator_census).fillna(method='ffill')
+    hospital_usage.hospital_census = _correct_census(hospital_usage.hospital_census,
+                                                     correction_factors.hospital_census)
+    hospital_usage.icu_census = _correct_census(hospital_usage.icu_census,
+                                                correction_factors.icu_census)
+    hospital_usage.ventilator_census = _correct_census(hospital_usage.ventilator_census,
+                                                       correction_factors.ventilator_census)
     return hospital_usage
 
 
-def splice_components(components_past: pd.DataFrame, components_forecast: pd.DataFrame):
-    components_past = components_past.reindex(components_forecast.columns, axis='columns').reset_index()
-    components_forecast = components_forecast.reset_index()
-    components = (pd.concat([components_past, components_forecast])
-                  .sort_values(['location_id', 'date'])
-                  .set_index(['location_id']))
-    return components
+def _correct_census(census: pd.Series, correction_factor: pd.Series) -> pd.Series:
+    """Scales census by the correction factor, filling forward within locations.
+
+    Equivalent to ``(census * correction_factor).groupby('location_id').ffill()``,
+    but done on a (location x date) grid rather than by aligning the indices.
+    Filling within locations means results for a location don't depend on
+    which other locations are computed alongside it.
+
+    """
+    location_ids = (census.index.get_level_values('location_id').unique()
+                    .union(correction_factor.index.get_level_values('location_id').unique()))
+    dates = (census.index.get_level_values('date').unique()
+             .union(correction_factor.index.get_level_values('date').unique()))
+
+    def _to_grid(data: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+        location_idx = location_ids.get_indexer(data.index.get_level_values('location_id'))
+        date_idx = dates.get_indexer(data.index.get_level_values('date'))
+        grid = np.full((len(location_ids), len(dates)), np.nan)
+        grid[location_idx, date_idx] = data.to_numpy(dtype=np.float64)
+        has_data = np.zeros(grid.shape, dtype=bool)
+        has_data[location_idx, date_idx] = True
+        return grid, has_data
+
+    census, has_census = _to_grid(census)
+    correction_factor, has_correction_factor = _to_grid(correction_factor)
+    corrected = census * correction_factor
+    last_value_idx = np.where(np.isnan(corrected), 0, np.arange(len(dates)))
+    np.maximum.accumulate(last_value_idx, axis=1, out=last_value_idx)
+    corrected = np.take_along_axis(corrected, last_value_idx, axis=1)
+
+    location_idx, date_idx = np.nonzero(has_census | has_correction_factor)
+    index = pd.MultiIndex(levels=[location_ids, dates], codes=[location_idx, date_idx],
+                          names=['location_id', 'date'], verify_integrity=False)
+    return pd.Series(corrected[location_idx, date_idx], index=index)
+
+
+def update_output_metrics(output_metrics: OutputMetrics, update: OutputMetrics) -> OutputMetrics:
+    """Writes output metrics recomputed for some locations over the output metrics for all locations."""
+    output_metrics.components.update(update.components)
+    return OutputMetrics(**{
+        field.name: _update_locations(getattr(output_metrics, field.name), getattr(update, field.name))
+        for field in dataclasses.fields(OutputMetrics) if field.name != 'components'
+    }, components=output_metrics.components)
+
+
+def update_hospital_usage(hospital_usage: HospitalMetrics, update: HospitalMetrics) -> HospitalMetrics:
+    """Writes hospital usage recomputed for some locations over the hospital usage for all locations."""
+    return HospitalMetrics(**{
+        field.name: _update_locations(getattr(hospital_usage, field.name), getattr(update, field.name))
+        for field in dataclasses.fields(HospitalMetrics)
+    })
+
+
+def _update_locations(data: Union[pd.DataFrame, pd.Series],
+                      update: Union[pd.DataFrame, pd.Series]) -> Union[pd.DataFrame, pd.Series]:
+    # Rows for the updated locations are usually the same as before, in which
+    # case we write over them in place rather than rebuilding the index.
+    locations = update.index.get_level_values('location_id').unique()
+    in_update = data.index.get_level_values('location_id').isin(locations)
+    if in_update.sum() == len(update) and data.index[in_update].equals(update.index):
+        rows = np.flatnonzero(in_update)
+        if isinstance(data, pd.DataFrame):
+            for column_idx, column in enumerate(data.columns):
+                data.iloc[rows, column_idx] = update[column].to_numpy()
+        else:
+            data.iloc[rows] = update.to_numpy()
+        return data
+    return pd.concat([data[~in_update], update]).sort_index()
+
+
+def splice_components(components_past: ForecastCube, components_forecast: ForecastCube) -> ForecastCube:
+    return components_past.select(components_forecast.fields).splice(components_forecast)
 
 
 def compute_infections(components: pd.DataFrame) -> Tuple[pd.Series, pd.Series]:
@@ -167,3 +321,57 @@ def compute_effective_r(components: pd.DataFrame,
     r_effective = (r_controlled * susceptible / n).rename('r_effective')
 
     return r_controlled, r_effective
+
+
+def _compute_infections_arrays(components: ForecastCube,
+                               compartments: List[str],
+                               valid: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(location x date) arrays of new infections, matching ``compute_infections``."""
+    def _get_daily_subgroup(sub_group_columns: List[str]) -> Union[np.ndarray, float]:
+        if not sub_group_columns:
+            return 0.
+        total = components[sub_group_columns].sum(axis=-1)
+        # The cube is NaN before each location's first date, so this is the
+        # within location shift(1) - x.
+        daily_data = _shift(total, 1) - total
+        return np.where(np.isnan(daily_data), 0., daily_data)
+
+    susceptible_columns = [c for c in compartments if 'S' in c]
+    newE_protected_columns = [c for c in compartments if '_p' in c and 'S' not in c]
+    immune_cols = [c for c in compartments if 'M' in c]
+
+    delta_susceptible = _get_daily_subgroup(susceptible_columns)
+    delta_newE_protected = _get_daily_subgroup(newE_protected_columns)
+    delta_immune = _get_daily_subgroup(immune_cols)
+
+    modeled_infections = np.where(valid, delta_susceptible + delta_immune, np.nan)
+    vulnerable_infections = np.where(valid, modeled_infections + delta_newE_protected, np.nan)
+    return modeled_infections, vulnerable_infections
+
+
+def _compute_effective_r_arrays(components: ForecastCube,
+                                beta_params: Dict[str, float],
+                                compartments: List[str],
+                                valid: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(location x date) arrays of R, matching ``compute_effective_r``."""
+    alpha, sigma = beta_params['alpha'], beta_params['sigma']
+    gamma1, gamma2 = beta_params['gamma1'], beta_params['gamma2']
+
+    beta, theta = components['beta'], components['theta']
+    theta = np.where(np.isnan(theta), 0., theta)
+    susceptible = np.nansum(components[[c for c in compartments if 'S' in c]], axis=-1)
+    infected = np.nansum(components[[c for c in compartments if 'I' in c]], axis=-1)
+    n = np.where(valid, np.nansum(components[compartments], axis=-1), -np.inf).max(axis=1, keepdims=True)
+    avg_gamma = 1 / (1 / (gamma1*(sigma - theta)) + 1 / (gamma2*(sigma - theta)))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r_controlled = beta * alpha * sigma / avg_gamma * infected ** (alpha - 1)
+    r_effective = r_controlled * susceptible / n
+    return r_controlled, r_effective
+
+
+def _shift(data: np.ndarray, periods: int) -> np.ndarray:
+    """Shifts (location x date) data forward in time, filling with NaN."""
+    shifted = np.full_like(data, np.nan)
+    shifted[:, periods:] = data[:, :data.shape[1] - periods]
+    return shifted
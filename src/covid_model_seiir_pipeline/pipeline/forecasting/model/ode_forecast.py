@@ -14,6 +14,7 @@ from covid_model_seiir_pipeline.lib import (
 from covid_model_seiir_pipeline.pipeline.forecasting.model.containers import (
     HospitalCorrectionFactors,
     CompartmentInfo,
+    ForecastCube,
     ScenarioData,
 )
 
@@ -51,18 +52,9 @@ def forecast_correction_factors(correction_factors: HospitalCorrectionFactors,
 
     new_cfs = {}
     for cf_name, cf in utilities.asdict(correction_factors).items():
-        loc_cfs = []
-        for loc_id in today.index:
-            loc_cf = cf.loc[loc_id]
-            loc_today = today.loc[loc_id]
-            mean_cf = loc_cf.loc[loc_today - averaging_window: loc_today].mean()
-            loc_cf = loc_cf.loc[:loc_today]
-            loc_cf.loc[loc_today + application_window] = mean_cf
-            loc_cf.loc[max_date] = mean_cf
-            loc_cf = loc_cf.asfreq('D').interpolate().reset_index()
-            loc_cf['location_id'] = loc_id
-            loc_cfs.append(loc_cf.set_index(['location_id', 'date'])[cf_name])
-        new_cfs[cf_name] = pd.concat(loc_cfs).sort_index()
+        new_cfs[cf_name] = _extend_correction_factor(
+            cf, today, max_date, averaging_window, application_window,
+        ).rename(cf_name)
     return HospitalCorrectionFactors(**new_cfs)
 
 
@@ -114,7 +106,7 @@ def get_population_partition(population: pd.DataFrame,
 
 def get_past_components(beta_regression_df: pd.DataFrame,
                         population_partition: Dict[str, pd.Series],
-                        ode_system: str) -> Tuple[CompartmentInfo, pd.DataFrame]:
+                        ode_system: str) -> Tuple[CompartmentInfo, ForecastCube]:
     regression_compartments = static_vars.SEIIR_COMPARTMENTS
     system_compartment_map = {
         'normal': _split_compartments(static_vars.SEIIR_COMPARTMENTS, population_partition),
@@ -122,28 +114,28 @@ def get_past_components(beta_regression_df: pd.DataFrame,
     }
     system_compartments = system_compartment_map[ode_system]
 
-    beta_regression_df = (beta_regression_df
-                          .set_index(['location_id', 'date'])
-                          .sort_index())
-    past_beta = beta_regression_df['beta']
-    past_components = beta_regression_df[regression_compartments]
+    past = ForecastCube.from_frame(beta_regression_df, ['beta'] + regression_compartments)
+    past_components = {compartment: past[compartment] for compartment in regression_compartments}
 
     if population_partition:
-        partitioned_past_components = []
+        partitioned_past_components = {}
         for compartment in regression_compartments:
             for partition_group, proportion in population_partition.items():
-                partitioned_past_components.append(
-                    (past_components[compartment] * proportion).rename(f'{compartment}_{partition_group}')
+                proportion = proportion.reindex(past.location_ids).to_numpy()[:, None]
+                partitioned_past_components[f'{compartment}_{partition_group}'] = (
+                    past_components[compartment] * proportion
                 )
-        past_components = pd.concat(partitioned_past_components, axis=1)
+        past_components = partitioned_past_components
 
-    rows_to_fill = past_components.notnull().all(axis=1)
-    compartments_to_fill = set(system_compartments).difference(past_components.columns)
-    past_components = past_components.reindex(system_compartments, axis=1)
-    for compartment_to_fill in compartments_to_fill:
-        past_components.loc[rows_to_fill, compartment_to_fill] = 0
-
-    past_components = pd.concat([past_beta, past_components], axis=1).reset_index(level='date')
+    rows_to_fill = np.all([~np.isnan(values) for values in past_components.values()], axis=0)
+    fill_values = np.where(rows_to_fill, 0., np.nan)
+    values = np.stack(
+        [past['beta']] + [past_components.get(compartment, fill_values) for compartment in system_compartments],
+        axis=-1,
+    )
+    past_components = ForecastCube(
+        past.location_ids, past.dates, ['beta'] + list(system_compartments), values, past.start, past.stop,
+    )
 
     compartment_info = CompartmentInfo(list(system_compartments), list(population_partition))
 
@@ -163,7 +155,7 @@ def run_normal_ode_model_by_location(initial_condition: pd.DataFrame,
                                      beta_params: Dict[str, float],
                                      seir_parameters: pd.DataFrame,
                                      scenario_spec: 'ScenarioSpecification',
-                                     compartment_info: CompartmentInfo):
+                                     compartment_info: CompartmentInfo) -> ForecastCube:
     forecasts = []
 
     for location_id, init_cond in initial_condition.iterrows():
@@ -189,11 +181,60 @@ def run_normal_ode_model_by_location(initial_condition: pd.DataFrame,
         forecasted_components['date'] = loc_date.values
         forecasted_components['location_id'] = location_id
         forecasts.append(forecasted_components)
-    forecasts = (pd.concat(forecasts)
-                 .drop(columns='t')  # Convenience column in the ode.
-                 .set_index(['location_id', 'date'])
-                 .reset_index(level='date'))  # Move date out front.
-    return forecasts
+    forecasts = pd.concat(forecasts).drop(columns='t')  # Convenience column in the ode.
+    return ForecastCube.from_frame(forecasts, location_ids=initial_condition.index)
+
+
+def run_normal_ode_model(initial_condition: pd.DataFrame,
+                         beta_params: Dict[str, float],
+                         seir_parameters: pd.DataFrame,
+                         scenario_spec: 'ScenarioSpecification',
+                         compartment_info: CompartmentInfo) -> ForecastCube:
+    """Runs the ODE forecast for all locations in a single batched solve.
+
+    Produces the same output as ``run_normal_ode_model_by_location``.
+    Location parameters are laid out on a shared date grid and integrated
+    together.  The solution and parameters are returned on the same grid.
+
+    """
+    location_ids = initial_condition.index
+    parameters = seir_parameters.loc[location_ids]
+    parameter_names = parameters.columns.drop('date').tolist()
+
+    dates = pd.DatetimeIndex(np.sort(parameters['date'].unique()))
+    times = np.array((dates - dates[0]).days, dtype=float)
+    location_idx = location_ids.get_indexer(parameters.index)
+    date_idx = dates.get_indexer(parameters['date'])
+    start = pd.Series(date_idx).groupby(location_idx).min().reindex(range(len(location_ids))).to_numpy()
+    stop = pd.Series(date_idx).groupby(location_idx).max().reindex(range(len(location_ids))).to_numpy() + 1
+
+    # (locations x parameters x time), NaN outside each location's dates.
+    parameter_values = parameters[parameter_names].to_numpy(dtype=float)
+    parameter_tensor = np.full((len(location_ids), len(parameter_names), len(dates)), np.nan)
+    parameter_tensor[location_idx, :, date_idx] = parameter_values
+
+    init_cond = initial_condition[compartment_info.compartments].to_numpy(dtype=float)
+    model_specs = _SeiirModelSpecs(
+        alpha=beta_params['alpha'],
+        sigma=beta_params['sigma'],
+        gamma1=beta_params['gamma1'],
+        gamma2=beta_params['gamma2'],
+        # The systems compute the population from the compartments, this is only validated.
+        N=init_cond.sum(axis=1).min(),
+        system_params=scenario_spec.system_params.copy(),
+    )
+    ode_runner = _ODERunner(model_specs, scenario_spec, compartment_info, parameter_names)
+    solution = ode_runner.get_batch_solution(init_cond, times, parameter_tensor, start, stop)
+
+    values = np.concatenate([solution, parameter_tensor], axis=1).transpose(0, 2, 1)
+    return ForecastCube(
+        location_ids=pd.Index(location_ids, name='location_id'),
+        dates=pd.DatetimeIndex(dates, name='date'),
+        fields=compartment_info.compartments + parameter_names,
+        values=np.ascontiguousarray(values),
+        start=start.astype(np.int64),
+        stop=stop.astype(np.int64),
+    )
 
 
 @dataclass(frozen=True)
@@ -235,34 +276,102 @@ def _beta_shift(beta_hat: pd.DataFrame,
 
     """
     beta_scales = beta_scales.set_index('location_id')
-    beta_hat = beta_hat.sort_values(['location_id', 'date']).set_index('location_id')
-    scale_init = beta_scales['scale_init']
-    scale_final = beta_scales['scale_final']
-    window_size = beta_scales['window_size']
-
-    beta_final = []
-    for location_id in beta_hat.index.unique():
-        if window_size is not None:
-            t = np.arange(len(beta_hat.loc[location_id])) / window_size.at[location_id]
-            scale = scale_init.at[location_id] + (scale_final.at[location_id] - scale_init.at[location_id]) * t
-            scale[(window_size.at[location_id] + 1):] = scale_final.at[location_id]
-        else:
-            scale = scale_init.at[location_id]
-        loc_beta_hat = beta_hat.loc[location_id].set_index('date', append=True)['beta_pred']
-        loc_beta_final = loc_beta_hat * scale
-        beta_final.append(loc_beta_final)
+    beta_hat = beta_hat.sort_values(['location_id', 'date']).reset_index(drop=True)
+    beta_scales = beta_scales.loc[beta_hat['location_id'], ['scale_init', 'scale_final', 'window_size']]
+    scale_init = beta_scales['scale_init'].to_numpy()
+    scale_final = beta_scales['scale_final'].to_numpy()
+    window_size = beta_scales['window_size'].to_numpy()
+
+    # Ramp linearly from the initial to the final scale over the window
+    # following each location's first prediction.
+    t = beta_hat.groupby('location_id').cumcount().to_numpy()
+    scale = np.where(t <= window_size, scale_init + (scale_final - scale_init) * (t / window_size), scale_final)
 
-    beta_final = pd.concat(beta_final).reset_index()
+    beta_final = beta_hat.loc[:, ['location_id', 'date']]
+    beta_final['beta_pred'] = beta_hat['beta_pred'].to_numpy() * scale
 
     return beta_final
 
 
+def _extend_correction_factor(correction_factor: pd.Series,
+                              today: pd.Series,
+                              max_date: pd.Timestamp,
+                              averaging_window: pd.Timedelta,
+                              application_window: pd.Timedelta) -> pd.Series:
+    """Extends a correction factor for each location past today to the max date.
+
+    The factor moves linearly from its last value up to today to its mean
+    over the averaging window, which it reaches at the end of the application window
+    and keeps through the max date.  Gaps in the past are filled by linear
+    interpolation.
+
+    """
+    today = today.sort_index()
+    location_ids = today.index
+    location_idx = location_ids.get_indexer(correction_factor.index.get_level_values('location_id'))
+    if np.any(np.bincount(location_idx[location_idx >= 0], minlength=len(location_ids)) == 0):
+        raise KeyError('Correction factors are missing for some locations.')
+    date = correction_factor.index.get_level_values('date')
+    keep = location_idx >= 0
+    location_idx, date = location_idx[keep], date[keep]
+    values = correction_factor.to_numpy(dtype=np.float64)[keep]
+    keep = date <= today.to_numpy()[location_idx]
+    location_idx, date, values = location_idx[keep], date[keep], values[keep]
+
+    application_date = today + application_window
+    first_date = min(date.min(), application_date.min()) if len(date) else application_date.min()
+    dates = pd.date_range(first_date, max_date, name='date')
+    date_idx = dates.get_indexer(date)
+    application_idx = dates.get_indexer(application_date)
+
+    # Each location's factor starts on its first date with data.
+    n_locations, n_dates = len(location_ids), len(dates)
+    start = application_idx.copy()
+    np.minimum.at(start, location_idx, date_idx)
+
+    in_average = date >= (today - averaging_window).to_numpy()[location_idx]
+    has_value = in_average & ~np.isnan(values)
+    total = np.bincount(location_idx[has_value], weights=values[has_value], minlength=n_locations)
+    count = np.bincount(location_idx[has_value], minlength=n_locations)
+    with np.errstate(invalid='ignore'):
+        mean = total / count
+
+    grid = np.full((n_locations, n_dates), np.nan)
+    grid[location_idx, date_idx] = values
+    grid[np.arange(n_locations), application_idx] = mean
+    grid[:, -1] = mean
+
+    # Interpolate between the nearest dates with values on either side and
+    # carry the last value forward past the final one.
+    date_positions = np.arange(n_dates)
+    has_value = ~np.isnan(grid)
+    previous_idx = np.maximum.accumulate(np.where(has_value, date_positions, -1), axis=1)
+    next_idx = np.minimum.accumulate(np.where(has_value, date_positions, n_dates)[:, ::-1], axis=1)[:, ::-1]
+    rows = np.arange(n_locations)[:, None]
+    previous_value = grid[rows, np.maximum(previous_idx, 0)]
+    next_value = grid[rows, np.minimum(next_idx, n_dates - 1)]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = (next_value - previous_value) / (next_idx - previous_idx)
+    interpolated = np.where(next_idx < n_dates, slope * (date_positions - previous_idx) + previous_value,
+                            previous_value)
+    grid = np.where(has_value, grid, np.where(previous_idx >= 0, interpolated, np.nan))
+
+    lengths = n_dates - start
+    out_location_idx = np.repeat(np.arange(n_locations), lengths)
+    out_date_idx = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths - start, lengths)
+    index = pd.MultiIndex(levels=[location_ids.rename('location_id'), dates],
+                          codes=[out_location_idx, out_date_idx],
+                          names=['location_id', 'date'], verify_integrity=False)
+    return pd.Series(grid[out_location_idx, out_date_idx], index=index, name=correction_factor.name)
+
+
 ###############################
 # Experimental: Optimized ode #
 ###############################
 
-@numba.njit
-def _seiir_single_group_system(t: float, y: np.ndarray, p: np.ndarray, n_total: float, infectious: float):
+@numba.njit(cache=True)
+def _seiir_single_group_system(t: float, y: np.ndarray, p: np.ndarray, n_total: float, infectious: float,
+                               out: np.ndarray):
     s, e, i1, i2, r = y
     alpha, sigma, gamma1, gamma2, beta, theta_plus, theta_minus = p
 
@@ -274,11 +383,16 @@ def _seiir_single_group_system(t: float, y: np.ndarray, p: np.ndarray, n_total:
     di2 = gamma1 * i1 - gamma2 * i2
     dr = gamma2 * i2 + theta_minus * e
 
-    return np.array([ds, de, di1, di2, dr])
+    out[0] = ds
+    out[1] = de
+    out[2] = di1
+    out[3] = di2
+    out[4] = dr
 
 
-@numba.njit
-def _seiir_system(t: float, y: np.ndarray, p: np.array):
+@math.register_system
+@numba.njit(cache=True)
+def _seiir_system_inplace(t: float, y: np.ndarray, p: np.array, out: np.ndarray):
     system_size = 5
     n_groups = y.size // system_size
     infectious = 0.
@@ -287,18 +401,24 @@ def _seiir_system(t: float, y: np.ndarray, p: np.array):
         # 3rd and 4th compartment of each group are infectious.
         infectious = infectious + y[i * system_size + 2] + y[i * system_size + 3]
 
-    dy = np.zeros_like(y)
     for i in range(n_groups):
-        dy[i * system_size:(i + 1) * system_size] = _seiir_single_group_system(
-            t, y[i * system_size:(i + 1) * system_size], p, n_total, infectious
+        _seiir_single_group_system(
+            t, y[i * system_size:(i + 1) * system_size], p, n_total, infectious,
+            out[i * system_size:(i + 1) * system_size],
         )
 
+
+@numba.njit(cache=True)
+def _seiir_system(t: float, y: np.ndarray, p: np.array):
+    dy = np.zeros_like(y)
+    _seiir_system_inplace(t, y, p, dy)
     return dy
 
 
-@numba.njit
+@numba.njit(cache=True)
 def _vaccine_single_group_system(t: float, y: np.ndarray, p: np.ndarray,
-                                 vaccines: np.array, n_total: float, infectious: float):
+                                 vaccines: np.array, n_total: float, infectious: float,
+                                 out: np.ndarray):
     unvaccinated, unprotected, protected, m = y[:5], y[5:10], y[10:15], y[15]
     s, e, i1, i2, r = unvaccinated
     s_u, e_u, i1_u, i2_u, r_u = unprotected
@@ -391,16 +511,27 @@ def _vaccine_single_group_system(t: float, y: np.ndarray, p: np.ndarray,
     # Vaccinated and immune
     dm = rho_immune * s_vaccines
 
-    return np.array([
-        ds, de, di1, di2, dr,
-        ds_u, de_u, di1_u, di2_u, dr_u,
-        ds_p, de_p, di1_p, di2_p, dr_p,
-        dm
-    ])
-
-
-@numba.njit
-def _vaccine_system(t: float, y: np.ndarray, p: np.array):
+    out[0] = ds
+    out[1] = de
+    out[2] = di1
+    out[3] = di2
+    out[4] = dr
+    out[5] = ds_u
+    out[6] = de_u
+    out[7] = di1_u
+    out[8] = di2_u
+    out[9] = dr_u
+    out[10] = ds_p
+    out[11] = de_p
+    out[12] = di1_p
+    out[13] = di2_p
+    out[14] = dr_p
+    out[15] = dm
+
+
+@math.register_system
+@numba.njit(cache=True)
+def _vaccine_system_inplace(t: float, y: np.ndarray, p: np.array, out: np.ndarray):
     system_size = 16
     num_seiir_compartments = 5
     n_groups = y.size // system_size
@@ -415,19 +546,25 @@ def _vaccine_system(t: float, y: np.ndarray, p: np.array):
                           + y[i * system_size + j * num_seiir_compartments + 2]
                           + y[i * system_size + j * num_seiir_compartments + 3])
 
-    dy = np.zeros_like(y)
     for i in range(n_groups):
-        dy[i * system_size:(i + 1) * system_size] = _vaccine_single_group_system(
-            t, y[i * system_size:(i + 1) * system_size], p, vaccines[i * 3:(i + 1) * 3], n_total, infectious
+        _vaccine_single_group_system(
+            t, y[i * system_size:(i + 1) * system_size], p, vaccines[i * 3:(i + 1) * 3], n_total, infectious,
+            out[i * system_size:(i + 1) * system_size],
         )
 
+
+@numba.njit(cache=True)
+def _vaccine_system(t: float, y: np.ndarray, p: np.array):
+    dy = np.zeros_like(y)
+    _vaccine_system_inplace(t, y, p, dy)
     return dy
 
 
 class _ODERunner:
+    # The solvers use the in-place calling convention.
     systems: Dict[str, Callable] = {
-        'normal': _seiir_system,
-        'vaccine': _vaccine_system,
+        'normal': _seiir_system_inplace,
+        'vaccine': _vaccine_system_inplace,
     }
 
     def __init__(self,
@@ -443,48 +580,93 @@ class _ODERunner:
 
     def get_solution(self, initial_condition, times, parameters):
         parameters = parameters.T  # Each row is a param, each column a day
+        system_params = self.get_system_parameters(parameters)
+
+        if self.scenario_spec.solver == 'DOPRI5':
+            solution = math.solve_ode_adaptive(
+                system=self.system,
+                t=times,
+                init_cond=initial_condition,
+                params=system_params,
+                **self.scenario_spec.solver_params,
+            )
+        else:
+            solution = math.solve_ode(
+                system=self.system,
+                t=times,
+                init_cond=initial_condition,
+                params=system_params,
+                dt=self.model_specs.delta,
+            )
+
+        result_array = np.concatenate([
+            solution,
+            parameters,
+            times.reshape((1, -1)),
+        ], axis=0).T
+        result = pd.DataFrame(
+            data=result_array,
+            columns=self.compartment_info.compartments + list(self.parameters_map) + ['t'],
+        )
+
+        return result
+
+    def get_system_parameters(self, parameters: np.ndarray) -> np.ndarray:
+        """Builds the ode system parameters from (..., parameters x time) input parameters.
+
+        Leading dimensions (e.g. locations) are carried through.
+        """
+        def param(name):
+            return parameters[..., self.parameters_map[name], :]
+        ones = np.ones_like(param('beta'))
+
         # Add the time invariant constants up front.
         constants = [
-            self.model_specs.alpha * np.ones_like(parameters[0]),
-            self.model_specs.sigma * np.ones_like(parameters[0]),
-            self.model_specs.gamma1 * np.ones_like(parameters[0]),
-            self.model_specs.gamma2 * np.ones_like(parameters[0]),
+            self.model_specs.alpha * ones,
+            self.model_specs.sigma * ones,
+            self.model_specs.gamma1 * ones,
+            self.model_specs.gamma2 * ones,
         ]
         system_params = [
-            parameters[self.parameters_map['beta']],
-            np.maximum(parameters[self.parameters_map['theta']], 0),  # Theta plus
-            -np.minimum(parameters[self.parameters_map['theta']], 0),  # Theta minus
+            param('beta'),
+            np.maximum(param('theta'), 0),  # Theta plus
+            -np.minimum(param('theta'), 0),  # Theta minus
         ]
         if self.scenario_spec.system == 'vaccine':
             constants.append(
-                self.model_specs.system_params.get('proportion_immune', 0.5) * np.ones_like(parameters[0])
+                self.model_specs.system_params.get('proportion_immune', 0.5) * ones
             )
             for risk_group in self.compartment_info.group_suffixes:
-                system_params.append(parameters[self.parameters_map[f'unprotected_{risk_group}']])
-                system_params.append(parameters[self.parameters_map[f'protected_{risk_group}']])
-                system_params.append(parameters[self.parameters_map[f'immune_{risk_group}']])
-
-        system_params = np.vstack([
-            constants,
-            system_params,
-        ])
-
-        solution = math.solve_ode(
+                system_params.append(param(f'unprotected_{risk_group}'))
+                system_params.append(param(f'protected_{risk_group}'))
+                system_params.append(param(f'immune_{risk_group}'))
+
+        return np.stack(constants + system_params, axis=-2)
+
+    def get_batch_solution(self, initial_condition: np.ndarray, times: np.ndarray, parameters: np.ndarray,
+                           start: np.ndarray, stop: np.ndarray) -> np.ndarray:
+        """Solves the system for all locations at once.
+
+        Takes (locations x compartments) initial conditions and
+        (locations x parameters x time) parameters on the shared ``times``
+        grid and returns the (locations x compartments x time) solution.
+        """
+        if self.scenario_spec.solver == 'DOPRI5':
+            return math.solve_ode_adaptive_batch(
+                system=self.system,
+                t=times,
+                init_cond=initial_condition,
+                params=self.get_system_parameters(parameters),
+                start=start,
+                stop=stop,
+                **self.scenario_spec.solver_params,
+            )
+        return math.solve_ode_batch(
             system=self.system,
             t=times,
             init_cond=initial_condition,
-            params=system_params,
+            params=self.get_system_parameters(parameters),
             dt=self.model_specs.delta,
+            start=start,
+            stop=stop,
         )
-
-        result_array = np.concatenate([
-            solution,
-            parameters,
-            times.reshape((1, -1)),
-        ], axis=0).T
-        result = pd.DataFrame(
-            data=result_array,
-            columns=self.compartment_info.compartments + list(self.parameters_map) + ['t'],
-        )
-
-        return result
@@ -31,13 +31,52 @@ class ForecastTaskSpecification(workflow.TaskSpecification):
 
 
 class ForecastWorkflowSpecification(workflow.WorkflowSpecification):
-    """Specification of execution parameters for forecasting workflows."""
+    """Specification of execution parameters for forecasting workflows.
+
+    Forecast tasks each run a block of ``draws_per_task`` consecutive draws,
+    loading the draw invariant inputs only once.  The forecast task's
+    ``max_runtime_seconds`` is per draw and is scaled by the size of the
+    block, so ``draws_per_task`` is bounded by the maximum task runtime.
+    Memory is not scaled as draws in a block run one after another.
+
+    """
 
     tasks = {
         FORECAST_JOBS.scaling: ScalingTaskSpecification,
         FORECAST_JOBS.forecast: ForecastTaskSpecification,
     }
 
+    def __init__(self,
+                 tasks: Dict[str, Dict[str, Union[int, str]]] = None,
+                 project: str = None,
+                 queue: str = None,
+                 draws_per_task: int = 1):
+        self.draws_per_task = draws_per_task
+        super().__init__(tasks, project, queue)
+        # Needs the task specifications, which are built after validate runs.
+        self.validate_block_runtime()
+
+    def validate(self):
+        super().validate()
+        if self.draws_per_task < 1:
+            raise ValueError(f'Invalid draws per task for {self.name}: {self.draws_per_task}. '
+                             f'Draws per task must be at least 1.')
+
+    def validate_block_runtime(self):
+        """Checks forecast tasks can run a full block of draws."""
+        forecast_spec = self.task_specifications[FORECAST_JOBS.forecast]
+        block_runtime = forecast_spec.max_runtime_seconds * self.draws_per_task
+        max_runtime = forecast_spec._runtime_bounds[1]
+        if block_runtime > max_runtime:
+            raise ValueError(f'Invalid draws per task for {self.name}: {self.draws_per_task}. '
+                             f'Forecast tasks would need a max runtime of {block_runtime} seconds '
+                             f'({forecast_spec.max_runtime_seconds} seconds per draw), more than the '
+                             f'maximum of {max_runtime}. Set a lower max_runtime_seconds for '
+                             f'{FORECAST_JOBS.forecast} explicitly or run fewer draws per task.')
+
+    def to_dict(self) -> Dict:
+        return {**super().to_dict(), 'draws_per_task': self.draws_per_task}
+
 
 @dataclass
 class ForecastData:
@@ -45,6 +84,7 @@ class ForecastData:
     regression_version: str = field(default='best')
     covariate_version: str = field(default='best')
     output_root: str = field(default='')
+    data_format: str = field(default='csv')
     fh_subnationals: bool = field(default=False)
 
     def to_dict(self) -> Dict:
@@ -61,6 +101,12 @@ class ScenarioSpecification:
     )
     ALLOWED_SOLVERS = (
         'RK45',
+        'DOPRI5',
+    )
+    SOLVER_PARAMS_KEYS = (
+        'rtol',
+        'atol',
+        'max_step',
     )
     ALLOWED_SYSTEMS = (
         'normal',
@@ -87,6 +133,7 @@ class ScenarioSpecification:
     algorithm: str = field(default='normal')
     algorithm_params: Dict = field(default_factory=dict)
     solver: str = field(default='RK45')
+    solver_params: Dict[str, float] = field(default_factory=dict)
     system: str = field(default='normal')
     system_params: Dict = field(default_factory=dict)
     population_partition: str = field(default='none')
@@ -104,6 +151,11 @@ class ScenarioSpecification:
             raise ValueError(f'Unknown solver {self.solver} in scenario {self.name}. '
                              f'Allowed solvers are {self.ALLOWED_SOLVERS}.')
 
+        bad_solver_keys = set(self.solver_params).difference(self.SOLVER_PARAMS_KEYS)
+        if bad_solver_keys:
+            raise ValueError(f'Unknown solver parameter(s) {list(bad_solver_keys)} '
+                             f'in scenario {self.name}. Expected parameters: {self.SOLVER_PARAMS_KEYS}.')
+
         if self.system not in self.ALLOWED_SYSTEMS:
             raise ValueError(f'Unknown system {self.system} in scenario {self.name}. '
                              f'Allowed systems are {self.ALLOWED_SYSTEMS}.')
@@ -1,31 +1,152 @@
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Dict, List, Union, TYPE_CHECKING
 
 import click
+import numpy as np
 import pandas as pd
 
 from covid_model_seiir_pipeline.lib import (
     cli_tools,
+    io,
     static_vars,
     utilities,
 )
 from covid_model_seiir_pipeline.pipeline.forecasting import model
-from covid_model_seiir_pipeline.pipeline.forecasting.specification import ForecastSpecification
+from covid_model_seiir_pipeline.pipeline.forecasting.specification import (
+    ForecastSpecification,
+    ScenarioSpecification,
+)
 from covid_model_seiir_pipeline.pipeline.forecasting.data import ForecastDataInterface
 
+if TYPE_CHECKING:
+    from covid_model_seiir_pipeline.pipeline.regression.specification import (
+        HospitalParameters,
+    )
+
 
 logger = cli_tools.task_performance_logger
 
 
-def run_beta_forecast(forecast_version: str, scenario: str, draw_id: int, **kwargs):
-    logger.info(f"Initiating SEIIR beta forecasting for scenario {scenario}, draw {draw_id}.", context='setup')
+def run_beta_forecast(forecast_version: str, scenario: str, draw_id: int, draws_per_task: int = 1):
+    draws = list(range(draw_id, draw_id + draws_per_task))
+    logger.info(f"Initiating SEIIR beta forecasting for scenario {scenario}, draws {draws}.", context='setup')
     forecast_spec: ForecastSpecification = ForecastSpecification.from_path(
         Path(forecast_version) / static_vars.FORECAST_SPECIFICATION_FILE
     )
     scenario_spec = forecast_spec.scenarios[scenario]
     data_interface = ForecastDataInterface.from_specification(forecast_spec)
+    # Several inputs are loaded more than once in the course of a forecast.
+    io.enable_cache()
 
-    logger.info('Loading input data.', context='read')
+    logger.info('Loading draw invariant input data.', context='read')
     location_ids = data_interface.load_location_ids()
+    # The population will be used to partition the SEIR compartments into
+    # different sub groups for the forecast.
+    population = data_interface.load_five_year_population(location_ids)
+    # Covariates are used to compute beta hat in the future.
+    covariates = data_interface.load_covariates(scenario_spec, location_ids)
+    # Data for computing hospital usage
+    mr = data_interface.load_mortality_ratio(location_ids)
+    death_weights = model.get_death_weights(mr, population, with_error=False)
+    hfr = data_interface.load_hospital_fatality_ratio(death_weights, location_ids)
+    hospital_parameters = data_interface.get_hospital_parameters()
+    correction_factors = data_interface.load_hospital_correction_factors()
+    # Load any data specific to the particular scenario we're running
+    scenario_data = data_interface.load_scenario_specific_data(location_ids, scenario_spec)
+
+    draw_invariant_inputs = DrawInvariantInputs(
+        location_ids=location_ids,
+        population=population,
+        covariates=covariates,
+        death_weights=death_weights,
+        hfr=hfr,
+        hospital_parameters=hospital_parameters,
+        correction_factors=correction_factors,
+        scenario_data=scenario_data,
+    )
+    for draw in draws:
+        forecast_draw(scenario, draw, scenario_spec, data_interface, draw_invariant_inputs)
+
+    logger.report()
+
+
+def _rerun_ode_from(future_components: model.ForecastCube,
+                    restart_date: pd.Series,
+                    beta_params: Dict[str, float],
+                    seir_parameters: pd.DataFrame,
+                    scenario_spec: ScenarioSpecification,
+                    compartment_info: model.CompartmentInfo) -> None:
+    """Re-solves the ODE from each location's restart date, in place.
+
+    Only the locations in ``restart_date`` are re-solved, starting from
+    their current state on that date.
+
+    """
+    after_restart = seir_parameters['date'].to_numpy() >= restart_date.loc[seir_parameters.index].to_numpy()
+    initial_condition = future_components.at(restart_date)[compartment_info.compartments]
+    future_components.update(model.run_normal_ode_model(
+        initial_condition,
+        beta_params,
+        seir_parameters[after_restart],
+        scenario_spec,
+        compartment_info,
+    ))
+
+
+def _compute_seir_parameters(covariate_pred: pd.DataFrame,
+                             coefficients: pd.DataFrame,
+                             beta_scales: pd.DataFrame,
+                             variant_scalars: model.VariantScalars,
+                             thetas: pd.Series,
+                             scenario_data: model.ScenarioData) -> pd.DataFrame:
+    """Forecasts beta from the covariates and builds the ODE parameters."""
+    betas = model.forecast_beta(covariate_pred, coefficients, beta_scales)
+    betas = betas.set_index('date', append=True).beta_pred
+    betas = ((betas * variant_scalars.beta.reindex(betas.index))
+             .rename('beta_pred')
+             .reset_index(level='date'))
+    return model.prep_seir_parameters(
+        betas,
+        thetas,
+        scenario_data,
+    )
+
+
+def _subset_locations(data: Union[pd.DataFrame, pd.Series],
+                      location_ids: pd.Index) -> Union[pd.DataFrame, pd.Series]:
+    if 'location_id' in data.index.names:
+        return data[data.index.get_level_values('location_id').isin(location_ids)]
+    return data[data['location_id'].isin(location_ids)]
+
+
+@dataclass
+class DrawInvariantInputs:
+    """Forecast inputs shared by all draws of a scenario."""
+    location_ids: List[int]
+    population: pd.DataFrame
+    covariates: pd.DataFrame
+    death_weights: pd.Series
+    hfr: pd.Series
+    hospital_parameters: 'HospitalParameters'
+    correction_factors: model.HospitalCorrectionFactors
+    scenario_data: model.ScenarioData
+
+
+def forecast_draw(scenario: str, draw_id: int,
+                  scenario_spec: ScenarioSpecification,
+                  data_interface: ForecastDataInterface,
+                  draw_invariant_inputs: DrawInvariantInputs) -> None:
+    location_ids = draw_invariant_inputs.location_ids
+    population = draw_invariant_inputs.population
+    covariates = draw_invariant_inputs.covariates
+    death_weights = draw_invariant_inputs.death_weights
+    hfr = draw_invariant_inputs.hfr
+    hospital_parameters = draw_invariant_inputs.hospital_parameters
+    correction_factors = draw_invariant_inputs.correction_factors
+    scenario_data = draw_invariant_inputs.scenario_data
+
+    logger.info(f'Loading input data for draw {draw_id}.', context='read')
     # We'll use the same params in the ODE forecast as we did in the fit.
     beta_params = data_interface.load_beta_params(draw_id=draw_id)
     # Thetas are a parameter generated from assumption or OOS predictive
@@ -34,15 +155,11 @@ def run_beta_forecast(forecast_version: str, scenario: str, draw_id: int, **kwar
     # Grab the last day of data in the model by location id.  This will
     # correspond to the initial condition for the projection.
     transition_date = data_interface.load_transition_date(draw_id)
-    # The population will be used to partition the SEIR compartments into
-    # different sub groups for the forecast.
-    population = data_interface.load_five_year_population(location_ids)
     # We'll use the beta and SEIR compartments from this data set to get
     # the ODE initial condition.
     beta_regression_df = data_interface.load_beta_regression(draw_id)
-    # Covariates and coefficients, and scaling parameters are
-    # used to compute beta hat in the future.
-    covariates = data_interface.load_covariates(scenario_spec, location_ids)
+    # Coefficients and scaling parameters are used with the covariates
+    # to compute beta hat in the future.
     coefficients = data_interface.load_regression_coefficients(draw_id)
     forecast_end_date = covariates.date.max()
     # Rescaling parameters for the beta forecast.
@@ -64,14 +181,6 @@ def run_beta_forecast(forecast_version: str, scenario: str, draw_id: int, **kwar
     ifr.loc[variant_scalars.ifr.index, ifr_cols] = (ifr
                                                     .loc[variant_scalars.ifr.index, ifr_cols]
                                                     .mul(variant_scalars.ifr, axis=0))
-    # Data for computing hospital usage
-    mr = data_interface.load_mortality_ratio(location_ids)
-    death_weights = model.get_death_weights(mr, population, with_error=False)
-    hfr = data_interface.load_hospital_fatality_ratio(death_weights, location_ids)
-    hospital_parameters = data_interface.get_hospital_parameters()
-    correction_factors = data_interface.load_hospital_correction_factors()
-    # Load any data specific to the particular scenario we're running
-    scenario_data = data_interface.load_scenario_specific_data(location_ids, scenario_spec)
 
     logger.info('Processing inputs into model parameters.', context='transform')
     # Split the population into risk groups according to the specification.
@@ -82,22 +191,21 @@ def run_beta_forecast(forecast_version: str, scenario: str, draw_id: int, **kwar
         scenario_spec.system
     )
     # Select out the initial condition using the day of transition.
-    transition_day = past_components['date'] == transition_date.loc[past_components.index]
-    initial_condition = past_components.loc[transition_day, compartment_info.compartments]
-    before_model = past_components['date'] < transition_date.loc[past_components.index]
-    past_components = past_components[before_model]
+    initial_condition = past_components.at(
+        transition_date.loc[past_components.location_ids]
+    )[compartment_info.compartments]
+    past_components = past_components.truncate(transition_date)
 
     # Grab the projection of the covariates into the future, keeping the
     # day of transition from past model to future model.
     covariates = covariates.set_index('location_id').sort_index()
     the_future = covariates['date'] >= transition_date.loc[covariates.index]
     covariate_pred = covariates.loc[the_future].reset_index()
-    betas = model.forecast_beta(covariate_pred, coefficients, beta_scales)
-    betas = ((betas.set_index('date', append=True).beta_pred * variant_scalars.beta)
-             .rename('beta_pred')
-             .reset_index(level='date'))
-    seir_parameters = model.prep_seir_parameters(
-        betas,
+    seir_parameters = _compute_seir_parameters(
+        covariate_pred,
+        coefficients,
+        beta_scales,
+        variant_scalars,
         thetas,
         scenario_data,
     )
@@ -110,7 +218,7 @@ def run_beta_forecast(forecast_version: str, scenario: str, draw_id: int, **kwar
     )
 
     logger.info('Running ODE forecast.', context='compute_ode')
-    future_components = model.run_normal_ode_model_by_location(
+    future_components = model.run_normal_ode_model(
         initial_condition,
         beta_params,
         seir_parameters,
@@ -141,11 +249,12 @@ def run_beta_forecast(forecast_version: str, scenario: str, draw_id: int, **kwar
             scenario_spec.algorithm_params,
             location_ids
         )
-        population = (output_metrics.components[compartment_info.compartments]
-                      .sum(axis=1)
-                      .rename('population')
-                      .groupby('location_id')
-                      .max())
+        components = output_metrics.components
+        population = pd.Series(
+            np.nansum(components[compartment_info.compartments], axis=-1).max(axis=1),
+            index=components.location_ids,
+            name='population',
+        )
         reimposition_threshold = model.compute_reimposition_threshold(
             output_metrics.deaths,
             population,
@@ -183,54 +292,58 @@ def run_beta_forecast(forecast_version: str, scenario: str, draw_id: int, **kwar
             covariates = covariates.reset_index().set_index(['location_id', 'date'])
             covariates['mobility'] = new_mobility
             covariates = covariates.reset_index(level='date')
-            covariate_pred = covariates.loc[the_future].reset_index()
-
-            betas = model.forecast_beta(covariate_pred, coefficients, beta_scales)
-            betas = ((betas.set_index('date', append=True).beta_pred * variant_scalars.beta)
-                     .rename('beta_pred')
-                     .reset_index(level='date'))
-            seir_parameters = model.prep_seir_parameters(
-                betas,
+
+            # Only locations reimposing mandates have new forecasts, so we
+            # recompute everything downstream of mobility for just those
+            # locations and write the results over the previous ones.
+            reimposing = reimposition_date.index
+            covariate_pred = covariates.loc[the_future & covariates.index.isin(reimposing)].reset_index()
+            seir_parameters = _compute_seir_parameters(
+                covariate_pred,
+                _subset_locations(coefficients, reimposing),
+                _subset_locations(beta_scales, reimposing),
+                variant_scalars,
                 thetas,
                 scenario_data,
             )
+            # Mobility is unchanged before the reimposition date.  Parameters are
+            # interpolated between days in the ODE, so the forecast is unchanged
+            # up to the day before and the ODE restarts from there.
+            restart_date = pd.concat([reimposition_date - pd.Timedelta(days=1), transition_date.loc[reimposing]],
+                                     axis=1).max(axis=1)
 
-            # The ode is done as a loop over the locations in the initial condition.
-            # As locations that don't reimpose mandates produce identical forecasts,
-            # subset here to only the locations that reimpose mandates for speed.
-            initial_condition_subset = initial_condition.loc[reimposition_date.index]
             logger.info('Running ODE forecast.', context='compute_ode')
-            future_components_subset = model.run_normal_ode_model_by_location(
-                initial_condition_subset,
+            _rerun_ode_from(
+                future_components,
+                restart_date,
                 beta_params,
                 seir_parameters,
                 scenario_spec,
                 compartment_info,
-            ).set_index('date', append=True).sort_index()
+            )
 
             logger.info('Processing ODE results and computing deaths and infections.', context='compute_results')
-            future_components = (future_components
-                                 .set_index('date', append=True)
-                                 .sort_index()
-                                 .drop(future_components_subset.index)
-                                 .append(future_components_subset)
-                                 .sort_index()
-                                 .reset_index(level='date'))
-            output_metrics = model.compute_output_metrics(
-                infection_data,
+            output_metrics_subset = model.compute_output_metrics(
+                _subset_locations(infection_data, reimposing),
                 ifr,
-                past_components,
-                future_components,
+                past_components.subset(reimposing),
+                future_components.subset(reimposing),
                 beta_params,
                 compartment_info,
             )
-            hospital_usage = model.compute_corrected_hospital_usage(
-                output_metrics.deaths,
-                death_weights,
-                hfr,
+            output_metrics = model.update_output_metrics(output_metrics, output_metrics_subset)
+            hospital_usage_subset = model.compute_corrected_hospital_usage(
+                output_metrics_subset.deaths,
+                _subset_locations(death_weights, reimposing),
+                model.HospitalFatalityRatioData(**{
+                    key: _subset_locations(value, reimposing) for key, value in hfr.to_dict().items()
+                }),
                 hospital_parameters,
-                correction_factors,
+                model.HospitalCorrectionFactors(**{
+                    key: _subset_locations(value, reimposing) for key, value in correction_factors.to_dict().items()
+                }),
             )
+            hospital_usage = model.update_hospital_usage(hospital_usage, hospital_usage_subset)
 
             logger.info('Recomputing reimposition dates', context='compute_mandates')
             reimposition_count += 1
@@ -245,37 +358,38 @@ def run_beta_forecast(forecast_version: str, scenario: str, draw_id: int, **kwar
             )
 
     logger.info('Writing outputs.', context='write')
-    ode_param_cols = output_metrics.components.columns.difference(compartment_info.compartments)
-    ode_params = output_metrics.components[ode_param_cols].reset_index()
-    components = output_metrics.components[compartment_info.compartments].reset_index()
+    ode_param_cols = pd.Index(output_metrics.components.fields).difference(compartment_info.compartments)
+    ode_params = output_metrics.components.to_frame(ode_param_cols, date_index=True).reset_index()
+    components = output_metrics.components.to_frame(compartment_info.compartments, date_index=True).reset_index()
     covariates = covariates.reset_index()
     epi_metrics = [value for key, value in utilities.asdict(output_metrics).items() if key != 'components']
     usage = [value.rename(key) for key, value in utilities.asdict(hospital_usage).items()]
     corrections = [value.rename(key + '_correction') for key, value in utilities.asdict(correction_factors).items()]
     outputs = pd.concat(epi_metrics + usage + corrections, axis=1).reset_index()
 
-    data_interface.save_ode_params(ode_params, scenario, draw_id)
-    data_interface.save_components(components, scenario, draw_id)
-    data_interface.save_raw_covariates(covariates, scenario, draw_id)
-    data_interface.save_raw_outputs(outputs, scenario, draw_id)
-
-    logger.report()
+    with data_interface.write_session():
+        data_interface.save_ode_params(ode_params, scenario, draw_id)
+        data_interface.save_components(components, scenario, draw_id)
+        data_interface.save_raw_covariates(covariates, scenario, draw_id)
+        data_interface.save_raw_outputs(outputs, scenario, draw_id)
 
 
 @click.command()
 @cli_tools.with_task_forecast_version
 @cli_tools.with_scenario
 @cli_tools.with_draw_id
+@cli_tools.with_draws_per_task
 @cli_tools.with_extra_id
 @cli_tools.add_verbose_and_with_debugger
-def beta_forecast(forecast_version: str, scenario: str, draw_id: int, extra_id: int,
+def beta_forecast(forecast_version: str, scenario: str, draw_id: int, draws_per_task: int, extra_id: int,
                   verbose: int, with_debugger: bool):
     cli_tools.configure_logging_to_terminal(verbose)
 
     run = cli_tools.handle_exceptions(run_beta_forecast, logger, with_debugger)
     run(forecast_version=forecast_version,
         scenario=scenario,
-        draw_id=draw_id)
+        draw_id=draw_id,
+        draws_per_task=draws_per_task)
 
 
 if __name__ == '__main__':
@@ -1,6 +1,6 @@
 import functools
 import multiprocessing
-from typing import Dict, List
+from typing import Dict, List, Tuple
 from pathlib import Path
 
 import click
@@ -9,6 +9,7 @@ import numpy as np
 
 from covid_model_seiir_pipeline.lib import (
     cli_tools,
+    io,
     static_vars,
 )
 from covid_model_seiir_pipeline.pipeline.forecasting.specification import (
@@ -135,24 +136,34 @@ def compute_initial_beta_scaling_paramters(total_deaths: pd.Series,
                                            beta_scaling: dict,
                                            data_interface: ForecastDataInterface,
                                            num_cores: int) -> List[pd.DataFrame]:
-    # Serialization is our bottleneck, so we parallelize draw level data
-    # ingestion and computation across multiple processes.
-    _runner = functools.partial(
-        compute_initial_beta_scaling_parameters_by_draw,
-        total_deaths=total_deaths,
-        beta_scaling=beta_scaling,
-        data_interface=data_interface
+    # Draw level reads dominate here, so we overlap them with the
+    # (vectorized) per draw computation using reader threads rather
+    # than forking processes and serializing results back.
+    _loader = functools.partial(
+        load_beta_scaling_inputs_by_draw,
+        data_interface=data_interface,
     )
     draws = list(range(data_interface.get_n_draws()))
-    with multiprocessing.Pool(num_cores) as pool:
-        scaling_data = list(pool.imap(_runner, draws))
+    scaling_data = []
+    for draw_id, (transition_date, beta_regression_df) in zip(draws, io.prefetch(_loader, draws, depth=num_cores)):
+        scaling_data.append(compute_initial_beta_scaling_parameters_by_draw(
+            draw_id, transition_date, beta_regression_df, total_deaths, beta_scaling,
+        ))
     return scaling_data
 
 
+def load_beta_scaling_inputs_by_draw(draw_id: int,
+                                     data_interface: ForecastDataInterface) -> Tuple[pd.Series, pd.DataFrame]:
+    transition_date = data_interface.load_transition_date(draw_id)
+    beta_regression_df = data_interface.load_beta_regression(draw_id)
+    return transition_date, beta_regression_df
+
+
 def compute_initial_beta_scaling_parameters_by_draw(draw_id: int,
+                                                    transition_date: pd.Series,
+                                                    beta_regression_df: pd.DataFrame,
                                                     total_deaths: pd.Series,
-                                                    beta_scaling: Dict,
-                                                    data_interface: ForecastDataInterface) -> pd.DataFrame:
+                                                    beta_scaling: Dict) -> pd.DataFrame:
     # Construct a list of pandas Series indexed by location and named
     # as their column will be in the output dataframe. We'll append
     # to this list as we construct the parameters.
@@ -162,10 +173,7 @@ def compute_initial_beta_scaling_parameters_by_draw(draw_id: int,
     # Today in the data is unique by draw.  It's a combination of the
     # number of predicted days from the elastispliner in the ODE fit
     # and the random draw of lag between infection and death from the
-    # infectionator. Don't compute, let's look it up.
-    transition_date = data_interface.load_transition_date(draw_id)
-
-    beta_regression_df = data_interface.load_beta_regression(draw_id)
+    # infectionator. Don't compute, it's looked up with the betas.
     beta_regression_df = beta_regression_df.set_index('location_id').sort_index()
     idx = beta_regression_df.index
 
@@ -191,9 +199,15 @@ def compute_initial_beta_scaling_parameters_by_draw(draw_id: int,
                  .set_index(['location_id', 'date'])
                  .sort_index())
 
-    log_beta_resid_mean = (np.log(beta_past['beta'] / beta_past['beta_pred'])
+    # Average over positions [-b, -a) counted back from each location's
+    # transition date, i.e. the equivalent of x.iloc[-b: -a].mean() per location.
+    log_beta_resid = np.log(beta_past['beta'] / beta_past['beta_pred'])
+    days_before_transition = log_beta_resid.groupby(level='location_id').cumcount(ascending=False)
+    in_window = (days_before_transition >= a) & (days_before_transition < b)
+    log_beta_resid_mean = (log_beta_resid[in_window]
                            .groupby(level='location_id')
-                           .apply(lambda x: x.iloc[-b: -a].mean())
+                           .mean()
+                           .reindex(idx.unique())
                            .rename('log_beta_residual_mean'))
     draw_data.append(log_beta_resid_mean)
     draw_data.append(pd.Series(draw_id, index=total_deaths.index, name='draw'))
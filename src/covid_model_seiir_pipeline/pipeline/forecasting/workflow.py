@@ -32,12 +32,17 @@ class BetaForecastTaskTemplate(workflow.TaskTemplate):
         "--forecast-version {forecast_version} "
         "--scenario {scenario} "
         "--draw-id {draw_id} "
+        "--draws-per-task {draws_per_task} "
         "--extra-id {extra_id} "
         "-vv"
     )
-    node_args = ['scenario', 'draw_id', 'extra_id']
+    node_args = ['scenario', 'draw_id', 'draws_per_task', 'extra_id']
     task_args = ['forecast_version']
 
+    def get_params(self, **kwargs) -> Dict:
+        # The runtime is specified per draw and tasks run their draws in sequence.
+        return {**self.params, 'max_runtime_seconds': self.params['max_runtime_seconds'] * kwargs['draws_per_task']}
+
 
 class ForecastWorkflow(workflow.WorkflowTemplate):
 
@@ -47,7 +52,7 @@ class ForecastWorkflow(workflow.WorkflowTemplate):
         FORECAST_JOBS.forecast: BetaForecastTaskTemplate,
     }
 
-    def attach_tasks(self, n_draws: int, scenarios: Dict[str, ScenarioSpecification]):
+    def attach_tasks(self, n_draws: int, scenarios: Dict[str, ScenarioSpecification], draws_per_task: int = 1):
         scaling_template = self.task_templates[FORECAST_JOBS.scaling]
 
         for scenario_name, scenario_spec in scenarios.items():
@@ -58,16 +63,18 @@ class ForecastWorkflow(workflow.WorkflowTemplate):
                 scenario=scenario_name
             )
             self.workflow.add_task(scaling_task)
-            self._attach_forecast_tasks(scenario_name, n_draws, 0, scaling_task)
+            self._attach_forecast_tasks(scenario_name, n_draws, draws_per_task, 0, scaling_task)
 
-    def _attach_forecast_tasks(self, scenario_name: str, n_draws: int, extra_id: int,
+    def _attach_forecast_tasks(self, scenario_name: str, n_draws: int, draws_per_task: int, extra_id: int,
                                *upstream_tasks: Task) -> None:
         forecast_template = self.task_templates[FORECAST_JOBS.forecast]
 
-        for draw in range(n_draws):
+        # Each task runs a block of consecutive draws, the last may be short.
+        for first_draw in range(0, n_draws, draws_per_task):
             forecast_task = forecast_template.get_task(
                 forecast_version=self.version,
-                draw_id=draw,
+                draw_id=first_draw,
+                draws_per_task=min(draws_per_task, n_draws - first_draw),
                 scenario=scenario_name,
                 extra_id=extra_id,
             )
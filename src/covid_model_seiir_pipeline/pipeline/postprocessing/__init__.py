@@ -4,6 +4,7 @@ from covid_model_seiir_pipeline.pipeline.postprocessing.specification import (
 )
 from covid_model_seiir_pipeline.pipeline.postprocessing.data import PostprocessingDataInterface
 from covid_model_seiir_pipeline.pipeline.postprocessing.task import (
+    transpose_outputs,
     resample_map,
     postprocess,
 )
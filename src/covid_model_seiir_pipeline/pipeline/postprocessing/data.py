@@ -23,18 +23,30 @@ class PostprocessingDataInterface:
 
     def __init__(self,
                  forecast_root: io.ForecastRoot,
-                 postprocessing_root: io.PostprocessingRoot):
+                 postprocessing_root: io.PostprocessingRoot,
+                 draw_loader: str = 'shared_memory'):
         self.forecast_root = forecast_root
         self.postprocessing_root = postprocessing_root
+        self.draw_loader = draw_loader
+        # Built on first use from the forecast specification and then
+        # carried along (including to pool workers when pickled).
+        self._forecast_specification = None
+        self._forecast_data_interface = None
 
     @classmethod
     def from_specification(cls, specification: PostprocessingSpecification):
-        forecast_root = io.ForecastRoot(specification.data.forecast_version)
-        postprocessing_root = io.PostprocessingRoot(specification.data.output_root)
+        # The forecast outputs are written in whatever format the
+        # forecast specification asked for.
+        forecast_spec = io.load(io.ForecastRoot(specification.data.forecast_version).specification())
+        forecast_root = io.ForecastRoot(specification.data.forecast_version,
+                                        data_format=forecast_spec['data'].get('data_format', 'csv'))
+        postprocessing_root = io.PostprocessingRoot(specification.data.output_root,
+                                                    data_format=specification.data.data_format)
 
         return cls(
             forecast_root=forecast_root,
             postprocessing_root=postprocessing_root,
+            draw_loader=specification.data.draw_loader,
         )
 
     def make_dirs(self, **prefix_args):
@@ -51,13 +63,13 @@ class PostprocessingDataInterface:
         return self._get_forecast_data_inteface().load_location_ids()
 
     def get_covariate_names(self, scenarios: List[str]) -> List[str]:
-        forecast_spec = ForecastSpecification.from_dict(io.load(self.forecast_root.specification()))
-        forecast_di = ForecastDataInterface.from_specification(forecast_spec)
+        forecast_spec = self._get_forecast_specification()
+        forecast_di = self._get_forecast_data_inteface()
         scenarios = {scenario: spec for scenario, spec in forecast_spec.scenarios.items() if scenario in scenarios}
         return forecast_di.check_covariates(scenarios)
 
     def get_covariate_version(self, covariate_name: str, scenario: str) -> str:
-        forecast_spec = ForecastSpecification.from_dict(io.load(self.forecast_root.specification()))
+        forecast_spec = self._get_forecast_specification()
         return forecast_spec.scenarios[scenario].covariates[covariate_name]
 
     def load_regression_coefficients(self, draw_id: int) -> pd.Series:
@@ -76,7 +88,8 @@ class PostprocessingDataInterface:
 
     def load_covariate(self, draw_id: int, covariate: str, time_varying: bool,
                        scenario: str, with_observed: bool = False) -> pd.Series:
-        covariates = io.load(self.forecast_root.raw_covariates(scenario=scenario, draw_id=draw_id))
+        covariates = io.load(self.forecast_root.raw_covariates(scenario=scenario, draw_id=draw_id),
+                             columns=['location_id', 'date', covariate])
         covariates['date'] = pd.to_datetime(covariates['date'])
         covariates = covariates.set_index(['location_id', 'date']).sort_index()
         if time_varying:
@@ -90,7 +103,8 @@ class PostprocessingDataInterface:
                                                                  location_ids, with_observed=True)
 
     def load_betas(self, draw_id: int, scenario: str) -> pd.Series:
-        ode_params = io.load(self.forecast_root.ode_params(scenario=scenario, draw_id=draw_id))
+        ode_params = io.load(self.forecast_root.ode_params(scenario=scenario, draw_id=draw_id),
+                             columns=['location_id', 'date', 'beta'])
         ode_params['date'] = pd.to_datetime(ode_params['date'])
         betas = (ode_params
                  .set_index(['location_id', 'date'])['beta']
@@ -107,12 +121,24 @@ class PostprocessingDataInterface:
         return beta_residual
 
     def load_raw_outputs(self, draw_id: int, scenario: str, measure: str) -> pd.Series:
+        index_cols = self._get_raw_output_index_columns(measure)
+        draw_df = io.load(self.forecast_root.raw_outputs(scenario=scenario, draw_id=draw_id),
+                          columns=index_cols + [measure])
+        return self._to_raw_output_draw(self._index_raw_outputs(draw_df, measure), measure, draw_id)
+
+    def load_all_raw_outputs(self, draw_id: int, scenario: str) -> Dict[str, pd.Series]:
+        """Loads every measure in a draw's raw outputs with a single read."""
         draw_df = io.load(self.forecast_root.raw_outputs(scenario=scenario, draw_id=draw_id))
-        index_cols = ['location_id', 'date']
-        if measure == 'deaths':
-            index_cols.append('observed')
-        draw_data = draw_df.set_index(index_cols)[measure].sort_index().rename(draw_id)
-        return draw_data
+        measures = draw_df.columns.difference(['location_id', 'date', 'observed'])
+        # Index and sort once for each distinct set of index columns rather than per measure.
+        indexed = {}
+        draws = {}
+        for measure in measures:
+            index_cols = tuple(self._get_raw_output_index_columns(measure))
+            if index_cols not in indexed:
+                indexed[index_cols] = self._index_raw_outputs(draw_df, measure)
+            draws[measure] = self._to_raw_output_draw(indexed[index_cols], measure, draw_id)
+        return draws
 
     ##############################
     # Miscellaneous data loaders #
@@ -231,6 +257,19 @@ class PostprocessingDataInterface:
     def save_output_draws(self, output_draws: pd.DataFrame, scenario: str, measure: str):
         io.dump(output_draws, self.postprocessing_root.output_draws(scenario=scenario, measure=measure))
 
+    def save_raw_output_draw(self, draw: pd.Series, scenario: str, measure: str, n_draws: int):
+        # Not strict so a retried transpose task can rewrite its draws.
+        io.dump_draw(draw, self.postprocessing_root.raw_output_draws(scenario=scenario, measure=measure),
+                     draw_id=draw.name, n_draws=n_draws, strict=False)
+
+    def has_raw_output_draws(self, scenario: str, measure: str) -> bool:
+        return io.is_complete(self.postprocessing_root.raw_output_draws(scenario=scenario, measure=measure))
+
+    def load_raw_output_draws(self, scenario: str, measure: str) -> pd.DataFrame:
+        # Copy out of the memory map, downstream processing modifies draws in place.
+        draws = io.load(self.postprocessing_root.raw_output_draws(scenario=scenario, measure=measure))
+        return draws.copy()
+
     def load_output_draws(self, scenario: str, measure: str) -> pd.DataFrame:
         return io.load(self.postprocessing_root.output_draws(scenario=scenario, measure=measure))
 
@@ -257,10 +296,34 @@ class PostprocessingDataInterface:
     # Non-interface methods #
     #########################
 
-    def _get_forecast_data_inteface(self):
-        forecast_spec = ForecastSpecification.from_dict(io.load(self.forecast_root.specification()))
-        forecast_di = ForecastDataInterface.from_specification(forecast_spec)
-        return forecast_di
+    def _get_forecast_specification(self) -> ForecastSpecification:
+        if self._forecast_specification is None:
+            spec_dict = io.load(self.forecast_root.specification())
+            self._forecast_specification = ForecastSpecification.from_dict(spec_dict)
+        return self._forecast_specification
+
+    def _get_forecast_data_inteface(self) -> ForecastDataInterface:
+        if self._forecast_data_interface is None:
+            forecast_spec = self._get_forecast_specification()
+            self._forecast_data_interface = ForecastDataInterface.from_specification(forecast_spec)
+        return self._forecast_data_interface
+
+    @staticmethod
+    def _get_raw_output_index_columns(measure: str) -> List[str]:
+        index_cols = ['location_id', 'date']
+        if measure == 'deaths':
+            index_cols.append('observed')
+        return index_cols
+
+    def _index_raw_outputs(self, draw_df: pd.DataFrame, measure: str) -> pd.DataFrame:
+        """Indexes raw outputs by the index columns of the measure."""
+        index_cols = self._get_raw_output_index_columns(measure)
+        return draw_df.set_index(index_cols).sort_index()
+
+    @staticmethod
+    def _to_raw_output_draw(indexed_df: pd.DataFrame, measure: str, draw_id: int) -> pd.Series:
+        """Pulls a measure's draw out of raw outputs from ``_index_raw_outputs``."""
+        return indexed_df[measure].rename(draw_id)
 
     def _get_previous_version_data_interface(self, version: str) -> 'PostprocessingDataInterface':
         previous_spec_path = Path(version) / static_vars.POSTPROCESSING_SPECIFICATION_FILE
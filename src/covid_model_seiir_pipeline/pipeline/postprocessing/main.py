@@ -30,7 +30,9 @@ def do_postprocessing(app_metadata: cli_tools.Metadata,
                            f"Unknown covariates: {list(unknown_covariates)}")
 
         measures = [*model.MEASURES, *model.MISCELLANEOUS, *modeled_covariates.intersection(known_covariates)]
-        workflow.attach_tasks(measures, postprocessing_specification.data.scenarios)
+        workflow.attach_tasks(measures,
+                              postprocessing_specification.data.scenarios,
+                              postprocessing_specification.resampling.reference_scenario)
 
         try:
             workflow.run()
@@ -1,15 +1,168 @@
 import functools
 import multiprocessing
-from typing import List, TYPE_CHECKING
+from typing import Callable, Dict, List, Optional, TYPE_CHECKING, Union
 
+import numpy as np
 import pandas as pd
 
+from covid_model_seiir_pipeline.lib import io
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # Python < 3.8
+    shared_memory = None
+
 if TYPE_CHECKING:
     # The model subpackage is a library for the pipeline stage and shouldn't
     # explicitly depend on things outside the subpackage.
     from covid_model_seiir_pipeline.pipeline.postprocessing.data import PostprocessingDataInterface
 
 
+# Draw level loaders return either a list of per-draw series or a frame
+# with one column per draw, depending on the draw loader in use.
+DrawData = Union[List[pd.Series], pd.DataFrame]
+
+
+def load_draws(runner: Callable[[int], pd.Series],
+               data_interface: 'PostprocessingDataInterface',
+               num_cores: int) -> DrawData:
+    """Loads every draw with the draw loader configured on the data interface."""
+    draw_loader = data_interface.draw_loader
+    if draw_loader not in DRAW_LOADERS:
+        raise ValueError(f'Unknown draw loader {draw_loader}. Options are {list(DRAW_LOADERS)}.')
+    if draw_loader == 'shared_memory' and shared_memory is None:
+        # Shared memory needs python 3.8+.  Threads give the same result
+        # without it.
+        draw_loader = 'threads'
+    # Resolving the draw count also resolves the upstream data interfaces
+    # in the parent, so they are pickled with the runner rather than
+    # rebuilt in every worker.
+    n_draws = data_interface.get_n_draws()
+    return DRAW_LOADERS[draw_loader](runner, n_draws, num_cores)
+
+
+def _load_draws_with_pool(runner: Callable[[int], pd.Series], n_draws: int, num_cores: int) -> List[pd.Series]:
+    """Loads draws in a process pool, pickling each draw back to the parent."""
+    with multiprocessing.Pool(num_cores) as pool:
+        draws = pool.map(runner, range(n_draws))
+    return draws
+
+
+def _align(draw: pd.Series, index: pd.Index) -> Optional[np.ndarray]:
+    """Returns the draw's values in the order of the common index.
+
+    Returns nothing if the draw has rows outside the common index (or
+    duplicate rows) and can't be placed in the draw matrix.
+    """
+    if not draw.index.equals(index):
+        if not (draw.index.is_unique and draw.index.isin(index).all()):
+            return None
+        draw = draw.reindex(index)
+    return draw.to_numpy(dtype=np.float64)
+
+
+def _merge_unaligned(data: pd.DataFrame, unaligned: Dict[int, pd.Series], n_draws: int) -> pd.DataFrame:
+    """Outer joins draws that couldn't be placed in the draw matrix."""
+    if not unaligned:
+        return data
+    # Rare: some draws cover rows the first draw doesn't.  Fall back
+    # to an outer join for those draws.
+    aligned = data.drop(columns=list(unaligned))
+    return pd.concat([aligned, *unaligned.values()], axis=1)[list(range(n_draws))]
+
+
+# Per worker state for the shared memory draw loader.  Set once per
+# worker by the pool initializer so the runner and index aren't pickled
+# with every task.
+_SHARED_DRAWS: Dict = {}
+
+
+def _init_shared_draws_worker(runner: Callable[[int], pd.Series], index: pd.Index,
+                              shm_name: str, shape: tuple) -> None:
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _SHARED_DRAWS.update(
+        runner=runner,
+        index=index,
+        shm=shm,  # Keep a reference so the buffer stays mapped.
+        matrix=np.ndarray(shape, dtype=np.float64, buffer=shm.buf, order='F'),
+    )
+
+
+def _write_shared_draw(draw_id: int) -> Optional[pd.Series]:
+    """Writes a draw into the shared matrix.
+
+    Returns nothing on success, or the draw itself if it has rows outside
+    the shared index and must be merged in by the parent.
+    """
+    draw = _SHARED_DRAWS['runner'](draw_id)
+    aligned = _align(draw, _SHARED_DRAWS['index'])
+    if aligned is None:
+        return draw
+    _SHARED_DRAWS['matrix'][:, draw_id] = aligned
+    return None
+
+
+def _load_draws_with_shared_memory(runner: Callable[[int], pd.Series], n_draws: int,
+                                   num_cores: int) -> pd.DataFrame:
+    """Loads draws in a process pool that writes into a shared matrix.
+
+    The first draw is loaded in the parent to fix the common row index.
+    Workers write their draw column straight into a preallocated shared
+    memory matrix and return only a status, so draws are copied once
+    rather than pickled, unpickled, and concatenated.
+    """
+    first_draw = runner(0)
+    index = first_draw.index
+    shape = (len(index), n_draws)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, shape[0] * shape[1] * 8))
+    try:
+        # Column major so each draw is a contiguous block.
+        matrix = np.ndarray(shape, dtype=np.float64, buffer=shm.buf, order='F')
+        matrix[:, 0] = first_draw.to_numpy(dtype=np.float64)
+        with multiprocessing.Pool(num_cores,
+                                  initializer=_init_shared_draws_worker,
+                                  initargs=(runner, index, shm.name, shape)) as pool:
+            unaligned = pool.map(_write_shared_draw, range(1, n_draws))
+        draws = pd.DataFrame(matrix.copy(), index=index, columns=range(n_draws))
+        del matrix
+    finally:
+        shm.close()
+        shm.unlink()
+
+    unaligned = {draw_id: draw for draw_id, draw in enumerate(unaligned, start=1) if draw is not None}
+    return _merge_unaligned(draws, unaligned, n_draws)
+
+
+def _load_draws_with_threads(runner: Callable[[int], pd.Series], n_draws: int, num_cores: int) -> pd.DataFrame:
+    """Loads draws with threaded read-ahead into a preallocated matrix.
+
+    Suited to disk formats whose readers release the GIL.  At most
+    ``num_cores`` draws are held in memory beyond the output matrix.
+    """
+    draws = io.prefetch(runner, range(n_draws), depth=num_cores)
+    first_draw = next(draws)
+    index = first_draw.index
+    matrix = np.empty((len(index), n_draws), dtype=np.float64, order='F')
+    matrix[:, 0] = first_draw.to_numpy(dtype=np.float64)
+    unaligned = {}
+    for draw_id, draw in enumerate(draws, start=1):
+        aligned = _align(draw, index)
+        if aligned is None:
+            unaligned[draw_id] = draw
+        else:
+            matrix[:, draw_id] = aligned
+    data = pd.DataFrame(matrix, index=index, columns=range(n_draws))
+    return _merge_unaligned(data, unaligned, n_draws)
+
+
+DRAW_LOADERS = {
+    'pool': _load_draws_with_pool,
+    'shared_memory': _load_draws_with_shared_memory,
+    'threads': _load_draws_with_threads,
+}
+
+
 def load_deaths(scenario: str, data_interface: 'PostprocessingDataInterface', num_cores: int):
     return load_output_data(scenario, 'deaths', data_interface, num_cores)
 
@@ -79,22 +232,19 @@ def load_raw_census_data(data_interface: 'PostprocessingDataInterface'):
 
 
 def load_output_data(scenario: str, measure: str, data_interface: 'PostprocessingDataInterface', num_cores: int):
+    if data_interface.has_raw_output_draws(scenario, measure):
+        # Already gathered into a single draw matrix by the transpose job.
+        return data_interface.load_raw_output_draws(scenario, measure)
     _runner = functools.partial(
         data_interface.load_raw_outputs,
         scenario=scenario,
         measure=measure,
     )
-    draws = range(data_interface.get_n_draws())
-    with multiprocessing.Pool(num_cores) as pool:
-        outputs = pool.map(_runner, draws)
-    return outputs
+    return load_draws(_runner, data_interface, num_cores)
 
 
 def load_coefficients(scenario: str, data_interface: 'PostprocessingDataInterface', num_cores: int):
-    draws = range(data_interface.get_n_draws())
-    with multiprocessing.Pool(num_cores) as pool:
-        outputs = pool.map(data_interface.load_regression_coefficients, draws)
-    return outputs
+    return load_draws(data_interface.load_regression_coefficients, data_interface, num_cores)
 
 
 def load_scaling_parameters(scenario: str, data_interface: 'PostprocessingDataInterface', num_cores: int):
@@ -102,43 +252,30 @@ def load_scaling_parameters(scenario: str, data_interface: 'PostprocessingDataIn
         data_interface.load_scaling_parameters,
         scenario=scenario,
     )
-    draws = range(data_interface.get_n_draws())
-    with multiprocessing.Pool(num_cores) as pool:
-        outputs = pool.map(_runner, draws)
-    return outputs
+    return load_draws(_runner, data_interface, num_cores)
 
 
 def load_covariate(covariate: str, time_varying: bool, scenario: str,
-                   data_interface: 'PostprocessingDataInterface', num_cores: int) -> List[pd.Series]:
+                   data_interface: 'PostprocessingDataInterface', num_cores: int) -> DrawData:
     _runner = functools.partial(
         data_interface.load_covariate,
         covariate=covariate,
         time_varying=time_varying,
         scenario=scenario,
     )
-    draws = range(data_interface.get_n_draws())
-    with multiprocessing.Pool(num_cores) as pool:
-        outputs = pool.map(_runner, draws)
-
-    return outputs
+    return load_draws(_runner, data_interface, num_cores)
 
 
-def load_betas(scenario: str, data_interface: 'PostprocessingDataInterface', num_cores: int) -> List[pd.Series]:
+def load_betas(scenario: str, data_interface: 'PostprocessingDataInterface', num_cores: int) -> DrawData:
     _runner = functools.partial(
         data_interface.load_betas,
         scenario=scenario,
     )
-    draws = range(data_interface.get_n_draws())
-    with multiprocessing.Pool(num_cores) as pool:
-        betas = pool.map(_runner, draws)
-    return betas
+    return load_draws(_runner, data_interface, num_cores)
 
 
-def load_beta_residuals(scenario: str, data_interface: 'PostprocessingDataInterface', num_cores: int) -> List[pd.Series]:
-    draws = range(data_interface.get_n_draws())
-    with multiprocessing.Pool(num_cores) as pool:
-        beta_residuals = pool.map(data_interface.load_beta_residuals, draws)
-    return beta_residuals
+def load_beta_residuals(scenario: str, data_interface: 'PostprocessingDataInterface', num_cores: int) -> DrawData:
+    return load_draws(data_interface.load_beta_residuals, data_interface, num_cores)
 
 
 def load_full_data(data_interface: 'PostprocessingDataInterface') -> pd.DataFrame:
@@ -8,6 +8,7 @@ from covid_model_seiir_pipeline.lib import (
 
 
 class __PostprocessingJobs(NamedTuple):
+    transpose: str = 'transpose_outputs'
     resample: str = 'resample_map'
     postprocess: str = 'postprocess'
 
@@ -15,6 +16,13 @@ class __PostprocessingJobs(NamedTuple):
 POSTPROCESSING_JOBS = __PostprocessingJobs()
 
 
+class TransposeTaskSpecification(workflow.TaskSpecification):
+    """Specification of execution parameters for raw output transposition tasks."""
+    default_max_runtime_seconds = 5000
+    default_m_mem_free = '50G'
+    default_num_cores = 26
+
+
 class ResampleTaskSpecification(workflow.TaskSpecification):
     """Specification of execution parameters for draw resample mapping tasks."""
     default_max_runtime_seconds = 5000
@@ -33,6 +41,7 @@ class PostprocessingWorkflowSpecification(workflow.WorkflowSpecification):
     """Specification of execution parameters for forecasting workflows."""
 
     tasks = {
+        POSTPROCESSING_JOBS.transpose: TransposeTaskSpecification,
         POSTPROCESSING_JOBS.resample: ResampleTaskSpecification,
         POSTPROCESSING_JOBS.postprocess: PostprocessingTaskSpecification,
     }
@@ -44,6 +53,10 @@ class PostprocessingData:
     forecast_version: str = field(default='best')
     scenarios: list = field(default_factory=lambda: ['worse', 'reference', 'best_masks'])
     output_root: str = field(default='')
+    data_format: str = field(default='csv')
+    # How draw level forecast outputs are gathered, one of 'shared_memory', 'threads', or 'pool'.
+    # 'shared_memory' falls back to 'threads' on python < 3.8.
+    draw_loader: str = field(default='shared_memory')
 
     def to_dict(self) -> Dict:
         """Converts to a dict, coercing list-like items to lists."""
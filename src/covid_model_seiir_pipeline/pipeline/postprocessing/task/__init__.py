@@ -1,3 +1,6 @@
+from covid_model_seiir_pipeline.pipeline.postprocessing.task.transpose_outputs import (
+    transpose_outputs,
+)
 from covid_model_seiir_pipeline.pipeline.postprocessing.task.resample_map import (
     resample_map,
 )
@@ -5,6 +5,7 @@ import pandas as pd
 
 from covid_model_seiir_pipeline.lib import (
     cli_tools,
+    io,
     static_vars,
 )
 from covid_model_seiir_pipeline.pipeline.postprocessing.specification import (
@@ -84,8 +85,9 @@ def postprocess_covariate(postprocessing_spec: PostprocessingSpecification,
     covariate_observed = input_covariate_data.reset_index(level='observed')
     covariate_observed['observed'] = covariate_observed['observed'].fillna(0)
 
-    logger.info(f'Concatenating {covariate}.', context='concatenate')
-    covariate_data = pd.concat(covariate_data, axis=1)
+    if isinstance(covariate_data, (list, tuple)):
+        logger.info(f'Concatenating {covariate}.', context='concatenate')
+        covariate_data = pd.concat(covariate_data, axis=1)
     logger.info('Resampling draws', context='resample')
     covariate_data = model.resample_draws(covariate_data,
                                           data_interface.load_resampling_map())
@@ -168,6 +170,8 @@ def run_seir_postprocessing(postprocessing_version: str, scenario: str, measure:
         Path(postprocessing_version) / static_vars.POSTPROCESSING_SPECIFICATION_FILE
     )
     data_interface = PostprocessingDataInterface.from_specification(postprocessing_spec)
+    # Populations, hierarchies, and model inputs are loaded repeatedly, e.g. once per aggregation.
+    io.enable_cache()
 
     if measure in model.MEASURES:
         postprocess_measure(postprocessing_spec, data_interface, scenario, measure)
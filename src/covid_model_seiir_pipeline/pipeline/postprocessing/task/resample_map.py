@@ -33,7 +33,8 @@ def run_resample_map(postprocessing_version: str) -> None:
                                  workflow_spec.num_cores)
 
     logger.info('Computing resampling map', context='compute')
-    deaths = pd.concat(deaths, axis=1)
+    if isinstance(deaths, (list, tuple)):
+        deaths = pd.concat(deaths, axis=1)
     resampling_map = resampling.build_resampling_map(deaths, resampling_params)
 
     logger.info('Writing resampling map', context='write')
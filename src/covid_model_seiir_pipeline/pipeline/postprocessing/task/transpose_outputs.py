@@ -0,0 +1,65 @@
+import functools
+from pathlib import Path
+
+import click
+
+from covid_model_seiir_pipeline.lib import (
+    cli_tools,
+    io,
+    static_vars,
+)
+from covid_model_seiir_pipeline.pipeline.postprocessing.data import PostprocessingDataInterface
+from covid_model_seiir_pipeline.pipeline.postprocessing.specification import (
+    PostprocessingSpecification,
+    POSTPROCESSING_JOBS,
+)
+
+
+logger = cli_tools.task_performance_logger
+
+
+def run_transpose_outputs(postprocessing_version: str, scenario: str) -> None:
+    """Gathers draw level raw outputs into one draw matrix per measure.
+
+    Each measure postprocessing task needs one measure from every draw of
+    the raw forecast outputs.  Rather than have every one of those tasks
+    read every draw file, we read each draw once here and scatter its
+    measures into per measure draw matrices for the downstream tasks.
+
+    """
+    logger.info(f'Transposing raw outputs for version {postprocessing_version}, scenario {scenario}.',
+                context='setup')
+    postprocessing_spec = PostprocessingSpecification.from_path(
+        Path(postprocessing_version) / static_vars.POSTPROCESSING_SPECIFICATION_FILE
+    )
+    num_cores = postprocessing_spec.workflow.task_specifications[POSTPROCESSING_JOBS.transpose].num_cores
+    data_interface = PostprocessingDataInterface.from_specification(postprocessing_spec)
+    n_draws = data_interface.get_n_draws()
+
+    _loader = functools.partial(
+        data_interface.load_all_raw_outputs,
+        scenario=scenario,
+    )
+    logger.info('Reading draws.', context='read')
+    for draw_id, draw_measures in enumerate(io.prefetch(_loader, range(n_draws), depth=num_cores)):
+        logger.info(f'Writing measures for draw {draw_id}.', context='write')
+        for measure, draw in draw_measures.items():
+            data_interface.save_raw_output_draw(draw, scenario, measure, n_draws)
+
+    logger.report()
+
+
+@click.command()
+@cli_tools.with_task_postprocessing_version
+@cli_tools.with_scenario
+@cli_tools.add_verbose_and_with_debugger
+def transpose_outputs(postprocessing_version: str, scenario: str,
+                      verbose: int, with_debugger: bool):
+    cli_tools.configure_logging_to_terminal(verbose)
+    run = cli_tools.handle_exceptions(run_transpose_outputs, logger, with_debugger)
+    run(postprocessing_version=postprocessing_version,
+        scenario=scenario)
+
+
+if __name__ == '__main__':
+    transpose_outputs()
@@ -23,6 +23,19 @@ class PostprocessingTaskTemplate(workflow.TaskTemplate):
     task_args = ['postprocessing_version']
 
 
+class TransposeOutputsTaskTemplate(workflow.TaskTemplate):
+    task_name_template = f"{POSTPROCESSING_JOBS.transpose}_{{scenario}}"
+    command_template = (
+            f"{shutil.which('stask')} "
+            f"{POSTPROCESSING_JOBS.transpose} "
+            "--postprocessing-version {postprocessing_version} "
+            "--scenario {scenario} "
+            "-vv"
+    )
+    node_args = ['scenario']
+    task_args = ['postprocessing_version']
+
+
 class ResampleMapTaskTemplate(workflow.TaskTemplate):
     task_name_template = f"{POSTPROCESSING_JOBS.resample}"
     command_template = (
@@ -38,6 +51,7 @@ class ResampleMapTaskTemplate(workflow.TaskTemplate):
 class PostprocessingWorkflow(workflow.WorkflowTemplate):
     workflow_name_template = 'seiir-postprocess-{version}'
     task_template_classes = {
+        POSTPROCESSING_JOBS.transpose: TransposeOutputsTaskTemplate,
         POSTPROCESSING_JOBS.resample: ResampleMapTaskTemplate,
         POSTPROCESSING_JOBS.postprocess: PostprocessingTaskTemplate,
     }
@@ -45,16 +59,30 @@ class PostprocessingWorkflow(workflow.WorkflowTemplate):
     # things do fail.
     fail_fast = False
 
-    def attach_tasks(self, measures: List[str], scenarios: List[str]) -> None:
+    def attach_tasks(self, measures: List[str], scenarios: List[str], reference_scenario: str) -> None:
+        transpose_template = self.task_templates[POSTPROCESSING_JOBS.transpose]
         resample_template = self.task_templates[POSTPROCESSING_JOBS.resample]
         postprocessing_template = self.task_templates[POSTPROCESSING_JOBS.postprocess]
 
+        # Each scenario's draw level raw outputs are read once and gathered
+        # into per measure draw matrices for all downstream tasks.
+        transpose_tasks = {}
+        for scenario in scenarios:
+            transpose_task = transpose_template.get_task(
+                postprocessing_version=self.version,
+                scenario=scenario,
+            )
+            self.workflow.add_task(transpose_task)
+            transpose_tasks[scenario] = transpose_task
+
         # The draw resampling map is produced for one reference scenario
         # after the forecasts and then used to postprocess all measures for
         # all scenarios.
         resample_task = resample_template.get_task(
             postprocessing_version=self.version
         )
+        if reference_scenario in transpose_tasks:
+            resample_task.add_upstream(transpose_tasks[reference_scenario])
         self.workflow.add_task(resample_task)
 
         for measure, scenario in itertools.product(measures, scenarios):
@@ -64,4 +92,5 @@ class PostprocessingWorkflow(workflow.WorkflowTemplate):
                 measure=measure,
             )
             postprocessing_task.add_upstream(resample_task)
+            postprocessing_task.add_upstream(transpose_tasks[scenario])
             self.workflow.add_task(postprocessing_task)
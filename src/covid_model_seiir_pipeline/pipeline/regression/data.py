@@ -35,6 +35,9 @@ class RegressionDataInterface:
         self.hospital_fatality_ratio_root = hospital_fatality_ratio_root
         self.coefficient_root = coefficient_root
         self.regression_root = regression_root
+        # Small metadata read by every downstream draw-level loader.
+        self._n_draws = None
+        self._location_ids = None
 
     @classmethod
     def from_specification(cls, specification: RegressionSpecification) -> 'RegressionDataInterface':
@@ -44,11 +47,13 @@ class RegressionDataInterface:
         mortality_rate_root = io.MortalityRateRoot(specification.data.mortality_rate_version)
         hospital_fatality_ratio_root = io.HospitalFatalityRatioRoot(specification.data.hospital_fatality_ratio_version)
         if specification.data.coefficient_version:
-            coefficient_root = io.RegressionRoot(specification.data.coefficient_version)
+            coefficient_spec = io.load(io.RegressionRoot(specification.data.coefficient_version).specification())
+            coefficient_root = io.RegressionRoot(specification.data.coefficient_version,
+                                                 data_format=coefficient_spec['data'].get('data_format', 'csv'))
         else:
             coefficient_root = None
-        # TODO: specify output format from config.
-        regression_root = io.RegressionRoot(specification.data.output_root)
+        regression_root = io.RegressionRoot(specification.data.output_root,
+                                            data_format=specification.data.data_format)
 
         return cls(
             infection_root=infection_root,
@@ -63,8 +68,10 @@ class RegressionDataInterface:
         io.touch(self.regression_root, **prefix_args)
 
     def get_n_draws(self) -> int:
-        regression_spec = io.load(self.regression_root.specification())
-        return regression_spec['regression_parameters']['n_draws']
+        if self._n_draws is None:
+            regression_spec = io.load(self.regression_root.specification())
+            self._n_draws = regression_spec['regression_parameters']['n_draws']
+        return self._n_draws
 
     #########################
     # Raw location handling #
@@ -112,9 +119,9 @@ class RegressionDataInterface:
     ##########################
 
     def load_past_infection_data(self, draw_id: int, location_ids: List[int] = None) -> pd.DataFrame:
-        infection_data = io.load(self.infection_root.infections(draw_id=draw_id))
-        if location_ids:
-            infection_data = infection_data.loc[infection_data.location_id.isin(location_ids)]
+        infection_data = io.load(self.infection_root.infections(draw_id=draw_id),
+                                 columns=['location_id', 'date', 'infections_draw', 'deaths'],
+                                 location_ids=location_ids if location_ids else None)
         infection_data['date'] = pd.to_datetime(infection_data['date'])
         infection_data = (infection_data
                           .set_index(['location_id', 'date'])
@@ -147,9 +154,9 @@ class RegressionDataInterface:
                              f'missing a reference scenario: {missing}.')
 
     def load_covariate(self, covariate: str, location_ids: List[int]) -> pd.DataFrame:
-        covariate_df = io.load(self.covariate_root[covariate](covariate_scenario='reference'))
+        covariate_df = io.load(self.covariate_root[covariate](covariate_scenario='reference'),
+                               location_ids=location_ids)
         index_columns = ['location_id']
-        covariate_df = covariate_df.loc[covariate_df['location_id'].isin(location_ids), :]
         if 'date' in covariate_df.columns:
             covariate_df['date'] = pd.to_datetime(covariate_df['date'])
             index_columns.append('date')
@@ -169,8 +176,7 @@ class RegressionDataInterface:
     ######################
 
     def load_ifr_data(self, draw_id: int, location_ids: List[int]) -> pd.DataFrame:
-        ifr = io.load(self.infection_root.ifr(draw_id=draw_id))
-        ifr = ifr[ifr.location_id.isin(location_ids)]
+        ifr = io.load(self.infection_root.ifr(draw_id=draw_id), location_ids=location_ids)
         ifr['date'] = pd.to_datetime(ifr['date'])
         ifr = ifr.set_index(['location_id', 'date', 'duration']).sort_index()
         cols = [c for c in ifr.columns if '_draw' in c]
@@ -178,8 +184,9 @@ class RegressionDataInterface:
         return ifr.reset_index(level='duration')
 
     def load_mortality_ratio(self, location_ids: List[int]) -> pd.Series:
-        mr_df = io.load(self.mortality_rate_root.mortality_rate())
-        mr_df = mr_df.loc[mr_df.location_id.isin(location_ids), ['location_id', 'age_start', 'MRprob']]
+        mr_df = io.load(self.mortality_rate_root.mortality_rate(),
+                        columns=['location_id', 'age_start', 'MRprob'],
+                        location_ids=location_ids)
         return mr_df.set_index(['location_id', 'age_start']).MRprob
 
     def load_hospital_fatality_ratio(self,
@@ -239,7 +246,7 @@ class RegressionDataInterface:
         metadata = self.get_model_inputs_metadata()
         model_inputs_version = metadata['output_path']
         population_path = Path(model_inputs_version) / 'output_measures' / 'population' / 'all_populations.csv'
-        population_data = pd.read_csv(population_path)
+        population_data = io.read_csv(population_path)
         return population_data
 
     def load_five_year_population(self, location_ids: List[int]) -> pd.DataFrame:
@@ -289,9 +296,12 @@ class RegressionDataInterface:
 
     def save_location_ids(self, location_ids: List[int]) -> None:
         io.dump(location_ids, self.regression_root.locations())
+        self._location_ids = None
 
     def load_location_ids(self) -> List[int]:
-        return io.load(self.regression_root.locations())
+        if self._location_ids is None:
+            self._location_ids = io.load(self.regression_root.locations())
+        return list(self._location_ids)
 
     def save_hierarchy(self, hierarchy: pd.DataFrame) -> None:
         io.dump(hierarchy, self.regression_root.hierarchy())
@@ -3,6 +3,7 @@ from covid_model_seiir_pipeline.pipeline.regression.model.containers import (
     HospitalCensusData,
     HospitalMetrics,
     HospitalCorrectionFactors,
+    PackedInfections,
 )
 from covid_model_seiir_pipeline.pipeline.regression.model.ode_fit import (
     sample_parameters,
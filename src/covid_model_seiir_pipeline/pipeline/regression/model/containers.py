@@ -1,7 +1,8 @@
 """Containers for regression data."""
 from dataclasses import dataclass
-from typing import Dict, Union
+from typing import Dict, List, Union
 
+import numpy as np
 import pandas as pd
 
 from covid_model_seiir_pipeline.lib import (
@@ -21,6 +22,42 @@ class ODEParameters:
     def to_dict(self) -> Dict[str, Union[int, float]]:
         return utilities.asdict(self)
 
+
+@dataclass
+class PackedInfections:
+    """Past infections for many locations packed into flat arrays.
+
+    The series for ``location_ids[i]`` is ``values[offsets[i]:offsets[i + 1]]``
+    on the days (since the epoch) ``days[offsets[i]:offsets[i + 1]]``,
+    in date order.
+
+    """
+    location_ids: np.ndarray
+    offsets: np.ndarray
+    days: np.ndarray
+    values: np.ndarray
+
+    @classmethod
+    def from_series(cls, infections: pd.Series, location_ids: List[int]) -> 'PackedInfections':
+        """Packs a (location_id, date) indexed series for the given locations."""
+        location_idx = pd.Index(location_ids).get_indexer(infections.index.get_level_values('location_id'))
+        keep = location_idx >= 0
+        location_idx = location_idx[keep]
+        days = (infections.index.get_level_values('date')[keep]
+                .values.astype('datetime64[D]').astype(np.int64))
+        order = np.lexsort((days, location_idx))
+        counts = np.bincount(location_idx, minlength=len(location_ids))
+        return cls(
+            location_ids=np.asarray(location_ids),
+            offsets=np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+            days=days[order],
+            values=infections.to_numpy(dtype=np.float64)[keep][order],
+        )
+
+    def to_dict(self) -> Dict[str, np.ndarray]:
+        return utilities.asdict(self)
+
+
 @dataclass
 class HospitalFatalityRatioData:
     age_specific: pd.Series
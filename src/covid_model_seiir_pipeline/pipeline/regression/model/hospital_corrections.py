@@ -144,6 +144,148 @@ def read_correction_data(correction_path):
     return df
 
 
+def compute_hospital_usage(all_age_deaths: pd.DataFrame,
+                           death_weights: pd.Series,
+                           hospital_fatality_ratio: HospitalFatalityRatioData,
+                           hospital_parameters: 'HospitalParameters',
+                           vectorized: bool = True) -> HospitalMetrics:
+    """Computes hospital admissions and census implied by deaths.
+
+    Each location's deaths are assumed to be on consecutive days.  By
+    default, all metrics are computed in one pass over dense (location x
+    age x date) arrays.  ``vectorized=False`` uses the original pandas
+    implementation, which is much slower but kept as a reference.
+
+    """
+    if vectorized:
+        return _compute_hospital_usage_arrays(all_age_deaths, death_weights,
+                                              hospital_fatality_ratio, hospital_parameters)
+    return _compute_hospital_usage_frames(all_age_deaths, death_weights,
+                                          hospital_fatality_ratio, hospital_parameters)
+
+
+def _compute_hospital_usage_arrays(all_age_deaths: pd.DataFrame,
+                                   death_weights: pd.Series,
+                                   hospital_fatality_ratio: HospitalFatalityRatioData,
+                                   hospital_parameters: 'HospitalParameters') -> HospitalMetrics:
+    all_age_deaths = all_age_deaths.set_index(['location_id', 'date'])['deaths'].sort_index()
+    location_idx, location_ids = pd.factorize(all_age_deaths.index.get_level_values('location_id'), sort=True)
+    day = all_age_deaths.index.get_level_values('date').values.astype('datetime64[D]').astype(np.int64)
+    date_idx = day - day.min()
+    n_locations, n_dates = len(location_ids), int(date_idx.max()) + 1
+
+    # (location x date) grids, zero outside each location's dates.
+    start = np.full(n_locations, n_dates, dtype=np.int64)
+    stop = np.zeros(n_locations, dtype=np.int64)
+    np.minimum.at(start, location_idx, date_idx)
+    np.maximum.at(stop, location_idx, date_idx + 1)
+    length = stop - start
+    position = np.arange(n_dates) - start[:, None]
+    valid = (0 <= position) & (position < length[:, None])
+    deaths = np.zeros((n_locations, n_dates))
+    deaths[location_idx, date_idx] = all_age_deaths.to_numpy(dtype=np.float64)
+
+    ages = death_weights.index.get_level_values('age').unique().sort_values()
+    weights = death_weights.unstack('age').reindex(index=location_ids, columns=ages).to_numpy()
+    age_specific_hfr = (hospital_fatality_ratio.age_specific
+                        .unstack('age')
+                        .reindex(index=location_ids, columns=ages)
+                        .to_numpy())
+    all_age_hfr = hospital_fatality_ratio.all_age.reindex(location_ids)
+    prob_icu = get_p_icu_if_recover(all_age_hfr, hospital_parameters).to_numpy()[:, None]
+    prob_no_icu = 1 - prob_icu
+    prob_invasive = get_p_int_if_icu_and_recover(all_age_hfr, hospital_parameters).to_numpy()[:, None]
+
+    def _shift(data: np.ndarray, periods: int) -> np.ndarray:
+        return _shift_within_locations(data, periods, valid)
+
+    def _to_census(admissions: np.ndarray, length_of_stay: int) -> np.ndarray:
+        return _to_census_within_locations(admissions, length_of_stay, position)
+
+    # For each death, calculate number of hospital admissions of people who
+    # don't die and shift back in time.
+    age_specific_deaths = deaths[:, None, :] * weights[:, :, None]
+    recovered_hospital_admissions = _shift(
+        np.nansum(age_specific_deaths * (age_specific_hfr[:, :, None] - 1), axis=1),
+        -(hospital_parameters.hospital_stay_death - 1),
+    )
+    # Split people into those who go to ICU and those who don't and count the
+    # days they spend in the hospital.
+    recovered_hospital_census = (
+        _to_census(prob_no_icu * recovered_hospital_admissions, hospital_parameters.hospital_stay_recover)
+        + _to_census(prob_icu * recovered_hospital_admissions, hospital_parameters.hospital_stay_recover_icu)
+    )
+    # Scale down hospitalizations to those who go to ICU and shift forward.
+    recovered_icu_admissions = _shift(prob_icu * recovered_hospital_admissions, hospital_parameters.hospital_to_icu)
+    # Count number of days those who go to ICU spend there.
+    recovered_icu_census = _to_census(recovered_icu_admissions, hospital_parameters.icu_stay_recover)
+    # Ventilation usage is just scaled ICU usage.
+    recovered_ventilator_census = prob_invasive * recovered_icu_census
+
+    # Every death corresponds to a hospital admission shifted back some number
+    # of days.
+    dead_hospital_admissions = _shift(deaths, -(hospital_parameters.hospital_stay_death - 1))
+    # Count days from admission to get hospital census for those who die.
+    dead_hospital_census = _to_census(dead_hospital_admissions, hospital_parameters.hospital_stay_death)
+    # Assume people who die after entering the hospital are intubated in the
+    # ICU for their full stay.
+    dead_icu_admissions = dead_hospital_admissions
+    dead_icu_census = dead_hospital_census
+    dead_ventilator_census = dead_icu_census
+
+    # Drop data after the last admission since it will be incomplete.
+    keep = position[location_idx, date_idx] < length[location_idx] - (hospital_parameters.hospital_stay_death - 1)
+    index = all_age_deaths.index[keep]
+    location_idx, date_idx = location_idx[keep], date_idx[keep]
+
+    def _combine(recovered, dead):
+        return pd.Series((recovered + dead)[location_idx, date_idx], index=index)
+
+    return HospitalMetrics(
+        hospital_admissions=_combine(recovered_hospital_admissions, dead_hospital_admissions),
+        hospital_census=_combine(recovered_hospital_census, dead_hospital_census),
+        icu_admissions=_combine(recovered_icu_admissions, dead_icu_admissions),
+        icu_census=_combine(recovered_icu_census, dead_icu_census),
+        ventilator_census=_combine(recovered_ventilator_census, dead_ventilator_census),
+    )
+
+
+def _shift_within_locations(data: np.ndarray, periods: int, valid: np.ndarray) -> np.ndarray:
+    """Shifts (location x date) data along dates, filling with zeros outside each location's dates."""
+    shifted = np.zeros_like(data)
+    if periods > 0:
+        shifted[:, periods:] = data[:, :-periods]
+    elif periods < 0:
+        shifted[:, :periods] = data[:, -periods:]
+    else:
+        shifted[:] = data
+    shifted[~valid] = 0.
+    return shifted
+
+
+def _to_census_within_locations(admissions: np.ndarray, length_of_stay: int, position: np.ndarray) -> np.ndarray:
+    """Sums (location x date) admissions over trailing windows of the length of stay.
+
+    Windows that start before a location's first date or contain missing
+    admissions are zero.
+
+    """
+    census = np.zeros_like(admissions)
+    if length_of_stay > admissions.shape[1]:
+        return census
+    missing = np.isnan(admissions)
+    total = np.zeros((admissions.shape[0], admissions.shape[1] + 1))
+    np.cumsum(np.where(missing, 0., admissions), axis=1, out=total[:, 1:])
+    n_missing = np.zeros(total.shape, dtype=np.int64)
+    np.cumsum(missing, axis=1, out=n_missing[:, 1:])
+
+    window_total = total[:, length_of_stay:] - total[:, :-length_of_stay]
+    window_missing = n_missing[:, length_of_stay:] - n_missing[:, :-length_of_stay]
+    census[:, length_of_stay - 1:] = np.where(window_missing > 0, 0., window_total)
+    census[position < length_of_stay - 1] = 0.
+    return census
+
+
 def _to_census(admissions: pd.Series, length_of_stay: int) -> pd.Series:
     return (admissions
             .groupby('location_id')
@@ -151,10 +293,10 @@ def _to_census(admissions: pd.Series, length_of_stay: int) -> pd.Series:
             .fillna(0))
 
 
-def compute_hospital_usage(all_age_deaths: pd.DataFrame,
-                           death_weights: pd.Series,
-                           hospital_fatality_ratio: HospitalFatalityRatioData,
-                           hospital_parameters: 'HospitalParameters') -> HospitalMetrics:
+def _compute_hospital_usage_frames(all_age_deaths: pd.DataFrame,
+                                   death_weights: pd.Series,
+                                   hospital_fatality_ratio: HospitalFatalityRatioData,
+                                   hospital_parameters: 'HospitalParameters') -> HospitalMetrics:
     all_age_deaths = all_age_deaths.set_index(['location_id', 'date'])['deaths'].sort_index()
     age_specific_deaths = (all_age_deaths * death_weights).reorder_levels(['location_id', 'age', 'date'])
 
@@ -10,6 +10,7 @@ from covid_model_seiir_pipeline.lib import (
 )
 from covid_model_seiir_pipeline.pipeline.regression.model.containers import (
     ODEParameters,
+    PackedInfections,
 )
 
 
@@ -28,18 +29,158 @@ def sample_parameters(draw_id: int, regression_parameters: Dict) -> ODEParameter
 def run_beta_fit(past_infections: pd.Series,
                  population: pd.Series,
                  location_ids: List[int],
-                 ode_parameters: ODEParameters) -> pd.DataFrame:
-    beta_fit_dfs = []
-    for location_id in location_ids:
-        beta_fit = run_loc_beta_fit(
-            infections=past_infections.loc[location_id],
-            total_population=population.loc[location_id],
-            location_id=location_id,
-            ode_parameters=ode_parameters,
-        )
-        beta_fit_dfs.append(beta_fit)
-    beta_fit = pd.concat(beta_fit_dfs)
-    return beta_fit
+                 ode_parameters: ODEParameters,
+                 solver: str = 'RK45',
+                 num_cores: int = 1) -> pd.DataFrame:
+    """Runs the beta fit for all locations concurrently.
+
+    Infections are packed into flat arrays and each location is filtered to
+    its epidemic threshold and fit in parallel across ``num_cores`` threads.
+    Each compartment in the fit follows ``dx/dt = -c * x + f(t)`` where the
+    forcing ``f`` is linear between data points.  The ``RK45`` solver
+    integrates this with RK4 steps of ``solver_dt``.  The ``exponential``
+    solver steps from one data point to the next in closed form, with no
+    step size error.
+
+    Produces the same output as ``run_loc_beta_fit`` for each location.
+
+    """
+    packed = PackedInfections.from_series(past_infections, location_ids)
+    total_population = population.loc[location_ids].to_numpy(dtype=np.float64)
+
+    numba.set_num_threads(max(1, min(num_cores, numba.config.NUMBA_NUM_THREADS)))
+    start, stop, beta, components = _fit_locations(
+        packed.offsets, packed.days, packed.values, total_population,
+        ode_parameters.day_shift,
+        ode_parameters.alpha, ode_parameters.sigma, ode_parameters.gamma1, ode_parameters.gamma2,
+        solver == 'exponential', float(ode_parameters.solver_dt),
+    )
+
+    position = np.arange(packed.values.size)
+    location_idx = np.repeat(np.arange(len(location_ids)), np.diff(packed.offsets))
+    in_fit = (start[location_idx] <= position) & (position < stop[location_idx])
+    return pd.DataFrame({
+        'location_id': packed.location_ids[location_idx[in_fit]],
+        'date': packed.days[in_fit].astype('datetime64[D]').astype('datetime64[ns]'),
+        'beta': beta[in_fit],
+        **{c: components[i, in_fit] for i, c in enumerate(['S', 'E', 'I1', 'I2', 'R'])},
+    })
+
+
+@numba.njit(parallel=True, cache=True)
+def _fit_locations(offsets, days, values, total_population, day_shift,
+                   alpha, sigma, gamma1, gamma2, exponential, dt):
+    n_locations = offsets.size - 1
+    # Absolute (packed) start and stop of each location's fit.
+    start = np.zeros(n_locations, dtype=np.int64)
+    stop = np.zeros(n_locations, dtype=np.int64)
+    beta = np.full(values.size, np.nan)
+    components = np.full((5, values.size), np.nan)
+    for loc in numba.prange(n_locations):
+        offset = offsets[loc]
+        loc_days = days[offset:offsets[loc + 1]]
+        loc_values = values[offset:offsets[loc + 1]]
+        if loc_days.size == 0:
+            continue
+        loc_start, loc_stop = _epi_threshold_window(loc_days, loc_values, day_shift)
+        start[loc] = offset + loc_start
+        stop[loc] = offset + loc_stop
+        _fit_location(loc_days[loc_start:loc_stop], loc_values[loc_start:loc_stop], total_population[loc],
+                      alpha, sigma, gamma1, gamma2, exponential, dt,
+                      beta[offset + loc_start:offset + loc_stop],
+                      components[:, offset + loc_start:offset + loc_stop])
+    return start, stop, beta, components
+
+
+@numba.njit(cache=True)
+def _epi_threshold_window(days, values, day_shift, threshold=50.):
+    """Array version of ``filter_to_epi_threshold``, returning the window's [start, stop) indices."""
+    stop = np.searchsorted(days, days[-1] - day_shift, side='right')
+    start = _first_above(values, threshold)
+    while stop - start <= 2:
+        threshold *= 0.5
+        start = _first_above(values, threshold)
+        if threshold < 1e-6:
+            start = 0
+            break
+    return start, stop
+
+
+@numba.njit(cache=True)
+def _first_above(values, threshold):
+    for i in range(values.size):
+        if threshold <= values[i]:
+            return i
+    return values.size
+
+
+@numba.njit(cache=True)
+def _fit_location(days, obs, total_population, alpha, sigma, gamma1, gamma2, exponential, dt,
+                  beta, components):
+    s, e, i1, i2, r = components[0], components[1], components[2], components[3], components[4]
+    s[0] = total_population - obs[0] - (obs[0] / 5.0) ** (1.0 / alpha)
+    e[0] = obs[0]
+    i1[0] = (obs[0] / 5.0) ** (1.0 / alpha)
+    i2[0] = 0.
+    r[0] = 0.
+    for k in range(obs.size - 1):
+        h = float(days[k + 1] - days[k])
+        # Compartments are solved in order, each forced by the last.
+        s[k + 1] = _linear_step(s[k], 0., -obs[k], -obs[k + 1], h, exponential, dt)
+        e[k + 1] = _linear_step(e[k], sigma, obs[k], obs[k + 1], h, exponential, dt)
+        i1[k + 1] = _linear_step(i1[k], gamma1, sigma * e[k], sigma * e[k + 1], h, exponential, dt)
+        i2[k + 1] = _linear_step(i2[k], gamma2, gamma1 * i1[k], gamma1 * i1[k + 1], h, exponential, dt)
+        r[k + 1] = _linear_step(r[k], 0., gamma2 * i2[k], gamma2 * i2[k + 1], h, exponential, dt)
+
+    for k in range(obs.size):
+        if s[k] < 0.0:
+            # Hold all compartments fixed from the day before susceptibles go negative.
+            for c in range(5):
+                components[c, k:] = components[c, k - 1]
+            break
+
+    for k in range(obs.size):
+        disease_density = s[k] * (i1[k] + i2[k]) ** alpha / total_population
+        beta[k] = obs[k] / disease_density
+
+
+@numba.njit(cache=True)
+def _linear_step(x, c, f_0, f_1, h, exponential, dt):
+    """Steps ``dx/dt = -c * x + f(t)`` forward by ``h`` with ``f`` linear from ``f_0`` to ``f_1``."""
+    if exponential:
+        return _exponential_step(x, c, f_0, f_1, h)
+    return _rk4_step(x, c, f_0, f_1, h, dt)
+
+
+@numba.njit(cache=True)
+def _exponential_step(x, c, f_0, f_1, h):
+    z = c * h
+    if abs(z) < 1e-4:
+        # Series expansions of the weights below near ch = 0.
+        total_weight = h * (1 - z / 2 + z**2 / 6)
+        right_weight = h * (1 / 2 - z / 6 + z**2 / 24)
+    else:
+        total_weight = -h * np.expm1(-z) / z
+        right_weight = h * (1 - total_weight / h) / z
+    # Integrals of the decay kernel against the forcing's weight on
+    # the step's left and right end points.
+    left_weight = total_weight - right_weight
+    return np.exp(-z) * x + left_weight * f_0 + right_weight * f_1
+
+
+@numba.njit(cache=True)
+def _rk4_step(x, c, f_0, f_1, h, dt):
+    n_steps = max(1, int(np.ceil(h / dt - 1e-9)))
+    step = h / n_steps
+    slope = (f_1 - f_0) / h
+    for i in range(n_steps):
+        t = i * step
+        k1 = -c * x + f_0 + slope * t
+        k2 = -c * (x + step / 2 * k1) + f_0 + slope * (t + step / 2)
+        k3 = -c * (x + step / 2 * k2) + f_0 + slope * (t + step / 2)
+        k4 = -c * (x + step * k3) + f_0 + slope * (t + step)
+        x = x + step / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+    return x
 
 
 def run_loc_beta_fit(infections: pd.Series,
@@ -54,7 +195,7 @@ def run_loc_beta_fit(infections: pd.Series,
     t = (date - date.min()).dt.days.values
     obs = infections.values
 
-    shared_options = {'system': linear_first_order, 't': t, 'dt': ode_parameters.solver_dt}
+    shared_options = {'system': linear_first_order_inplace, 't': t, 'dt': ode_parameters.solver_dt}
 
     susceptible = math.solve_ode(
         init_cond=np.array([total_population - obs[0] - (obs[0] / 5.0) ** (1.0 / ode_parameters.alpha)]),
@@ -126,12 +267,19 @@ def run_loc_beta_fit(infections: pd.Series,
     })
 
 
-@numba.njit
-def linear_first_order(t: float, y: np.ndarray, p: np.ndarray):
+@math.register_system
+@numba.njit(cache=True)
+def linear_first_order_inplace(t: float, y: np.ndarray, p: np.ndarray, out: np.ndarray):
     c, f = p
     x = y[0]
-    dx = -c * x + f
-    return np.array([dx])
+    out[0] = -c * x + f
+
+
+@numba.njit(cache=True)
+def linear_first_order(t: float, y: np.ndarray, p: np.ndarray):
+    dx = np.empty_like(y)
+    linear_first_order_inplace(t, y, p, dx)
+    return dx
 
 
 def filter_to_epi_threshold(location_id: int,
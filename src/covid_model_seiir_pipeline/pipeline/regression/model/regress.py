@@ -40,8 +40,9 @@ class IBetaRegressor:
 
 class BetaRegressor(IBetaRegressor):
 
-    def __init__(self, covmodel_set: CovModelSet):
+    def __init__(self, covmodel_set: CovModelSet, solver: str = 'L-BFGS-B'):
         self.covmodel_set = covmodel_set
+        self.solver = solver
         self.col_covs = [covmodel.col_cov for covmodel in covmodel_set.cov_models]
 
     def fit_no_random(self, mr_data: MRData) -> np.ndarray:
@@ -49,12 +50,12 @@ class BetaRegressor(IBetaRegressor):
         for covmodel in covmodel_set_fixed.cov_models:
             covmodel.use_re = False
         mr_model_fixed = MRModel(mr_data, covmodel_set_fixed)
-        mr_model_fixed.fit_model()
+        mr_model_fixed.fit_model(solver=self.solver)
         return list(mr_model_fixed.result.values())[0]
 
     def fit(self, mr_data: MRData, _: bool = None) -> pd.DataFrame:
         mr_model = MRModel(mr_data, self.covmodel_set)
-        mr_model.fit_model()
+        mr_model.fit_model(solver=self.solver)
         cov_coef = mr_model.result
         coef = pd.DataFrame.from_dict(cov_coef, orient='index').reset_index()
         coef.columns = ['location_id'] + self.col_covs
@@ -63,8 +64,9 @@ class BetaRegressor(IBetaRegressor):
 
 class BetaRegressorSequential(IBetaRegressor):
 
-    def __init__(self, ordered_covmodel_sets, default_std=1.0):
+    def __init__(self, ordered_covmodel_sets, default_std=1.0, solver: str = 'L-BFGS-B'):
         self.default_std = default_std
+        self.solver = solver
         self.ordered_covmodel_sets = copy.deepcopy(ordered_covmodel_sets)
         self.col_covs = []
         for covmodel_set in self.ordered_covmodel_sets:
@@ -82,7 +84,7 @@ class BetaRegressorSequential(IBetaRegressor):
                 covmodel_gprior_std.append(cov_model.gprior[1])
                 cov_model.gprior[1] = np.inf
 
-            regressor = BetaRegressor(covmodel_set)
+            regressor = BetaRegressor(covmodel_set, self.solver)
             cov_coef_fixed = regressor.fit_no_random(mr_data)
 
             for covmodel, coef in zip(covmodel_set.cov_models[len(covmodels):],
@@ -97,7 +99,7 @@ class BetaRegressorSequential(IBetaRegressor):
                 cov_model.bounds = np.array(covmodel_bounds[i])
                 cov_model.gprior[1] = covmodel_gprior_std[i]
             # Otherwise we'll do nothing and just refit the random effects.
-        regressor = BetaRegressor(CovModelSet(covmodels))
+        regressor = BetaRegressor(CovModelSet(covmodels), self.solver)
         return regressor.fit(mr_data)
 
 
@@ -115,7 +117,8 @@ def align_beta_with_covariates(covariate_df: pd.DataFrame,
 
 
 def build_regressor(covariates: Iterable['CovariateSpecification'],
-                    prior_coefficients: Optional[pd.DataFrame]) -> Union[BetaRegressor, BetaRegressorSequential]:
+                    prior_coefficients: Optional[pd.DataFrame],
+                    solver: str = 'L-BFGS-B') -> Union[BetaRegressor, BetaRegressorSequential]:
     """
     Based on a list of `CovariateSpecification`s and an ordered list of lists of covariate
     names, create a CovModelSet.
@@ -131,8 +134,8 @@ def build_regressor(covariates: Iterable['CovariateSpecification'],
     ordered_covmodel_sets = [CovModelSet(covariate_group)
                              for _, covariate_group in sorted(covariate_models.items())]
     if len(ordered_covmodel_sets) > 1:
-        regressor = BetaRegressorSequential(ordered_covmodel_sets)
+        regressor = BetaRegressorSequential(ordered_covmodel_sets, solver=solver)
     else:
-        regressor = BetaRegressor(ordered_covmodel_sets[0])
+        regressor = BetaRegressor(ordered_covmodel_sets[0], solver)
 
     return regressor
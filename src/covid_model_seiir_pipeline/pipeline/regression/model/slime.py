@@ -5,8 +5,8 @@ Doing a direct include here so I can figure out how to speed up the regression.
 from typing import Dict, Any
 
 import numpy as np
-from scipy.linalg import block_diag
 import scipy.optimize as sciopt
+from scipy import sparse
 
 
 class MRData:
@@ -125,27 +125,95 @@ class MRModel:
         """
         return self.cov_models.hessian(x, self.obs_se)
 
-    def fit_model(self, x0=None, options=None):
+    def fit_model(self, x0=None, options=None, solver='L-BFGS-B'):
         """Fit the model, including initial condition and parameter.
         Args:
             x0 (np.ndarray, optional):
                 Initial guess for the optimization variable.
             options (None | dict):
                 Optimization solver options.
+            solver (str, optional):
+                Either 'L-BFGS-B' to use the general purpose scipy
+                minimizer or 'direct' to solve the bounded least squares
+                problem with a projected newton method on its block
+                structured normal equations.
         """
         if x0 is None:
             x0 = np.zeros(self.cov_models.var_size)
-        self.opt_result = sciopt.minimize(
-            fun=self.objective,
-            x0=x0,
-            jac=self.gradient,
-            method='L-BFGS-B',
-            bounds=self.bounds,
-            options=options
-        )
+        if solver == 'L-BFGS-B':
+            self.opt_result = sciopt.minimize(
+                fun=self.objective,
+                x0=x0,
+                jac=self.gradient,
+                method='L-BFGS-B',
+                bounds=self.bounds,
+                options=options
+            )
+        elif solver == 'direct':
+            self.opt_result = self._fit_direct(x0, options)
+        else:
+            raise ValueError(f'Unknown solver {solver}.')
 
         self.result = self.cov_models.process_result(self.opt_result.x)
 
+    def _fit_direct(self, x0, options=None):
+        """Projected newton method for the bounded quadratic objective.
+
+        Variables at a bound with the gradient pointing out of the feasible
+        region are held fixed, the newton step is taken on the rest, and
+        the step is projected back onto the bounds with a backtracking line
+        search (Bertsekas, 1982).  With the right set of fixed variables,
+        a single full step solves the problem exactly.
+
+        Args:
+            x0 (np.ndarray): Initial guess for the optimization variable.
+            options (None | dict):
+                Solver options: maxiter, gtol (projected gradient
+                tolerance) and ftol (relative objective change tolerance).
+        """
+        options = {} if options is None else options
+        max_iter = options.get('maxiter', 100)
+        gtol = options.get('gtol', 1e-10)
+        ftol = options.get('ftol', 1e-15)
+
+        lower, upper = self.bounds[:, 0], self.bounds[:, 1]
+        normal_equations = BlockNormalEquations(self.cov_models, self.obs_se)
+        x = np.clip(x0, lower, upper)
+        val = self.objective(x)
+        grad = self.gradient(x)
+        success, message = False, 'Maximum number of iterations reached.'
+        nit = 0
+        for nit in range(1, max_iter + 1):
+            projected_grad = np.clip(x - grad, lower, upper) - x
+            if np.max(np.abs(projected_grad), initial=0.) <= gtol:
+                success, message = True, 'Projected gradient below tolerance.'
+                break
+            eps = min(np.linalg.norm(projected_grad), 1e-8)
+            fixed = ((lower == upper)
+                     | ((x <= lower + eps) & (grad > 0))
+                     | ((x >= upper - eps) & (grad < 0)))
+            step = normal_equations.solve(-grad, fixed)
+
+            alpha = 1.0
+            while True:
+                x_new = np.clip(x + alpha*step, lower, upper)
+                val_new = self.objective(x_new)
+                if val_new <= val + 1e-4*grad.dot(x_new - x) or alpha < 1e-10:
+                    break
+                alpha *= 0.5
+            if val_new > val:
+                message = 'Line search failed to reduce the objective.'
+                break
+
+            converged = val - val_new <= ftol*max(abs(val), abs(val_new), 1.0)
+            x, val = x_new, val_new
+            grad = self.gradient(x)
+            if converged:
+                success, message = True, 'Relative reduction of objective below tolerance.'
+                break
+
+        return sciopt.OptimizeResult(x=x, fun=val, jac=grad, nit=nit, success=success, message=message)
+
     def sample_soln(self, num_draws: int = 1) -> Dict[Any, np.ndarray]:
         """Create draws for the solution.
 
@@ -218,6 +286,7 @@ class CovModel:
 
         self.group_idx = None
         self.group_sizes = None
+        self.group_starts = None
 
     def attach_data(self, data: MRData):
         """Attach the data.
@@ -227,6 +296,8 @@ class CovModel:
         """
         self.group_idx = data.group_idx
         self.group_sizes = data.group_sizes
+        # Data is sorted by group, so each group is a contiguous segment.
+        self.group_starts = np.array([idx[0] for idx in self.group_idx], dtype=int)
         assert self.col_cov in data.df
         if self.use_re:
             self.var_size = data.num_groups
@@ -239,12 +310,14 @@ class CovModel:
         self.cov = cov/cov_scale
         self.cov_scale = cov_scale
         if self.use_re:
-            self.cov_mat = block_diag(*[
-                self.cov[self.group_idx[i]][:, None]
-                for i in range(data.num_groups)
-            ])
+            # One column per group, with the group's covariate values in its
+            # rows, so only O(num_obs) entries are stored.
+            self.cov_mat = sparse.csr_matrix(
+                (self.cov, (np.arange(data.num_obs), np.repeat(np.arange(data.num_groups), self.group_sizes))),
+                shape=(data.num_obs, data.num_groups),
+            )
         else:
-            self.cov_mat = self.cov[:, None]
+            self.cov_mat = sparse.csr_matrix(self.cov[:, None])
 
     def detach_data(self):
         """Detach the object from the data.
@@ -255,6 +328,7 @@ class CovModel:
         self.cov_scale = None
         self.group_sizes = None
         self.group_idx = None
+        self.group_starts = None
 
     def get_cov_multiplier(self, x):
         """Transform the effect to the optimization variable.
@@ -305,7 +379,11 @@ class CovModel:
         Return:
             np.ndarray: gradient
         """
-        grad = -(self.cov_mat.T/obs_se).dot(residual/obs_se)
+        weighted_residual = self.cov*residual/obs_se**2
+        if self.use_re:
+            grad = -np.add.reduceat(weighted_residual, self.group_starts)
+        else:
+            grad = -np.sum(weighted_residual, keepdims=True)
         x = x/self.cov_scale
         if self.use_re and np.isfinite(self.re_var):
             grad += ((x - np.mean(x))/self.re_var)/self.cov_scale
@@ -426,15 +504,15 @@ class CovModelSet:
         Returns:
             np.ndarray: Hessian matrix.
         """
-        cov_mat = np.hstack([
+        cov_mat = sparse.hstack([
             cov_model.cov_mat
             for cov_model in self.cov_models
-        ])
+        ], format='csr')
         prior_diag = np.hstack([
             np.repeat(1.0/cov_model.gprior[1]**2, cov_model.var_size)
             for cov_model in self.cov_models
         ])
-        return (cov_mat.T/obs_se**2).dot(cov_mat) + np.diag(prior_diag)
+        return (cov_mat.T @ sparse.diags(1.0/obs_se**2) @ cov_mat).toarray() + np.diag(prior_diag)
 
     def extract_bounds(self):
         """Extract the bounds for the optimization problem.
@@ -462,6 +540,119 @@ class CovModelSet:
         }
 
 
+class BlockNormalEquations:
+    """Hessian of the MRModel objective, stored by its block structure.
+
+    Random effects only interact with the other random effects of their own
+    group, with the fixed effects and, through the random effect priors,
+    with the mean of their own effect over all groups.  Ordered by group, the
+    hessian is block diagonal with one small (num_re x num_re) block per
+    group, minus a low rank update for the priors, bordered by the
+    (num_fe x num_fe) fixed effect block.  Solves are linear in the number
+    of groups.
+    """
+
+    def __init__(self, cov_models: 'CovModelSet', obs_se: np.ndarray):
+        """Constructor of the normal equations.
+
+        Args:
+            cov_models (CovModelSet): Covariate models attached to the data.
+            obs_se (np.ndarray): observation standard error.
+        """
+        models = cov_models.cov_models
+        self.var_size = cov_models.var_size
+        self.var_idx = cov_models.var_idx
+        self.num_groups = cov_models.num_groups
+        self.re_models = [i for i, cov_model in enumerate(models) if cov_model.use_re]
+        self.fe_models = [i for i, cov_model in enumerate(models) if not cov_model.use_re]
+
+        weight = 1.0/obs_se**2
+        cov_re = np.column_stack([models[i].cov for i in self.re_models] + [np.empty((obs_se.size, 0))])
+        cov_fe = np.column_stack([models[i].cov for i in self.fe_models] + [np.empty((obs_se.size, 0))])
+        group_starts = models[0].group_starts
+
+        self.re_blocks = np.add.reduceat(weight[:, None, None]*cov_re[:, :, None]*cov_re[:, None, :],
+                                         group_starts, axis=0)
+        self.border = np.add.reduceat(weight[:, None, None]*cov_re[:, :, None]*cov_fe[:, None, :],
+                                      group_starts, axis=0)
+        self.fe_block = (cov_fe.T*weight).dot(cov_fe)
+
+        # Priors are on the effects scaled by the covariate scale.
+        self.centered = []
+        self.centering_weights = []
+        for j, i in enumerate(self.re_models):
+            cov_model = models[i]
+            if np.isfinite(cov_model.re_var):
+                self.re_blocks[:, j, j] += 1.0/(cov_model.re_var*cov_model.cov_scale**2)
+                self.centered.append(j)
+                self.centering_weights.append(1.0/(cov_model.re_var*cov_model.cov_scale**2*self.num_groups))
+            if np.isfinite(cov_model.gprior[1]):
+                self.re_blocks[:, j, j] += 1.0/(cov_model.gprior[1]*cov_model.cov_scale)**2
+        for j, i in enumerate(self.fe_models):
+            cov_model = models[i]
+            if np.isfinite(cov_model.gprior[1]):
+                self.fe_block[j, j] += 1.0/(cov_model.gprior[1]*cov_model.cov_scale)**2
+        self.centering_weights = np.array(self.centering_weights)
+
+    def solve(self, rhs: np.ndarray, fixed: np.ndarray) -> np.ndarray:
+        """Solve the normal equations, holding some variables at zero.
+
+        Args:
+            rhs (np.ndarray): right hand side, in optimization variable order.
+            fixed (np.ndarray):
+                Boolean mask of the variables to hold at zero.  Their rows
+                and columns are dropped from the system.
+
+        Returns:
+            np.ndarray: solution, in optimization variable order.
+        """
+        num_re, num_fe = len(self.re_models), len(self.fe_models)
+        rhs_re = np.column_stack([rhs[self.var_idx[i]] for i in self.re_models] + [np.empty((self.num_groups, 0))])
+        rhs_fe = np.array([rhs[self.var_idx[i]][0] for i in self.fe_models])
+        free_re = ~np.column_stack([fixed[self.var_idx[i]] for i in self.re_models]
+                                   + [np.empty((self.num_groups, 0), dtype=bool)])
+        free_fe = ~np.array([fixed[self.var_idx[i]][0] for i in self.fe_models], dtype=bool)
+
+        # Dropping a variable is the same as zeroing its row and column and
+        # putting a one on the diagonal, which keeps the block structure.
+        re_idx = np.arange(num_re)
+        blocks = self.re_blocks*free_re[:, :, None]*free_re[:, None, :]
+        blocks[:, re_idx, re_idx] += ~free_re
+        border = self.border*free_re[:, :, None]*free_fe[None, None, :]
+        fe_block = self.fe_block*np.outer(free_fe, free_fe) + np.diag(~free_fe)
+        rhs_re = rhs_re*free_re
+        rhs_fe = rhs_fe*free_fe
+        centering = np.zeros((self.num_groups, num_re, len(self.centered)))
+        centering[:, self.centered, np.arange(len(self.centered))] = free_re[:, self.centered]
+
+        # Solve the group blocks against everything that needs them at once,
+        # then correct for the priors with the Woodbury identity.
+        solved = np.linalg.solve(blocks, np.concatenate([rhs_re[:, :, None], border, centering], axis=2))
+        solved_rhs, solved_border, solved_centering = np.split(solved, [1, 1 + num_fe], axis=2)
+        if len(self.centered):
+            capacitance = (np.diag(1.0/self.centering_weights)
+                           - np.einsum('gkc,gkd->cd', centering, solved_centering))
+
+            def _apply_prior_correction(solved_v):
+                correction = np.linalg.solve(capacitance, np.einsum('gkc,gkp->cp', centering, solved_v))
+                return solved_v + np.einsum('gkc,cp->gkp', solved_centering, correction)
+
+            solved_rhs = _apply_prior_correction(solved_rhs)
+            solved_border = _apply_prior_correction(solved_border)
+
+        # Eliminate the random effects to solve for the fixed effects.
+        schur = fe_block - np.einsum('gkm,gkn->mn', border, solved_border)
+        soln_fe = np.linalg.solve(schur, rhs_fe - np.einsum('gkm,gk->m', border, solved_rhs[:, :, 0]))
+        soln_re = solved_rhs[:, :, 0] - np.einsum('gkm,m->gk', solved_border, soln_fe)
+
+        soln = np.empty(self.var_size)
+        for j, i in enumerate(self.re_models):
+            soln[self.var_idx[i]] = soln_re[:, j]
+        for j, i in enumerate(self.fe_models):
+            soln[self.var_idx[i]] = soln_fe[j]
+        return soln
+
+
 def sizes_to_indices(sizes):
     """Converting sizes to corresponding indices.
     Args:
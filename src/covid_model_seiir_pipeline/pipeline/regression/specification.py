@@ -48,6 +48,7 @@ class RegressionData:
     location_set_version_id: int = field(default=0)
     location_set_file: str = field(default='')
     output_root: str = field(default='')
+    data_format: str = field(default='csv')
 
     def to_dict(self) -> Dict:
         """Converts to a dict, coercing list-like items to lists."""
@@ -57,6 +58,15 @@ class RegressionData:
 @dataclass
 class RegressionParameters:
     """Specifies the parameters of the beta fit and regression."""
+    ALLOWED_SOLVERS = (
+        'RK45',
+        'exponential',
+    )
+    ALLOWED_REGRESSION_SOLVERS = (
+        'L-BFGS-B',
+        'direct',
+    )
+
     n_draws: int = field(default=1000)
 
     day_shift: Tuple[int, int] = field(default=(0, 8))
@@ -65,8 +75,18 @@ class RegressionParameters:
     sigma: Tuple[float, float] = field(default=(0.2, 1/3))
     gamma1: Tuple[float, float] = field(default=(0.5, 0.5))
     gamma2: Tuple[float, float] = field(default=(1/3, 1.0))
+    solver: str = field(default='RK45')
     solver_dt: float = field(default=0.1)
     sequential_refit: bool = field(default=False)
+    regression_solver: str = field(default='L-BFGS-B')
+
+    def __post_init__(self):
+        if self.solver not in self.ALLOWED_SOLVERS:
+            raise ValueError(f'Unknown ode fit solver {self.solver}. '
+                             f'Allowed solvers are {self.ALLOWED_SOLVERS}.')
+        if self.regression_solver not in self.ALLOWED_REGRESSION_SOLVERS:
+            raise ValueError(f'Unknown regression solver {self.regression_solver}. '
+                             f'Allowed solvers are {self.ALLOWED_REGRESSION_SOLVERS}.')
 
     def to_dict(self) -> Dict:
         """Converts to a dict, coercing list-like items to lists."""
@@ -10,7 +10,10 @@ from covid_model_seiir_pipeline.lib import (
     static_vars,
 )
 from covid_model_seiir_pipeline.pipeline.regression.data import RegressionDataInterface
-from covid_model_seiir_pipeline.pipeline.regression.specification import RegressionSpecification
+from covid_model_seiir_pipeline.pipeline.regression.specification import (
+    RegressionSpecification,
+    REGRESSION_JOBS,
+)
 from covid_model_seiir_pipeline.pipeline.regression import model
 
 
@@ -47,6 +50,8 @@ def run_beta_regression(regression_version: str, draw_id: int) -> None:
         population=population,
         location_ids=location_ids,
         ode_parameters=ode_params,
+        solver=regression_params['solver'],
+        num_cores=regression_specification.workflow.task_specifications[REGRESSION_JOBS.regression].num_cores,
     )
     beta_start_end_dates = (beta_fit
                             .groupby('location_id')
@@ -55,7 +60,11 @@ def run_beta_regression(regression_version: str, draw_id: int) -> None:
 
     logger.info('Prepping regression.', context='transform')
     mr_data = model.align_beta_with_covariates(covariates, beta_fit, list(regression_specification.covariates))
-    regressor = model.build_regressor(regression_specification.covariates.values(), prior_coefficients)
+    regressor = model.build_regressor(
+        regression_specification.covariates.values(),
+        prior_coefficients,
+        regression_params['regression_solver'],
+    )
     logger.info('Fitting beta regression', context='compute_regression')
     coefficients = regressor.fit(mr_data, regression_specification.regression_parameters.sequential_refit)
     log_beta_hat = math.compute_beta_hat(covariates, coefficients)
@@ -1,4 +1,5 @@
 from pathlib import Path
+import pickle
 import warnings
 
 import numpy
@@ -8,6 +9,7 @@ import pytest
 from covid_model_seiir_pipeline.lib import io
 from covid_model_seiir_pipeline.pipeline.forecasting.data import ForecastDataInterface
 from covid_model_seiir_pipeline.pipeline.regression.data import RegressionDataInterface
+from covid_model_seiir_pipeline.pipeline.regression.specification import RegressionSpecification
 
 
 class TestForecastDataInterfaceIO:
@@ -110,6 +112,23 @@ class TestForecastDataInterfaceIO:
         pandas.testing.assert_frame_equal(beta_scales, loaded_beta_scales)
         pandas.testing.assert_frame_equal(forecast_outputs, loaded_forecast_outputs)
 
+    def test_regression_interface_cached(self, tmpdir):
+        regression_spec = RegressionSpecification.from_dict({'data': {'output_root': str(tmpdir)}})
+        io.dump(regression_spec.to_dict(), io.RegressionRoot(tmpdir).specification())
+        fdi = ForecastDataInterface(
+            regression_root=io.RegressionRoot(tmpdir),
+            covariate_root=None,
+            forecast_root=None,
+            fh_subnationals=False,
+        )
+        rdi = fdi._get_regression_data_interface()
+        assert fdi._get_regression_data_interface() is rdi
+
+        # The resolved upstream interface travels with the pickle.
+        unpickled = pickle.loads(pickle.dumps(fdi))
+        assert unpickled._regression_data_interface is not None
+        assert unpickled._get_regression_data_interface().regression_root._root == rdi.regression_root._root
+
 
 def assert_equal_after_date_conversion(expected, actual, date_cols):
     with pytest.raises(AssertionError):
@@ -120,3 +139,43 @@ def assert_equal_after_date_conversion(expected, actual, date_cols):
         expected[col] = pandas.to_datetime(expected[col])
 
     pandas.testing.assert_frame_equal(expected, actual)
+
+
+def test_load_variant_scalars():
+    fdi = ForecastDataInterface(
+        regression_root=None,
+        covariate_root=None,
+        forecast_root=None,
+        fh_subnationals=False,
+    )
+    location_ids = [6, 33]
+    dates = pandas.date_range('2020-12-01', '2021-03-01')
+    index = pandas.MultiIndex.from_product([location_ids, dates], names=['location_id', 'date'])
+    prevalence = {
+        'B117': numpy.tile(numpy.linspace(0, 0.5, len(dates)), 2),
+        'B1351': numpy.tile(numpy.linspace(0, 0.2, len(dates)), 2),
+        'P1': numpy.zeros(len(index)),
+    }
+    fdi.load_location_ids = lambda: location_ids
+    fdi.load_covariate = lambda covariate, version, loc_ids: pandas.DataFrame(
+        {covariate: prevalence[covariate.split('_')[-1]]}, index=index,
+    )
+    transition_dates = pandas.Series(pandas.to_datetime(['2021-01-10', '2021-01-01']),
+                                     index=pandas.Index(location_ids, name='location_id'), name='date')
+    max_date = pandas.Timestamp('2021-02-15')
+
+    variant_scalars = fdi.load_variant_scalars({'version': 'reference', 'beta_scalar': 1.5, 'ifr_scalar': 1.3},
+                                               transition_dates, max_date)
+
+    total_prevalence = pandas.Series(prevalence['B117'] + prevalence['B1351'], index=index)
+    for location_id, transition_date in transition_dates.items():
+        loc_beta = variant_scalars.beta.loc[location_id]
+        assert loc_beta.index.equals(pandas.date_range(transition_date, max_date, name='date'))
+        increase = (total_prevalence.loc[location_id].loc[transition_date:max_date]
+                    - total_prevalence.loc[(location_id, transition_date)])
+        numpy.testing.assert_allclose(loc_beta, 1 + 0.5 * increase)
+        numpy.testing.assert_allclose(variant_scalars.ifr.loc[location_id], 1 + 0.3 * increase)
+
+    no_variant_scalars = fdi.load_variant_scalars({}, transition_dates, max_date)
+    assert no_variant_scalars.beta.index.equals(variant_scalars.beta.index)
+    assert (no_variant_scalars.beta == 1).all() and (no_variant_scalars.ifr == 1).all()
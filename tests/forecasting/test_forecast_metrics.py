@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from covid_model_seiir_pipeline.pipeline.forecasting.model import (
+    CompartmentInfo,
+    ForecastCube,
+    compute_output_metrics,
+)
+from covid_model_seiir_pipeline.pipeline.forecasting.model import forecast_metrics
+
+
+def _components(location_ids, starts, end, fields, rs):
+    data = []
+    for location_id, start in zip(location_ids, starts):
+        dates = pd.date_range(start, end)
+        loc_data = pd.DataFrame(rs.uniform(1, 1000, size=(len(dates), len(fields))), columns=fields)
+        loc_data.insert(0, 'date', dates)
+        loc_data.insert(0, 'location_id', location_id)
+        data.append(loc_data)
+    return ForecastCube.from_frame(pd.concat(data), location_ids=location_ids)
+
+
+@pytest.mark.parametrize('system', ['normal', 'vaccine'])
+@pytest.mark.parametrize('groups', [[], ['lr', 'hr']])
+def test_vectorized_output_metrics_match_frames(system, groups):
+    if system == 'normal':
+        group_compartments = ['S', 'E', 'I1', 'I2', 'R']
+    else:
+        group_compartments = [f'{c}{v}' for v in ['', '_u', '_p'] for c in ['S', 'E', 'I1', 'I2', 'R']] + ['M']
+    compartments = [f'{c}_{g}' for g in groups for c in group_compartments] if groups else group_compartments
+    compartment_info = CompartmentInfo(compartments=compartments, group_suffixes=groups)
+    beta_params = {'alpha': 0.9, 'sigma': 1.0, 'gamma1': 0.3, 'gamma2': 0.4}
+
+    rs = np.random.RandomState(12345)
+    location_ids = [6, 33, 102]
+    transition_dates = ['2020-04-10', '2020-04-05', '2020-04-12']
+    past = _components(location_ids, ['2020-03-01', '2020-03-10', '2020-03-05'], '2020-04-12',
+                       ['beta'] + compartments, rs)
+    past = past.truncate(pd.Series(pd.to_datetime(transition_dates), index=location_ids))
+    forecast = _components(location_ids, transition_dates, '2020-06-01', compartments + ['beta', 'theta'], rs)
+
+    infection_data = past.to_frame([]).reset_index()
+    infection_data['infections'] = rs.uniform(0, 100, size=len(infection_data))
+    infection_data['deaths'] = rs.uniform(0, 5, size=len(infection_data))
+    # Some missing deaths and a location with observations past the transition.
+    infection_data.loc[::7, 'deaths'] = np.nan
+    extra = pd.DataFrame({'location_id': 33, 'date': pd.date_range('2020-04-05', '2020-04-08'),
+                          'infections': 1., 'deaths': 1.})
+    infection_data = pd.concat([infection_data, extra], ignore_index=True)
+
+    ifr = forecast.to_frame([]).reset_index()
+    ifr['duration'] = 12
+    for column in ['ifr', 'ifr_lr', 'ifr_hr']:
+        ifr[column] = rs.uniform(0.001, 0.01, size=len(ifr))
+    ifr = pd.concat([past.to_frame([]).reset_index(), ifr]).fillna({'duration': 12}).fillna(0.005)
+    ifr = ifr.set_index(['location_id', 'date'])
+
+    expected = compute_output_metrics(infection_data, ifr, past, forecast, beta_params, compartment_info,
+                                      vectorized=False)
+    result = compute_output_metrics(infection_data, ifr, past, forecast, beta_params, compartment_info,
+                                    vectorized=True)
+
+    pd.testing.assert_frame_equal(expected.infections, result.infections, check_exact=False, rtol=1e-12)
+    pd.testing.assert_frame_equal(expected.deaths, result.deaths, check_exact=False, rtol=1e-12)
+    for measure in ['r_controlled', 'r_effective', 'herd_immunity']:
+        pd.testing.assert_series_equal(getattr(expected, measure), getattr(result, measure),
+                                       check_exact=False, rtol=1e-12)
+
+
+def test_correct_census_matches_aligned_ffill():
+    rs = np.random.RandomState(0)
+
+    def _series(spans):
+        index = pd.MultiIndex.from_tuples(
+            [(location_id, date) for location_id, start, end in spans for date in pd.date_range(start, end)],
+            names=['location_id', 'date'],
+        )
+        data = pd.Series(rs.uniform(0, 10, size=len(index)), index=index)
+        data.iloc[::5] = np.nan
+        return data
+
+    census = _series([(6, '2020-03-01', '2020-05-01'), (33, '2020-03-10', '2020-04-20'),
+                      (102, '2020-04-01', '2020-04-10')])
+    correction_factor = _series([(6, '2020-04-01', '2020-06-01'), (33, '2020-03-01', '2020-03-20'),
+                                 (60, '2020-03-01', '2020-03-05')])
+
+    expected = (census * correction_factor).groupby('location_id').ffill()
+    pd.testing.assert_series_equal(forecast_metrics._correct_census(census, correction_factor), expected)
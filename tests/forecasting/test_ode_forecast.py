@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from covid_model_seiir_pipeline.pipeline.forecasting.model.ode_forecast import (
+    _beta_shift,
+    forecast_correction_factors,
+)
+from covid_model_seiir_pipeline.pipeline.regression.model import HospitalCorrectionFactors
+from covid_model_seiir_pipeline.pipeline.regression.specification import HospitalParameters
+
+
+def test_beta_shift():
+    beta_hat = pd.DataFrame({
+        'location_id': [33] * 4 + [6] * 6,
+        'date': list(pd.date_range('2020-05-03', periods=4)) + list(pd.date_range('2020-05-01', periods=6)),
+        'beta_pred': 2.,
+    })
+    beta_scales = pd.DataFrame({'location_id': [6, 33], 'scale_init': [1., 0.5],
+                                'scale_final': [2., 1.5], 'window_size': [4, 2]})
+
+    beta_final = _beta_shift(beta_hat.sample(frac=1, random_state=0), beta_scales)
+
+    assert beta_final.columns.tolist() == ['location_id', 'date', 'beta_pred']
+    assert beta_final.location_id.tolist() == [6] * 6 + [33] * 4
+    assert beta_final.groupby('location_id').date.is_monotonic_increasing.all()
+    np.testing.assert_allclose(beta_final.beta_pred, [2., 2.5, 3., 3.5, 4., 4., 1., 2., 3., 3.])
+
+
+def _reference_correction_factor(cf, today, max_date, averaging_window, application_window):
+    loc_cfs = []
+    for loc_id in today.index:
+        loc_cf = cf.loc[loc_id]
+        loc_today = today.loc[loc_id]
+        mean_cf = loc_cf.loc[loc_today - averaging_window: loc_today].mean()
+        loc_cf = loc_cf.loc[:loc_today]
+        loc_cf.loc[loc_today + application_window] = mean_cf
+        loc_cf.loc[max_date] = mean_cf
+        loc_cf = loc_cf.asfreq('D').interpolate().reset_index()
+        loc_cf['location_id'] = loc_id
+        loc_cfs.append(loc_cf.set_index(['location_id', 'date'])[cf.name])
+    return pd.concat(loc_cfs).sort_index()
+
+
+def test_forecast_correction_factors():
+    rs = np.random.RandomState(7)
+    hospital_parameters = HospitalParameters(correction_factor_average_window=10,
+                                             correction_factor_application_window=14)
+    today = pd.Series(pd.to_datetime(['2020-06-01', '2020-05-20', '2020-06-05']),
+                      index=pd.Index([102, 6, 33], name='location_id'))
+    max_date = pd.Timestamp('2020-08-01')
+
+    index = pd.MultiIndex.from_tuples(
+        [(6, date) for date in pd.date_range('2020-03-01', '2020-07-01')]
+        # Gaps and a missing value in the data.
+        + [(33, date) for date in pd.date_range('2020-04-01', '2020-05-30', freq='3D')]
+        + [(102, date) for date in pd.date_range('2020-03-15', '2020-06-10')]
+        + [(200, date) for date in pd.date_range('2020-03-15', '2020-06-10')],
+        names=['location_id', 'date'],
+    )
+    correction_factors = HospitalCorrectionFactors(**{
+        name: pd.Series(rs.uniform(0.5, 1.5, len(index)), index=index, name=name)
+        for name in ['hospital_census', 'icu_census', 'ventilator_census']
+    })
+    correction_factors.icu_census.iloc[70] = np.nan
+
+    result = forecast_correction_factors(correction_factors, today, max_date, hospital_parameters)
+
+    for name, cf in correction_factors.to_dict().items():
+        expected = _reference_correction_factor(
+            cf, today, max_date,
+            pd.Timedelta(days=hospital_parameters.correction_factor_average_window),
+            pd.Timedelta(days=hospital_parameters.correction_factor_application_window),
+        )
+        pd.testing.assert_series_equal(getattr(result, name), expected, check_exact=False, rtol=1e-12)
+
+
+def test_forecast_correction_factors_missing_location():
+    index = pd.MultiIndex.from_product([[6], pd.date_range('2020-03-01', '2020-06-01')],
+                                       names=['location_id', 'date'])
+    correction_factors = HospitalCorrectionFactors(**{
+        name: pd.Series(1., index=index, name=name)
+        for name in ['hospital_census', 'icu_census', 'ventilator_census']
+    })
+    today = pd.Series(pd.to_datetime(['2020-06-01', '2020-06-01']), index=pd.Index([6, 33], name='location_id'))
+
+    with pytest.raises(KeyError):
+        forecast_correction_factors(correction_factors, today, pd.Timestamp('2020-09-01'), HospitalParameters())
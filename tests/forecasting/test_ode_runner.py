@@ -1,11 +1,21 @@
+from numba.core.runtime import rtsys, _nrt_python
 import numpy as np
+import pandas as pd
+import pytest
 
+from covid_model_seiir_pipeline.lib import math
 from covid_model_seiir_pipeline.pipeline.forecasting.specification import ScenarioSpecification
 from covid_model_seiir_pipeline.pipeline.forecasting.model.ode_forecast import (
     _ODERunner,
+    _seiir_system,
+    _seiir_system_inplace,
+    _vaccine_system_inplace,
     _SeiirModelSpecs,
-    CompartmentInfo
+    CompartmentInfo,
+    run_normal_ode_model,
+    run_normal_ode_model_by_location,
 )
+from covid_model_seiir_pipeline.pipeline.forecasting.task.beta_forecast import _rerun_ode_from
 
 
 def test_ode_runner():
@@ -34,3 +44,217 @@ def test_ode_runner():
     ode_runner = _ODERunner(specs, scenario_spec, compartment_info, parameters=['beta', 'theta'])
     result = ode_runner.get_solution(init_cond, t, params)
     print("Okay!")
+
+
+@pytest.mark.parametrize('system', ['normal', 'vaccine'])
+def test_batched_ode_matches_by_location(system):
+    groups = ['lr', 'hr']
+    if system == 'normal':
+        group_compartments = ['S', 'E', 'I1', 'I2', 'R']
+    else:
+        group_compartments = [f'{c}{v}' for v in ['', '_u', '_p'] for c in ['S', 'E', 'I1', 'I2', 'R']] + ['M']
+    compartments = [f'{c}_{g}' for g in groups for c in group_compartments]
+    compartment_info = CompartmentInfo(compartments=compartments, group_suffixes=groups)
+    scenario_spec = ScenarioSpecification(system=system)
+    beta_params = {'alpha': 0.9, 'sigma': 1.0, 'gamma1': 0.3, 'gamma2': 0.4}
+
+    rs = np.random.RandomState(12345)
+    location_ids = [102, 6, 33]
+    initial_condition = pd.DataFrame(rs.uniform(1, 100, size=(3, len(compartments))),
+                                     index=pd.Index(location_ids, name='location_id'),
+                                     columns=compartments)
+    parameters = []
+    # Locations start on different days and so have different length forecasts.
+    for location_id, start in zip(location_ids, ['2021-01-05', '2021-01-01', '2021-01-10']):
+        dates = pd.date_range(start, '2021-02-15')
+        loc_params = pd.DataFrame({
+            'date': dates,
+            'beta': rs.uniform(0.5, 2, size=len(dates)),
+            'theta': rs.uniform(-0.01, 0.01, size=len(dates)),
+        }, index=pd.Index([location_id] * len(dates), name='location_id'))
+        if system == 'vaccine':
+            for group in groups:
+                for vaccine_type in ['unprotected', 'protected', 'immune']:
+                    loc_params[f'{vaccine_type}_{group}'] = rs.uniform(0, 0.1, size=len(dates))
+        parameters.append(loc_params.iloc[::-1])
+    parameters = pd.concat(parameters)
+
+    expected = run_normal_ode_model_by_location(initial_condition, beta_params, parameters,
+                                                scenario_spec, compartment_info)
+    result = run_normal_ode_model(initial_condition, beta_params, parameters,
+                                  scenario_spec, compartment_info)
+    pd.testing.assert_frame_equal(expected.to_frame(), result.to_frame(), check_exact=False, rtol=1e-10)
+
+
+@pytest.mark.parametrize('system', ['normal', 'vaccine'])
+def test_adaptive_solver_matches_fixed_step(system):
+    groups = ['lr', 'hr']
+    if system == 'normal':
+        group_compartments = ['S', 'E', 'I1', 'I2', 'R']
+    else:
+        group_compartments = [f'{c}{v}' for v in ['', '_u', '_p'] for c in ['S', 'E', 'I1', 'I2', 'R']] + ['M']
+    compartments = [f'{c}_{g}' for g in groups for c in group_compartments]
+    compartment_info = CompartmentInfo(compartments=compartments, group_suffixes=groups)
+    beta_params = {'alpha': 0.9, 'sigma': 1.0, 'gamma1': 0.3, 'gamma2': 0.4}
+
+    rs = np.random.RandomState(12345)
+    initial_condition = pd.DataFrame(rs.uniform(1, 100, size=(1, len(compartments))),
+                                     index=pd.Index([102], name='location_id'),
+                                     columns=compartments)
+    dates = pd.date_range('2021-01-01', '2021-04-01')
+    parameters = pd.DataFrame({
+        'date': dates,
+        'beta': 1.5 + 0.5 * np.sin(np.arange(len(dates)) / 7),
+        'theta': 0.,
+    }, index=pd.Index([102] * len(dates), name='location_id'))
+    if system == 'vaccine':
+        for group in groups:
+            for vaccine_type in ['unprotected', 'protected', 'immune']:
+                parameters[f'{vaccine_type}_{group}'] = 0.05
+    fixed = ScenarioSpecification(system=system, solver='RK45')
+    adaptive = ScenarioSpecification(system=system, solver='DOPRI5', solver_params={'rtol': 1e-8, 'atol': 1e-8})
+
+    expected = run_normal_ode_model(initial_condition, beta_params, parameters, fixed, compartment_info)
+    result = run_normal_ode_model(initial_condition, beta_params, parameters, adaptive, compartment_info)
+    pd.testing.assert_frame_equal(expected.to_frame(), result.to_frame(), check_exact=False, rtol=1e-5, atol=1e-6)
+
+
+def test_adaptive_solver_stops_on_nan():
+    t = np.arange(0, 31.)
+    init_cond = np.array([96, 0, 2, 2, 0], dtype=float)
+    params = np.vstack([
+        np.full((4, t.size), 0.5),
+        2 * np.exp(-0.01 * t),
+        np.zeros((2, t.size)),
+    ])
+    expected = math.solve_ode_adaptive(_seiir_system_inplace, t, init_cond, params)
+
+    bad_init_cond = init_cond.copy()
+    bad_init_cond[1] = np.nan
+    result = math.solve_ode_adaptive(_seiir_system_inplace, t, bad_init_cond, params)
+    assert np.isnan(result[:, 1:]).all()
+
+    bad_params = params.copy()
+    bad_params[4, 10:] = np.nan
+    result = math.solve_ode_adaptive(_seiir_system_inplace, t, init_cond, bad_params)
+    # The step ending past t = 9 already sees the NaN parameters.
+    np.testing.assert_allclose(result[:, :9], expected[:, :9])
+    assert np.isnan(result[:, 10:]).all()
+
+    # Other locations in a batch are unaffected.
+    result = math.solve_ode_adaptive_batch(_seiir_system_inplace, t,
+                                           np.vstack([bad_init_cond, init_cond]),
+                                           np.stack([params, params]))
+    assert np.isnan(result[0, :, 1:]).all()
+    np.testing.assert_allclose(result[1], expected)
+
+
+@pytest.mark.parametrize('solver,solver_params,rtol', [
+    ('RK45', {}, 1e-10),
+    # Restarting changes the adaptive steps, so results only agree to within the tolerances.
+    ('DOPRI5', {'rtol': 1e-10, 'atol': 1e-10}, 1e-7),
+])
+def test_rerun_ode_from_restart_matches_full_solve(solver, solver_params, rtol):
+    compartments = [f'{c}_{g}' for g in ['lr', 'hr'] for c in ['S', 'E', 'I1', 'I2', 'R']]
+    compartment_info = CompartmentInfo(compartments=compartments, group_suffixes=['lr', 'hr'])
+    scenario_spec = ScenarioSpecification(solver=solver, solver_params=solver_params)
+    beta_params = {'alpha': 0.9, 'sigma': 1.0, 'gamma1': 0.3, 'gamma2': 0.4}
+
+    rs = np.random.RandomState(42)
+    location_ids = [102, 6, 33]
+    initial_condition = pd.DataFrame(rs.uniform(1, 100, size=(3, len(compartments))),
+                                     index=pd.Index(location_ids, name='location_id'),
+                                     columns=compartments)
+    initial_condition[['S_lr', 'S_hr']] = 1e5
+    parameters = []
+    for location_id, start in zip(location_ids, ['2021-01-05', '2021-01-01', '2021-01-10']):
+        dates = pd.date_range(start, '2021-03-15')
+        parameters.append(pd.DataFrame({
+            'date': dates,
+            'beta': rs.uniform(1, 2, size=len(dates)),
+            'theta': 0.,
+        }, index=pd.Index([location_id] * len(dates), name='location_id')))
+    parameters = pd.concat(parameters)
+
+    # Mandates cut beta from a different date in two of the locations,
+    # one of them on its first day.
+    reimposition_date = pd.Series(pd.to_datetime(['2021-02-01', '2021-01-01']),
+                                  index=pd.Index([102, 6], name='location_id'))
+    reimposed = parameters.copy()
+    after_reimposition = (reimposed.index.isin(reimposition_date.index)
+                          & (reimposed['date'] >= reimposition_date.reindex(reimposed.index)).to_numpy())
+    reimposed.loc[after_reimposition, 'beta'] *= 0.5
+    expected = run_normal_ode_model(initial_condition, beta_params, reimposed, scenario_spec, compartment_info)
+
+    result = run_normal_ode_model(initial_condition, beta_params, parameters, scenario_spec, compartment_info)
+    start_date = parameters.groupby('location_id')['date'].min()
+    restart_date = pd.concat([reimposition_date - pd.Timedelta(days=1), start_date.loc[reimposition_date.index]],
+                             axis=1).max(axis=1)
+    _rerun_ode_from(result, restart_date, beta_params, reimposed.loc[reimposition_date.index],
+                    scenario_spec, compartment_info)
+
+    pd.testing.assert_frame_equal(expected.to_frame(), result.to_frame(), check_exact=False, rtol=rtol)
+
+
+def test_unknown_solver_params():
+    with pytest.raises(ValueError):
+        ScenarioSpecification(solver='DOPRI5', solver_params={'dt': 0.1})
+
+
+@pytest.mark.parametrize('solver', [math.solve_ode, math.solve_ode_adaptive])
+@pytest.mark.parametrize('system,n_compartments,n_params', [
+    (_seiir_system_inplace, 10, 7),
+    (_vaccine_system_inplace, 32, 14),
+])
+def test_ode_solvers_do_not_allocate_per_step(solver, system, n_compartments, n_params):
+    def count_allocations(days):
+        t = np.arange(0, days + 1.)
+        init_cond = np.full(n_compartments, 100.)
+        init_cond[0] = 1e6
+        params = np.full((n_params, t.size), 0.1)
+        params[4] = 1.2  # beta
+        solver(system, t, init_cond, params, **kwargs)  # Compile
+        before = rtsys.get_allocation_stats().alloc
+        solver(system, t, init_cond, params, **kwargs)
+        return rtsys.get_allocation_stats().alloc - before
+
+    kwargs = {'dt': 0.1} if solver is math.solve_ode else {}
+    _nrt_python.memsys_enable_stats()
+    try:
+        # Setup allocations are the same for any length of run.
+        assert count_allocations(100) == count_allocations(200)
+    finally:
+        _nrt_python.memsys_disable_stats()
+
+
+def test_inplace_system_adapter():
+    t = np.arange(0, 31.)
+    init_cond = np.array([96, 0, 2, 2, 0], dtype=float)
+    params = np.vstack([
+        np.full((4, t.size), 0.5),
+        2 * np.exp(-0.01 * t),
+        np.zeros((2, t.size)),
+    ])
+    expected = math.solve_ode(_seiir_system_inplace, t, init_cond, params, 0.1)
+    result = math.solve_ode(math.inplace_system(_seiir_system), t, init_cond, params, 0.1)
+    np.testing.assert_allclose(expected, result)
+
+
+def test_solvers_use_precompiled_kernels():
+    math.compile_system(_seiir_system_inplace)
+    compiled = {name: list(getattr(math, name).signatures) for name in math._KERNEL_SIGNATURES}
+
+    # Integer inputs should be coerced rather than compiling new kernels.
+    t = np.arange(0, 31)
+    init_cond = np.array([96, 0, 2, 2, 0])
+    params = np.ones((7, t.size))
+    math.solve_ode(_seiir_system_inplace, t, init_cond, params, 1)
+    math.solve_ode_adaptive(_seiir_system_inplace, t, init_cond, params, rtol=1, atol=1)
+    math.solve_ode_batch(_seiir_system_inplace, t, init_cond[None], params[None], 1)
+    math.solve_ode_adaptive_batch(_seiir_system_inplace, t, init_cond[None], params[None])
+
+    math.solve_ode(_vaccine_system_inplace, t, np.ones(32), np.ones((14, t.size)), 1)
+    math.solve_ode(math.inplace_system(_seiir_system), t, init_cond, params, 1)
+
+    # Kernels are shared by all systems.
+    assert compiled == {name: list(getattr(math, name).signatures) for name in math._KERNEL_SIGNATURES}
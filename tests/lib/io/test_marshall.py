@@ -1,11 +1,16 @@
+import numpy
 import pandas
 import pytest
 
-from covid_model_seiir_pipeline.lib.io import RegressionRoot
+from covid_model_seiir_pipeline.lib import io
+from covid_model_seiir_pipeline.lib.io import PostprocessingRoot, RegressionRoot
+from covid_model_seiir_pipeline.lib.io.manifest import get_manifest
 from covid_model_seiir_pipeline.lib.io.marshall import (
     CSVMarshall,
+    DrawMatrixMarshall,
     ZipMarshall,
     HDF5Marshall,
+    ParquetMarshall,
 )
 
 
@@ -34,6 +39,19 @@ class MarshallInterfaceTests:
         self.assert_load_dump_workflow_correct(instance, regression_root,
                                                location_data, key=regression_root.infection_data(draw_id=4))
 
+    def test_load_selection(self, instance, regression_root, regression_beta):
+        key = regression_root.beta(draw_id=4)
+        instance.touch(*regression_root.terminal_paths())
+        instance.dump(regression_beta, key=key)
+
+        loaded = instance.load(key, columns=['date', 'beta'], date_range=('2020-03-08', '2020-03-09'))
+        expected = regression_beta.loc[1:2, ['date', 'beta']]
+        pandas.testing.assert_frame_equal(expected.reset_index(drop=True), loaded.reset_index(drop=True))
+
+        loaded = instance.load(key, columns=['beta'], location_ids=[1])
+        assert loaded.empty
+        assert list(loaded.columns) == ['beta']
+
     def test_no_overwriting(self, instance, regression_root, parameters):
         self.assert_load_dump_workflow_correct(instance, regression_root,
                                                parameters, key=regression_root.parameters(draw_id=4))
@@ -90,6 +108,39 @@ class TestHdf5Marshall(MarshallInterfaceTests):
         return HDF5Marshall
 
 
+class TestParquetMarshall(MarshallInterfaceTests):
+    @pytest.fixture
+    def regression_root(self, tmpdir):
+        return RegressionRoot(tmpdir, data_format='parquet')
+
+    @pytest.fixture
+    def instance(self):
+        return ParquetMarshall
+
+
+class TestParquetMarshall_noniface:
+    @pytest.fixture
+    def regression_root(self, tmpdir):
+        return RegressionRoot(tmpdir, data_format='parquet')
+
+    @pytest.fixture
+    def instance(self):
+        return ParquetMarshall
+
+    def test_datetime(self, instance, regression_root, regression_beta):
+        """
+        Dates survive the round trip as datetimes without re-parsing.
+        """
+        regression_beta['date'] = pandas.to_datetime(regression_beta['date'])
+        key = regression_root.beta(draw_id=4)
+
+        instance.touch(*regression_root.terminal_paths())
+        instance.dump(regression_beta, key=key)
+        loaded = instance.load(key)
+
+        pandas.testing.assert_frame_equal(regression_beta, loaded)
+
+
 class TestHdf5Marshall_noniface:
     @pytest.fixture
     def regression_root(self, tmpdir):
@@ -111,3 +162,146 @@ class TestHdf5Marshall_noniface:
 
         pandas.testing.assert_frame_equal(regression_beta, loaded)
 
+
+class TestDrawMatrixMarshall:
+    @pytest.fixture
+    def postprocessing_root(self, tmpdir):
+        return PostprocessingRoot(tmpdir, data_format='hdf')
+
+    @pytest.fixture
+    def instance(self):
+        return DrawMatrixMarshall
+
+    @pytest.fixture
+    def draws(self, regression_beta):
+        index = pandas.MultiIndex.from_frame(regression_beta[['location_id', 'date']].astype({'location_id': int}))
+        return pandas.DataFrame({draw_id: regression_beta['beta'].to_numpy() * (draw_id + 1) for draw_id in range(3)},
+                                index=index)
+
+    def test_key_format(self, postprocessing_root):
+        key = postprocessing_root.raw_output_draws(scenario='worse', measure='deaths')
+        assert key.disk_format == 'draw_matrix'
+
+    def test_load_dump_workflow(self, instance, postprocessing_root, draws):
+        key = postprocessing_root.raw_output_draws(scenario='worse', measure='deaths')
+        instance.dump(draws, key)
+        pandas.testing.assert_frame_equal(draws, instance.load(key), check_column_type=False)
+
+        with pytest.raises(LookupError):
+            instance.dump(draws, key)
+
+    def test_dump_draw(self, instance, postprocessing_root, draws):
+        key = postprocessing_root.raw_output_draws(scenario='worse', measure='deaths')
+        # Write out of order and with rows shuffled to check alignment.
+        for draw_id in [2, 0, 1]:
+            instance.dump_draw(draws[draw_id].iloc[::-1], key, draw_id=draw_id, n_draws=3, index=draws.index)
+        pandas.testing.assert_frame_equal(draws, instance.load(key), check_column_type=False)
+
+        with pytest.raises(LookupError):
+            instance.dump_draw(draws[0], key, draw_id=0, n_draws=3)
+
+        index, values = instance.load_matrix(key)
+        assert isinstance(values, numpy.memmap)
+        assert values.flags.f_contiguous
+
+    def test_dump_draw_not_strict(self, postprocessing_root, draws):
+        key = postprocessing_root.raw_output_draws(scenario='worse', measure='deaths')
+        assert not io.is_complete(key)
+        for draw_id in range(3):
+            io.dump_draw(draws[draw_id], key, draw_id=draw_id, n_draws=3)
+            assert io.is_complete(key) == (draw_id == 2)
+            # Only the complete matrix is recorded.
+            assert (key in get_manifest(key.root)) == (draw_id == 2)
+        assert get_manifest(key.root).get(key)['rows'] == len(draws)
+
+        # A retried writer overwrites its draw rather than failing.
+        io.dump_draw(2 * draws[0], key, draw_id=0, n_draws=3, strict=False)
+        pandas.testing.assert_series_equal(2 * draws[0], io.load(key)[0], check_names=False)
+        assert io.is_complete(key)
+
+    def test_dump_draw_extends_index(self, instance, postprocessing_root, draws):
+        key = postprocessing_root.raw_output_draws(scenario='worse', measure='deaths')
+        instance.dump_draw(draws[0].iloc[1:], key, draw_id=0, n_draws=3)
+        instance.dump_draw(draws[1], key, draw_id=1, n_draws=3)
+
+        loaded = instance.load(key)
+        pandas.testing.assert_index_equal(draws.index, loaded.index)
+        assert numpy.isnan(loaded.iloc[0, 0])
+        pandas.testing.assert_series_equal(draws[0].iloc[1:], loaded[0].iloc[1:])
+        pandas.testing.assert_series_equal(draws[1], loaded[1])
+        assert loaded[2].isnull().all()
+
+    def test_load_selection(self, instance, postprocessing_root, draws):
+        key = postprocessing_root.raw_output_draws(scenario='worse', measure='deaths')
+        instance.dump(draws, key)
+
+        loaded = instance.load(key, columns=[2], date_range=('2020-03-08', None))
+        pandas.testing.assert_frame_equal(draws.iloc[1:, [2]], loaded, check_column_type=False)
+
+
+@pytest.mark.parametrize('data_format', ['csv', 'zip', 'hdf', 'parquet'])
+def test_write_session(tmpdir, data_format, parameters, regression_beta):
+    regression_root = RegressionRoot(tmpdir, data_format=data_format)
+    io.touch(regression_root)
+    keys = [regression_root.parameters(draw_id=draw_id) for draw_id in range(3)]
+
+    with io.session(regression_root):
+        for key in keys:
+            io.dump(parameters, key)
+            if data_format in ['zip', 'hdf']:
+                # Not recorded until the container is closed.
+                assert get_manifest(tmpdir).get(key) is None
+    assert all(get_manifest(tmpdir).get(key) is not None for key in keys)
+    io.dump_many([(regression_beta, regression_root.beta(draw_id=draw_id)) for draw_id in range(3)])
+
+    for draw_id, key in enumerate(keys):
+        pandas.testing.assert_frame_equal(parameters, io.load(key))
+        pandas.testing.assert_frame_equal(regression_beta, io.load(regression_root.beta(draw_id=draw_id)))
+
+
+def test_manifest(tmpdir, parameters):
+    regression_root = RegressionRoot(tmpdir)
+    io.touch(regression_root)
+    key = regression_root.parameters(draw_id=4)
+
+    assert not io.exists(key)
+    io.dump(parameters, key)
+    assert io.exists(key)
+    assert not io.exists(regression_root.parameters(draw_id=5))
+    assert io.list_keys(regression_root) == [key]
+
+    # Data written around the manifest is still found on disk.
+    unrecorded_key = regression_root.parameters(draw_id=6)
+    io.api.STRATEGIES[unrecorded_key.disk_format].dump(parameters, unrecorded_key)
+    assert io.exists(unrecorded_key)
+
+    entry = get_manifest(tmpdir).get(key)
+    assert entry['rows'] == len(parameters)
+    assert entry['schema'] == {column: str(dtype) for column, dtype in parameters.dtypes.items()}
+
+    # Deleted data isn't reported as existing just because it was recorded.
+    io.api.STRATEGIES[key.disk_format]._resolve_key(key).unlink()
+    assert not io.exists(key)
+
+
+def test_load_cache(tmpdir, parameters):
+    regression_root = RegressionRoot(tmpdir, data_format='csv')
+    io.touch(regression_root)
+    key = regression_root.parameters(draw_id=0)
+    io.dump(parameters, key)
+
+    cache = io.enable_cache()
+    try:
+        first = io.load(key)
+        first.iloc[0, 0] = -1  # Callers get their own copy.
+        second = io.load(key)
+        pandas.testing.assert_frame_equal(parameters, second)
+        assert cache.info()['hits'] == 1 and cache.info()['misses'] == 1
+
+        # Rewriting the dataset invalidates the cached copy.
+        CSVMarshall._resolve_key(key).unlink()
+        io.dump(parameters.iloc[:1], key)
+        pandas.testing.assert_frame_equal(parameters.iloc[:1], io.load(key))
+        assert cache.info()['misses'] == 2
+    finally:
+        io.disable_cache()
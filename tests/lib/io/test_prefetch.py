@@ -0,0 +1,55 @@
+import threading
+
+import pandas
+import pytest
+
+from covid_model_seiir_pipeline.lib import io
+from covid_model_seiir_pipeline.lib.io import RegressionRoot
+
+
+def test_prefetch_matches_direct_loads(tmpdir, parameters):
+    regression_root = RegressionRoot(tmpdir, data_format='parquet')
+    io.touch(regression_root)
+    for draw_id in range(10):
+        io.dump(parameters * (draw_id + 1), regression_root.parameters(draw_id=draw_id))
+
+    def loader(draw_id):
+        return io.load(regression_root.parameters(draw_id=draw_id))
+
+    prefetched = list(io.prefetch(loader, range(10), depth=3))
+
+    assert len(prefetched) == 10
+    for draw_id, data in enumerate(prefetched):
+        pandas.testing.assert_frame_equal(loader(draw_id), data)
+
+
+def test_prefetch_bounds_read_ahead():
+    started = []
+    lock = threading.Lock()
+
+    def loader(item):
+        with lock:
+            started.append(item)
+        return item
+
+    for consumed, item in enumerate(io.prefetch(loader, range(20), depth=3)):
+        assert item == consumed
+        # At most ``depth`` reads beyond the item being consumed.
+        assert len(started) <= consumed + 1 + 3
+
+
+def test_prefetch_raises_loader_errors():
+    def loader(item):
+        if item == 3:
+            raise FileNotFoundError(f'No data for {item}.')
+        return item
+
+    results = io.prefetch(loader, range(10), depth=4)
+    assert [next(results) for _ in range(3)] == [0, 1, 2]
+    with pytest.raises(FileNotFoundError, match='No data for 3'):
+        next(results)
+
+
+def test_prefetch_depth():
+    with pytest.raises(ValueError):
+        list(io.prefetch(lambda x: x, range(3), depth=0))
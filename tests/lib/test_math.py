@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+from covid_model_seiir_pipeline.lib import math
+
+
+def _np_interp(t_target, t_org, x_org):
+    return np.vstack([np.interp(t_target, t_org, row) for row in np.atleast_2d(x_org)])
+
+
+@pytest.mark.parametrize('t_org,t_target', [
+    # Uniform grids, both up and down sampling and past the ends.
+    (np.arange(0., 50.), np.arange(-1., 51., 0.1)),
+    (np.arange(0., 50.05, 0.05), np.arange(0., 50.)),
+    # Non-uniform grid.
+    (np.array([0., 0.5, 2., 2.1, 7., 10.]), np.linspace(-2., 12., 57)),
+    # Single point.
+    (np.array([3.]), np.arange(5.)),
+])
+def test_linear_interpolate_matches_np_interp(t_org, t_target):
+    x_org = np.random.RandomState(0).normal(size=(4, t_org.size))
+
+    result = math.linear_interpolate(t_target, t_org, x_org)
+    assert result.shape == (4, t_target.size)
+    assert np.allclose(result, _np_interp(t_target, t_org, x_org), rtol=0, atol=1e-12)
+
+    vector_result = math.linear_interpolate(t_target, t_org, x_org[0])
+    assert vector_result.shape == t_target.shape
+    assert np.allclose(vector_result, np.interp(t_target, t_org, x_org[0]), rtol=0, atol=1e-12)
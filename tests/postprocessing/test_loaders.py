@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from covid_model_seiir_pipeline.pipeline.postprocessing.model import loaders
+
+
+N_DRAWS = 6
+
+
+def _draw_runner(draw_id: int) -> pd.Series:
+    index = pd.MultiIndex.from_product([[6, 33, 102], pd.date_range('2021-01-01', periods=10)],
+                                       names=['location_id', 'date'])
+    draw = pd.Series(np.random.RandomState(draw_id).normal(size=len(index)), index=index, name=draw_id)
+    if draw_id == 2:
+        # Same rows, different order.
+        draw = draw.iloc[::-1]
+    elif draw_id == 3:
+        # Missing rows.
+        draw = draw.iloc[5:]
+    elif draw_id == 4:
+        # Rows the first draw doesn't have.
+        extra = pd.Series([1.0], name=draw_id,
+                          index=pd.MultiIndex.from_tuples([(200, pd.Timestamp('2021-01-01'))],
+                                                          names=['location_id', 'date']))
+        draw = pd.concat([draw, extra])
+    return draw
+
+
+@pytest.mark.parametrize('draw_loader', ['shared_memory', 'threads'])
+def test_draw_loaders_match_pool(draw_loader):
+    if draw_loader == 'shared_memory' and loaders.shared_memory is None:
+        pytest.skip('multiprocessing.shared_memory requires python 3.8+')
+    expected = pd.concat(loaders.DRAW_LOADERS['pool'](_draw_runner, N_DRAWS, 2), axis=1)
+
+    result = loaders.DRAW_LOADERS[draw_loader](_draw_runner, N_DRAWS, 2)
+
+    assert isinstance(result, pd.DataFrame)
+    assert result.columns.tolist() == list(range(N_DRAWS))
+    pd.testing.assert_frame_equal(expected.sort_index(), result.sort_index(), check_column_type=False)
@@ -31,5 +31,6 @@ class TestRegressionDataInterfaceIO:
         di.save_regression_betas(regression_beta, draw_id=4)
         di.save_infection_data(location_data, draw_id=4)
 
-        # Step 3: count files (again)
-        assert tmpdir_file_count() == 5
+        # Step 3: count files (again), including the data root manifest
+        assert tmpdir_file_count() == 6
+        assert len(io.list_keys(di.regression_root)) == 5
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from covid_model_seiir_pipeline.pipeline.regression.model import (
+    HospitalFatalityRatioData,
+    compute_hospital_usage,
+)
+from covid_model_seiir_pipeline.pipeline.regression.specification import (
+    HospitalParameters,
+)
+
+
+@pytest.fixture
+def hospital_inputs():
+    rs = np.random.RandomState(42)
+    location_ids = [6, 33, 102]
+    ages = [27.5, 60., 70., 80., 105.]
+
+    deaths = []
+    for location_id, start, end in zip(location_ids,
+                                       ['2020-03-01', '2020-03-10', '2020-03-05'],
+                                       ['2020-06-01', '2020-05-20', '2020-06-10']):
+        dates = pd.date_range(start, end)
+        deaths.append(pd.DataFrame({'location_id': location_id, 'date': dates,
+                                    'deaths': rs.uniform(0, 50, size=len(dates))}))
+    deaths = pd.concat(deaths, ignore_index=True)
+    deaths.loc[::17, 'deaths'] = np.nan
+
+    index = pd.MultiIndex.from_product([location_ids, ages], names=['location_id', 'age'])
+    death_weights = pd.Series(rs.dirichlet(np.ones(len(ages)), size=len(location_ids)).ravel(),
+                              index=index, name='death_weight')
+    hfr = HospitalFatalityRatioData(
+        age_specific=pd.Series(rs.uniform(2, 30, size=len(index)), index=index),
+        all_age=pd.Series(rs.uniform(4, 15, size=len(location_ids)),
+                          index=pd.Index(location_ids, name='location_id')),
+    )
+    return deaths, death_weights, hfr
+
+
+@pytest.mark.parametrize('hospital_parameters', [
+    HospitalParameters(),
+    HospitalParameters(hospital_stay_death=2, hospital_to_icu=0, icu_stay_recover=1),
+])
+def test_vectorized_hospital_usage_matches_frames(hospital_inputs, hospital_parameters):
+    deaths, death_weights, hfr = hospital_inputs
+
+    expected = compute_hospital_usage(deaths, death_weights, hfr, hospital_parameters, vectorized=False)
+    result = compute_hospital_usage(deaths, death_weights, hfr, hospital_parameters, vectorized=True)
+
+    for metric, expected_metric in expected.to_dict().items():
+        pd.testing.assert_series_equal(expected_metric, getattr(result, metric),
+                                       check_exact=False, rtol=1e-10)
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from covid_model_seiir_pipeline.pipeline.regression.model.containers import ODEParameters
+from covid_model_seiir_pipeline.pipeline.regression.model.ode_fit import (
+    _epi_threshold_window,
+    _exponential_step,
+    filter_to_epi_threshold,
+    run_beta_fit,
+    run_loc_beta_fit,
+)
+
+
+@pytest.fixture
+def ode_parameters():
+    return ODEParameters(
+        alpha=0.95,
+        sigma=0.25,
+        gamma1=0.5,
+        gamma2=0.5,
+        day_shift=3,
+        solver_dt=0.1,
+    )
+
+
+@pytest.fixture
+def past_infections():
+    rs = np.random.RandomState(12345)
+    infections = []
+    for location_id, start, end in [(102, '2020-02-01', '2020-06-30'),
+                                    (6, '2020-03-01', '2020-06-25'),
+                                    (33, '2020-02-15', '2020-07-04')]:
+        dates = pd.date_range(start, end)
+        days = np.arange(len(dates))
+        loc_infections = pd.Series(
+            1000 * np.exp(-((days - 60) / 30)**2) * rs.uniform(0.8, 1.2, size=len(dates)),
+            index=pd.MultiIndex.from_product([[location_id], dates], names=['location_id', 'date']),
+        )
+        infections.append(loc_infections)
+    infections = pd.concat(infections)
+    # Days with deaths but no infections are dropped in the regression.
+    return infections.drop(infections.index[[40, 41, 200]])
+
+
+@pytest.mark.parametrize('solver', ['RK45', 'exponential'])
+def test_beta_fit_matches_location_fit(past_infections, ode_parameters, solver):
+    location_ids = [102, 6, 33]
+    # Location 33's susceptibles run out during the fit.
+    population = pd.Series([1e6, 1e6, 5e4], index=pd.Index(location_ids, name='location_id'))
+
+    expected = pd.concat([
+        run_loc_beta_fit(past_infections.loc[location_id], population.loc[location_id],
+                         location_id, ode_parameters)
+        for location_id in location_ids
+    ]).reset_index(drop=True)
+    result = run_beta_fit(past_infections, population, location_ids, ode_parameters, solver=solver)
+
+    pd.testing.assert_frame_equal(expected, result, check_exact=False, rtol=1e-6)
+
+
+@pytest.mark.parametrize('values', [
+    [0., 10., 60., 80., 40., 70., 90., 20.],  # Over the threshold
+    [0., 1., 2., 30., 3., 4., 5., 6.],  # Threshold halved
+    [0., 0., 0., 0., 0., 0., 0., 0.],  # Never over the threshold
+])
+def test_epi_threshold_window(values):
+    dates = pd.date_range('2020-03-01', periods=len(values))
+    infections = pd.Series(values, index=dates)
+    end_date = dates.max() - pd.Timedelta(days=2)
+
+    expected = filter_to_epi_threshold(1, infections, end_date)
+    days = dates.values.astype('datetime64[D]').astype(np.int64)
+    start, stop = _epi_threshold_window(days, np.array(values), 2)
+
+    pd.testing.assert_series_equal(expected, infections.iloc[start:stop])
+
+
+def test_exponential_step_is_exact():
+    c, x_0 = 0.3, 2.
+    t = np.array([0., 1., 2., 4., 4.00001, 5.])
+    # Linear forcing f = 1 + 2t has the solution x = a + b t + (x_0 - a) exp(-c t)
+    # with b = 2 / c, a = (1 - b) / c.
+    b = 2 / c
+    a = (1 - b) / c
+    expected = a + b * t + (x_0 - a) * np.exp(-c * t)
+
+    result = [x_0]
+    for k in range(t.size - 1):
+        result.append(_exponential_step(result[-1], c, 1 + 2 * t[k], 1 + 2 * t[k + 1], t[k + 1] - t[k]))
+    np.testing.assert_allclose(result, expected, rtol=1e-12)
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+import scipy.optimize as sciopt
+
+from covid_model_seiir_pipeline.pipeline.regression.model.slime import (
+    CovModel,
+    CovModelSet,
+    MRData,
+    MRModel,
+)
+
+
+def _mr_model(mobility_bounds=(0, 1)):
+    rs = np.random.RandomState(3)
+    group_sizes = [5, 12, 1, 8]
+    df = pd.DataFrame({
+        'location_id': np.repeat([102, 6, 60, 33], group_sizes),
+        'mobility': rs.normal(size=sum(group_sizes)),
+        'testing': rs.uniform(size=sum(group_sizes)),
+        'obs_se': rs.uniform(0.5, 2, size=sum(group_sizes)),
+    })
+    df['beta'] = -0.5 + 0.3 * df['mobility'] - 0.2 * df['testing'] + rs.normal(0, 0.05, size=len(df))
+    data = MRData(df, col_group='location_id', col_obs='beta', col_obs_se='obs_se', col_covs=['mobility', 'testing'])
+    cov_models = CovModelSet([
+        CovModel('intercept', use_re=True, re_var=0.01),
+        CovModel('mobility', use_re=True, bounds=mobility_bounds, re_var=0.1, gprior=(0.2, 1.)),
+        CovModel('testing', gprior=(0, 1.)),
+    ])
+    return MRModel(data, cov_models)
+
+
+def test_gradient_matches_finite_differences():
+    model = _mr_model()
+    x = np.random.RandomState(0).normal(size=model.cov_models.var_size)
+
+    assert sciopt.check_grad(model.objective, model.gradient, x) < 1e-5
+
+
+def test_hessian_matches_dense_design():
+    model = _mr_model()
+    cov_models = model.cov_models.cov_models
+    group = model.data.df['location_id'].to_numpy()
+
+    columns = []
+    for cov_model in cov_models:
+        if cov_model.use_re:
+            columns.append(cov_model.cov[:, None] * (group[:, None] == model.data.groups))
+        else:
+            columns.append(cov_model.cov[:, None])
+    cov_mat = np.hstack(columns)
+    prior_diag = np.hstack([np.repeat(1 / cov_model.gprior[1]**2, cov_model.var_size) for cov_model in cov_models])
+    expected = (cov_mat.T / model.obs_se**2).dot(cov_mat) + np.diag(prior_diag)
+
+    np.testing.assert_allclose(model.hessian(np.zeros(model.cov_models.var_size)), expected, rtol=1e-12)
+
+
+@pytest.mark.parametrize('bounds', [(-np.inf, np.inf), (0, 0.25)])
+def test_direct_solver_matches_lbfgsb(bounds):
+    lbfgsb_model = _mr_model(bounds)
+    lbfgsb_model.fit_model(options={'ftol': 1e-15, 'gtol': 1e-12})
+    direct_model = _mr_model(bounds)
+    direct_model.fit_model(solver='direct')
+
+    assert direct_model.opt_result.success
+    assert direct_model.opt_result.fun <= lbfgsb_model.opt_result.fun + 1e-10
+    np.testing.assert_allclose(direct_model.opt_result.x, lbfgsb_model.opt_result.x, atol=1e-5)
+
+    # First order optimality: the gradient is zero unless pushing against a bound.
+    x, grad = direct_model.opt_result.x, direct_model.gradient(direct_model.opt_result.x)
+    lower, upper = direct_model.bounds.T
+    assert np.allclose(np.clip(x - grad, lower, upper), x, rtol=0, atol=1e-8)
+    if np.isfinite(bounds[1]):
+        assert np.any(x == upper)
+
+
+def test_direct_solver_reports_line_search_failure():
+    model = _mr_model()
+    x0 = np.full(model.cov_models.var_size, 0.1)
+    gradient = model.gradient
+    # An ascent direction can never pass the line search.
+    model.gradient = lambda x: -gradient(x)
+    model.fit_model(x0=x0, solver='direct')
+
+    assert not model.opt_result.success
+    assert 'Line search' in model.opt_result.message
+    np.testing.assert_array_equal(model.opt_result.x, x0)
+    assert model.opt_result.fun == model.objective(x0)